@@ -0,0 +1,104 @@
+"""
+Calendar sync time vs the number of calendars, with a simulated round trip per HTTP
+request: syncing each calendar on its own, one request after the other, against
+the calendar set, which sends the requests of all calendars in one batch request
+and should stay close to a single calendar.
+
+Usage:
+    python -m benchmarks.bench_calendars [--calendars 1 5 20 50] [--round-trip 0.1]
+"""
+import argparse
+import datetime
+import logging
+import time
+from typing import Any, Callable, Dict, List
+
+from src.core.logger import configure as configure_logging
+from src.flows.calendar_store import CalendarSet, EventStore
+
+TZ = datetime.timezone.utc
+
+
+class Request:
+    def __init__(self, account: "Account", response: Dict[str, Any]):
+        self.account = account
+        self.response = response
+
+    def execute(self) -> Dict[str, Any]:
+        time.sleep(self.account.round_trip)
+        return self.response
+
+
+class Batch:
+    def __init__(self, account: "Account", callback: Callable[[str, Any, Any], None]):
+        self.account = account
+        self.callback = callback
+        self.requests: List[Any] = []
+
+    def add(self, request: Request, request_id: str) -> None:
+        self.requests.append((request_id, request.response))
+
+    def execute(self) -> None:
+        time.sleep(self.account.round_trip)
+        for request_id, response in self.requests:
+            self.callback(request_id, response, None)
+
+
+class Account:
+    """
+    A user with a number of calendars of ten events each, answering every request
+    after one round trip.
+    """
+
+    def __init__(self, calendars: int, round_trip: float):
+        self.round_trip = round_trip
+        self.ids = [f"calendar{number}@example.com" for number in range(calendars)]
+        now = datetime.datetime.now(TZ)
+        self.items = [
+            {
+                "id": f"event{hour}",
+                "summary": f"Event {hour}",
+                "start": {"dateTime": (now + datetime.timedelta(hours=hour)).isoformat()},
+                "end": {"dateTime": (now + datetime.timedelta(hours=hour, minutes=30)).isoformat()},
+            }
+            for hour in range(10)
+        ]
+
+    def calendarList(self) -> "Account":
+        return self
+
+    def events(self) -> "Account":
+        return self
+
+    def list(self, **params) -> Request:
+        if "calendarId" not in params:
+            return Request(self, {"items": [{"id": calendar_id} for calendar_id in self.ids]})
+        return Request(self, {"items": self.items, "nextSyncToken": "1"})
+
+    def new_batch_http_request(self, callback: Callable[[str, Any, Any], None]) -> Batch:
+        return Batch(self, callback)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calendars", type=int, nargs="+", default=[1, 5, 20, 50])
+    parser.add_argument("--round-trip", type=float, default=0.1, help="simulated seconds per HTTP request")
+    args = parser.parse_args()
+    configure_logging(path=None, console_level=logging.ERROR)
+
+    print(f"{'calendars':>9} {'one by one s':>13} {'batched s':>10}")
+    for calendars in args.calendars:
+        account = Account(calendars, args.round_trip)
+        start = time.perf_counter()
+        for calendar_id in account.ids:
+            EventStore(account, calendar_id, tz=TZ).sync()
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        CalendarSet(account, tz=TZ).sync()
+        batched = time.perf_counter() - start
+        print(f"{calendars:>9} {sequential:>13.2f} {batched:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Corpus cleaning throughput on a large synthetic input.csv and q_and_a.csv (2 GB
+together by default) with duplicate and invalid rows: MB/s and rows/s for the
+external sort of input.csv and the order-preserving deduplication of q_and_a.csv,
+and the peak memory of the process, which should stay near the memory limit
+however large the files are. The snapshot is not compiled, since it holds the
+whole corpus in memory.
+
+Usage:
+    python -m benchmarks.bench_corpus_tool [--gigabytes 2] [--memory-mb 256] [--folder DIR]
+"""
+import argparse
+import csv
+import random
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from src.data.corpus_tool import clean_commands, clean_q_and_a
+
+
+def generate(path: Path, target_bytes: int, columns: int, seed: int) -> int:
+    """
+    Write rows until the file reaches the target size; about 10% repeat an earlier
+    row and 1 in 10000 is invalid.
+
+    Returns:
+        int: Rows written.
+    """
+    rng = random.Random(seed)
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        while file.tell() < target_bytes:
+            for _ in range(10_000):
+                number = rng.randrange(rows + 1) if rng.random() < 0.1 else rows
+                row = [f"category_{number % 500}", f"synthetic phrase number {number} with some words", f"reply {number}"]
+                writer.writerow(row[:columns] if rng.random() > 1e-4 else row[:1])
+                rows += 1
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gigabytes", type=float, default=2.0, help="combined size of the two files")
+    parser.add_argument("--memory-mb", type=int, default=256, help="memory limit for the rows held at once")
+    parser.add_argument("--folder", type=Path, help="where the files are written; a temporary folder by default")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.folder) as temp_dir:
+        folder = Path(temp_dir)
+        target = int(args.gigabytes * 1024 ** 3 / 2)
+        start = time.perf_counter()
+        counts = {
+            "input.csv": generate(folder / "input.csv", target, 3, seed=1),
+            "q_and_a.csv": generate(folder / "q_and_a.csv", target, 2, seed=2),
+        }
+        print(f"Generated {args.gigabytes:.1f} GB in {time.perf_counter() - start:.0f} s")
+
+        print(f"{'file':<12} {'MB':>8} {'rows':>11} {'seconds':>8} {'MB/s':>7} {'rows/s':>9} {'peak RSS MB':>12}")
+        memory_bytes = args.memory_mb * 1024 * 1024
+        for name, clean in (("input.csv", clean_commands), ("q_and_a.csv", clean_q_and_a)):
+            source = folder / name
+            megabytes = source.stat().st_size / 1024 ** 2
+            start = time.perf_counter()
+            for _ in clean(source, folder / f"clean_{name}", temp_dir, memory_bytes):  # type: ignore[operator]
+                pass
+            seconds = time.perf_counter() - start
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(
+                f"{name:<12} {megabytes:>8.0f} {counts[name]:>11} {seconds:>8.1f} "
+                f"{megabytes / seconds:>7.1f} {counts[name] / seconds:>9.0f} {peak:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Dispatch latency of the compiled intent index versus the linear scan it replaced.
+
+Usage:
+    python -m benchmarks.bench_intent_index [--sizes 100 10000 1000000]
+"""
+import argparse
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.corpus import generate_commands
+from src.core.constants import CALENDAR, FUNFACT, QUESTION_KEYWORD, TIME, WEATHER
+from src.core.registry import FlowRegistry
+from src.data.intent_index import IntentIndex
+from src.flows.builtin import BUILTIN_FLOWS
+
+
+def linear_dispatch(commands: Dict[str, List[str]], data: str) -> Optional[str]:
+    """
+    The dispatch logic as it was before the intent index.
+    """
+    for keyword in (CALENDAR, TIME, WEATHER, QUESTION_KEYWORD, FUNFACT):
+        if keyword in data:
+            return keyword
+    for command, reply_list in commands.items():
+        if data in reply_list:
+            return command
+    return None
+
+
+def measure(func: Callable[[str], Optional[str]], utterances: List[str], budget: float = 1.0) -> float:
+    """
+    Measure the mean latency of dispatching the utterances, in microseconds.
+    """
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for utterance in utterances:
+            func(utterance)
+        calls += len(utterances)
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return elapsed / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    registry = FlowRegistry(BUILTIN_FLOWS)
+    print(f"{'phrases':>10} {'build ms':>10} {'index us':>10} {'linear us':>11}")
+    for size in args.sizes:
+        commands = generate_commands(size)
+        rng = random.Random(size)
+        utterances = [f"synthetic command number {rng.randrange(size)}" for _ in range(50)]
+        utterances += ["what is the weather like", "tell me something unknown"]
+
+        start = time.perf_counter()
+        index = IntentIndex()
+        index.build(commands)
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        def indexed(data: str) -> Optional[str]:
+            flow = registry.match(data)
+            return flow.name if flow else index.match_phrase(data)
+
+        indexed_us = measure(indexed, utterances)
+        linear_us = measure(lambda data: linear_dispatch(commands, data), utterances[:4], budget=0.5)
+        print(f"{size:>10} {build_ms:>10.1f} {indexed_us:>10.2f} {linear_us:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Per-record cost of logging on the calling thread: the old setup (a FileHandler per
+logger and a timezone lookup per record) versus the queued pipeline.
+
+Also compares a DEBUG call built with an f-string against a %-style call when the
+logger is above DEBUG, which is what call sites pay for suppressed records.
+
+Usage:
+    python -m benchmarks.bench_logging [--records 20000]
+"""
+import argparse
+import datetime
+import io
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import colorlog
+import pytz
+import tzlocal
+
+from src.core import logger as log_pipeline
+
+
+def old_logger(name: str, path: Path) -> logging.Logger:
+    """
+    The logger setup this pipeline replaced, with the console going to a buffer.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    console_handler = logging.StreamHandler(io.StringIO())
+    file_handler = logging.FileHandler(path, mode="a", encoding="utf-8")
+    console_handler.setLevel(logging.INFO)
+    file_handler.setLevel(logging.DEBUG)
+
+    def custom_time(*args):
+        utc_dt = datetime.datetime.utcnow().replace(tzinfo=pytz.utc)
+        return utc_dt.astimezone(tzlocal.get_localzone()).timetuple()
+
+    color_formatter = colorlog.ColoredFormatter("%(log_color)s" + log_pipeline.FORMAT)
+    file_formatter = logging.Formatter(log_pipeline.FORMAT)
+    color_formatter.converter = custom_time  # type: ignore[assignment]
+    file_formatter.converter = custom_time  # type: ignore[assignment]
+    console_handler.setFormatter(color_formatter)
+    file_handler.setFormatter(file_formatter)
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+    return logger
+
+
+def per_record(logger: logging.Logger, records: int) -> float:
+    payload = {"city": "Cluj-Napoca", "temp": 21.5}
+    start = time.perf_counter()
+    for i in range(records):
+        logger.info("Weather result %d: %s", i, payload)
+    return (time.perf_counter() - start) / records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        old = per_record(old_logger("bench.old", Path(folder) / "old.log"), args.records)
+
+        log_pipeline.configure(str(Path(folder) / "new.log"), console_level=logging.CRITICAL)
+        new_logger = log_pipeline.Logger("bench.new").get_logger()
+        new_logger.propagate = False
+        new = per_record(new_logger, args.records)
+        log_pipeline.shutdown()
+
+    print(f"{'setup':<28} {'µs/record':>10}")
+    print(f"{'file handler per logger':<28} {old * 1e6:>10.2f}")
+    print(f"{'queued pipeline':<28} {new * 1e6:>10.2f}")
+
+    suppressed = logging.getLogger("bench.suppressed")
+    suppressed.setLevel(logging.INFO)
+    data = [f"word{i}" for i in range(20)]
+    start = time.perf_counter()
+    for _ in range(args.records):
+        suppressed.debug(f"Processing command: {data}")
+    eager = (time.perf_counter() - start) / args.records
+    start = time.perf_counter()
+    for _ in range(args.records):
+        suppressed.debug("Processing command: %s", data)
+    lazy = (time.perf_counter() - start) / args.records
+    print(f"{'suppressed DEBUG, f-string':<28} {eager * 1e6:>10.2f}")
+    print(f"{'suppressed DEBUG, %-style':<28} {lazy * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+What preprocessing saves per utterance on recorded audio fixtures: the bytes of
+the FLAC upload Google receives, the milliseconds of audio it has to decode, and
+the time from the end of speech until the utterance is complete.
+
+Each WAV file in the fixture folder is segmented the way the microphone stream is,
+once with the full pause ending every utterance (the old behaviour) and once with
+the quick pause. Without a fixture folder, speech-like fixtures are synthesized at
+44.1 and 48 kHz.
+
+Usage:
+    python -m benchmarks.bench_preprocess [FIXTURES_DIR] [--target-rate 16000]
+"""
+import argparse
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import speech_recognition as sr
+
+from src.core.audio import SAMPLE_WIDTH, Segmenter, WavFileSource, frame_energy
+from src.core.preprocess import Preprocessor
+
+
+def synthesize(folder: Path) -> List[Path]:
+    rng = np.random.default_rng(1)
+    paths = []
+    for rate in (44100, 48000):
+        chunks = []
+        for seconds, amplitude in ((1.2, 0), (1.4, 4000), (1.5, 0), (0.9, 3000), (2.0, 0)):
+            t = np.arange(int(seconds * rate)) / rate
+            # A voice-like signal: a 140 Hz harmonic stack with a syllable-rate envelope
+            voice = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 8))
+            envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+            chunks.append(rng.normal(0, 40, t.size) + amplitude * voice * envelope / 2)
+        path = folder / f"synthetic_{rate}.wav"
+        with wave.open(str(path), "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(SAMPLE_WIDTH)
+            wav.setframerate(rate)
+            wav.writeframes(np.clip(np.concatenate(chunks), -32768, 32767).astype(np.int16).tobytes())
+        paths.append(path)
+    return paths
+
+
+def segment(path: Path, quick: bool) -> List[Tuple[bytes, int, float]]:
+    """
+    Split a file into utterances.
+
+    Returns:
+        List[Tuple[bytes, int, float]]: Each utterance, its sample rate, and the
+            milliseconds from its last voiced frame until it was complete.
+    """
+    source = WavFileSource(path)
+    segmenter = Segmenter(source.sample_rate) if quick else Segmenter(source.sample_rate, quick_pause=0.8)
+    frame_ms = segmenter.frame_samples * 1000 / source.sample_rate
+    utterances = []
+    last_voiced = position = 0
+    while True:
+        frame = source.read(segmenter.frame_samples)
+        data = segmenter.feed(frame) if frame else segmenter.flush()
+        position += 1
+        if segmenter.in_speech and frame_energy(frame) > segmenter.threshold:
+            last_voiced = position
+        if data:
+            utterances.append((data, source.sample_rate, (position - last_voiced) * frame_ms))
+        if not frame:
+            break
+    source.close()
+    return utterances
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", type=Path, nargs="?", help="folder of 16-bit WAV files")
+    parser.add_argument("--target-rate", type=int, default=16000, help="rate sent to the recognizer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = sorted(args.fixtures.glob("*.wav")) if args.fixtures else synthesize(Path(temp_dir))
+        preprocessor = Preprocessor(args.target_rate)
+        print(f"{'utterance':<24} {'flac in':>9} {'flac out':>9} {'saved':>6} {'ms in':>7} {'ms out':>7} {'endpoint ms':>16} {'cpu ms':>7}")
+        totals = np.zeros(4)
+        for path in paths:
+            slow = segment(path, quick=False)
+            for i, (data, rate, endpoint_ms) in enumerate(segment(path, quick=True)):
+                audio = sr.AudioData(data, rate, SAMPLE_WIDTH)
+                start = time.process_time()
+                processed, stats = preprocessor.process(audio)
+                cpu_ms = (time.process_time() - start) * 1000
+                flac_in, flac_out = len(audio.get_flac_data()), len(processed.get_flac_data())
+                old_endpoint = f"{slow[i][2]:.0f}" if i < len(slow) else "-"
+                print(
+                    f"{path.stem + '#' + str(i):<24} {flac_in:>9} {flac_out:>9} {1 - flac_out / flac_in:>6.0%} "
+                    f"{stats.ms_in:>7.0f} {stats.ms_out:>7.0f} {old_endpoint + ' -> ' + f'{endpoint_ms:.0f}':>16} {cpu_ms:>7.1f}"
+                )
+                totals += (flac_in, flac_out, stats.ms_in, stats.ms_out)
+        if totals[0]:
+            print(
+                f"\nTotal: {totals[0] - totals[1]:.0f} upload bytes saved ({1 - totals[1] / totals[0]:.0%}), "
+                f"{totals[2] - totals[3]:.0f} ms of audio not sent"
+            )
+
+
+if __name__ == "__main__":
+    main()
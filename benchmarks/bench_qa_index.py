@@ -0,0 +1,62 @@
+"""
+Q&A lookup latency of the BM25 index versus the substring scan it replaced.
+
+Usage:
+    python -m benchmarks.bench_qa_index [--size 500000]
+"""
+import argparse
+import random
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.corpus import generate_q_and_a
+from src.data.qa_index import QAIndex
+
+
+def substring_lookup(q_and_a: Dict[str, str], question: str) -> Optional[str]:
+    """
+    The lookup logic as it was before the Q&A index.
+    """
+    if question in q_and_a.keys():
+        return q_and_a[question]
+    for key in q_and_a.keys():
+        if question in key:
+            return q_and_a[key]
+    return None
+
+
+def mean_latency_ms(func, questions: List[str]) -> float:
+    start = time.perf_counter()
+    for question in questions:
+        func(question)
+    return (time.perf_counter() - start) / len(questions) * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    q_and_a = generate_q_and_a(args.size)
+    keys = list(q_and_a.keys())
+    rng = random.Random(1)
+    # Paraphrases: drop the leading question word of a known question
+    questions = [" ".join(rng.choice(keys).split()[1:]) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    index = QAIndex()
+    index.build(q_and_a)
+    print(f"entries: {args.size}, build: {time.perf_counter() - start:.2f} s")
+
+    indexed_ms = mean_latency_ms(index.best_answer, questions)
+    hits = sum(index.best_answer(question) is not None for question in questions)
+    print(f"bm25 index:     {indexed_ms:.3f} ms/query, {hits}/{len(questions)} answered")
+
+    sample = questions[: max(1, args.queries // 20)]
+    scan_ms = mean_latency_ms(lambda question: substring_lookup(q_and_a, question), sample)
+    print(f"substring scan: {scan_ms:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Flow registry cost vs the number of registered flows: compiling the dispatch table
+once at registration, dispatching a command, and the flow modules imported at
+startup, which should stay at zero.
+
+Usage:
+    python -m benchmarks.bench_registry [--flows 5 100 1000 10000]
+"""
+import argparse
+import sys
+import time
+
+from src.core.registry import Flow, FlowRegistry
+from src.flows.builtin import BUILTIN_FLOWS
+
+COMMANDS = ["what is the weather going to be like", "tell me a fun fact", "sing me a song please"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flows", type=int, nargs="+", default=[5, 100, 1_000, 10_000])
+    parser.add_argument("--repeat", type=int, default=20_000, help="dispatches timed per size")
+    args = parser.parse_args()
+
+    modules_before = set(sys.modules)
+    print(f"{'flows':>7} {'register ms':>12} {'dispatch us':>12} {'modules imported':>17}")
+    for count in args.flows:
+        flows = BUILTIN_FLOWS + [
+            Flow(f"plugin {i}", [f"topic{i}x"], priority=60, factory=f"plugins.plugin_{i}:Service")
+            for i in range(max(0, count - len(BUILTIN_FLOWS)))
+        ]
+        start = time.perf_counter()
+        registry = FlowRegistry(flows)
+        registry.create_services()
+        register_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for i in range(args.repeat):
+            registry.match(COMMANDS[i % len(COMMANDS)])
+        dispatch_us = (time.perf_counter() - start) / args.repeat * 1e6
+        imported = len([name for name in set(sys.modules) - modules_before if name.startswith(("src.flows.", "plugins"))])
+        print(f"{count:>7} {register_ms:>12.2f} {dispatch_us:>12.2f} {imported:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Fun fact selection latency vs the number of Q&A rows: copying and shuffling all
+answers per pick (the old behaviour) against the shuffle bag, which should stay
+flat as the corpus grows. Also counts back-to-back repeats.
+
+Usage:
+    python -m benchmarks.bench_selection [--sizes 1000 100000 1000000]
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from src.core.selection import ResponseSelector
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--picks", type=int, default=2_000, help="picks timed per size with the shuffle bag")
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'shuffle us':>12} {'bag us':>9} {'bag persisted us':>17} {'repeats':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in args.sizes:
+            q_and_a = {f"question {i}": f"answer {i}" for i in range(size)}
+            answers = list(q_and_a.values())
+
+            old_picks = max(3, args.picks * 1_000 // size)
+            start = time.perf_counter()
+            for _ in range(old_picks):
+                choices = list(q_and_a.values())
+                random.shuffle(choices)
+                random.choice(choices)
+            shuffle_us = (time.perf_counter() - start) / old_picks * 1e6
+
+            timings = []
+            for path in (None, Path(temp_dir) / f"selection_{size}.json"):
+                selector = ResponseSelector(path)
+                start = time.perf_counter()
+                picked = [selector.pick("fun fact", answers) for _ in range(args.picks)]
+                timings.append((time.perf_counter() - start) / args.picks * 1e6)
+            repeats = sum(a == b for a, b in zip(picked, picked[1:]))
+            print(f"{size:>9} {shuffle_us:>12.1f} {timings[0]:>9.2f} {timings[1]:>17.2f} {repeats:>8}")
+
+
+if __name__ == "__main__":
+    main()
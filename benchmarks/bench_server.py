@@ -0,0 +1,93 @@
+"""
+Turn throughput and latency of the server mode with many concurrent sessions. Each
+client opens a session on its own keep-alive connection and sends text turns; the
+calendar and weather flows are stubs with a simulated network latency.
+
+Usage:
+    python -m benchmarks.bench_server [--sessions 100 500] [--turns 5] [--workers 8] [--flow-latency 0.05]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from benchmarks.corpus import generate_commands, generate_q_and_a, write_corpus
+from src.core.batch import stub_services
+from src.core.logger import configure as configure_logging
+from src.core.server import AssistantServer
+from src.core.warmup import UsageHistory
+from src.data import commands as corpus
+
+UTTERANCES = ["what's the weather like", "what time is it", "synthetic command number 7", "what's next in my calendar"]
+
+
+async def call(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, path: str, body: bytes = b"") -> dict:
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    return json.loads(await reader.readexactly(length))
+
+
+async def client(port: int, turns: int, offset: int) -> List[float]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    session = (await call(reader, writer, "/sessions"))["session"]
+    latencies = []
+    for i in range(turns):
+        body = json.dumps({"text": UTTERANCES[(offset + i) % len(UTTERANCES)]}).encode("utf-8")
+        start = time.perf_counter()
+        await call(reader, writer, f"/sessions/{session}/turns", body)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+    return latencies
+
+
+async def run(sessions: int, turns: int, workers: int, flow_latency: float) -> Tuple[float, List[float]]:
+    server = AssistantServer(port=0, services=stub_services(flow_latency), workers=workers, usage=UsageHistory(None))
+    await server.start()
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(client(server.port, turns, i) for i in range(sessions)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await server.close()
+    return elapsed, [latency for latencies in results for latency in latencies]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--turns", type=int, default=5, help="turns per session")
+    parser.add_argument("--workers", type=int, default=8, help="executor threads")
+    parser.add_argument("--flow-latency", type=float, default=0.05, help="simulated network seconds per flow")
+    args = parser.parse_args()
+    configure_logging(path=None, console_level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folder = Path(temp_dir)
+        write_corpus(folder, generate_commands(1_000), generate_q_and_a(1_000))
+        corpus.INPUT_PATH = folder / "input.csv"
+        corpus.Q_AND_A_PATH = folder / "q_and_a.csv"
+        corpus.init_replies()
+
+    print(f"{'sessions':>9} {'turns':>7} {'seconds':>8} {'turns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for sessions in args.sessions:
+        elapsed, latencies = asyncio.run(run(sessions, args.turns, args.workers, args.flow_latency))
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        print(f"{sessions:>9} {len(latencies):>7} {elapsed:>8.2f} {len(latencies) / elapsed:>9.0f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
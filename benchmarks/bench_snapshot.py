@@ -0,0 +1,74 @@
+"""
+Startup time and memory of init_replies from the CSV files versus the memory-mapped snapshot.
+
+Each measurement runs in a fresh interpreter so peak RSS is comparable.
+
+Usage:
+    python -m benchmarks.bench_snapshot [--rows 2000000]
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+from src.data import commands
+commands.init_replies(use_snapshot=sys.argv[1] == "snapshot")
+elapsed = time.perf_counter() - start
+commands.intent_index.match_phrase("command 12345")
+print(json.dumps({"seconds": elapsed, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def write_corpus(folder: Path, rows: int) -> None:
+    """
+    Write synthetic input.csv and q_and_a.csv files with the given number of rows each.
+    """
+    user_data = folder / "user_data"
+    user_data.mkdir()
+    with open(user_data / "input.csv", "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        for i in range(rows):
+            writer.writerow([f"category_{i % 200}", f"command {i}", f"reply number {i}, Sir!"])
+    with open(user_data / "q_and_a.csv", "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        for i in range(rows):
+            writer.writerow([f"what is fact number {i} about topic {i % 997}", f"answer {i}"])
+
+
+def run(folder: Path, mode: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, mode], cwd=folder, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folder = Path(temp_dir)
+        write_corpus(folder, args.rows)
+        csv_result = run(folder, "csv")
+        compile_result = run(folder, "snapshot")
+        snapshot_result = run(folder, "snapshot")
+
+    print(f"rows per file: {args.rows}")
+    print(f"{'mode':<18} {'startup s':>10} {'max RSS MB':>11}")
+    for name, result in (("csv", csv_result), ("snapshot compile", compile_result), ("snapshot", snapshot_result)):
+        print(f"{name:<18} {result['seconds']:>10.2f} {result['max_rss_mb']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+End-to-end response time of a flow when the acknowledgement is spoken before the
+fetch (the old blocking behaviour) versus queued while the fetch runs.
+
+The TTS engine and the flow's network call are simulated with sleeps.
+
+Usage:
+    python -m benchmarks.bench_speech_queue [--ack 0.8] [--fetch 0.5 1.0]
+"""
+import argparse
+import time
+from unittest import mock
+
+from src.core.speech import Speech
+
+
+class SleepingEngine:
+    """
+    Stand-in for a pyttsx3 engine that takes a fixed time per utterance.
+    """
+
+    def __init__(self, seconds_per_utterance: float):
+        self.seconds_per_utterance = seconds_per_utterance
+        self.pending = 0
+        self.properties = {"rate": 150, "voices": [None, mock.Mock(id="voice")], "voice": "voice"}
+
+    def setProperty(self, name, value):
+        self.properties[name] = value
+
+    def getProperty(self, name):
+        return self.properties[name]
+
+    def say(self, text):
+        self.pending += 1
+
+    def runAndWait(self):
+        time.sleep(self.seconds_per_utterance * self.pending)
+        self.pending = 0
+
+
+def run_turn(speech: Speech, fetch_seconds: float, overlap: bool) -> float:
+    start = time.perf_counter()
+    if overlap:
+        acknowledgement = speech.speak_async("Opening weather, Sir!")
+        time.sleep(fetch_seconds)
+        acknowledgement.result()
+    else:
+        speech.speak("Opening weather, Sir!")
+        time.sleep(fetch_seconds)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ack", type=float, default=0.8, help="seconds to speak the acknowledgement")
+    parser.add_argument("--fetch", type=float, nargs="+", default=[0.2, 0.8, 1.5], help="seconds the flow takes")
+    args = parser.parse_args()
+
+    with mock.patch("src.core.speech.pyttsx3.init", lambda: SleepingEngine(args.ack)):
+        speech = Speech()
+
+    print("Time until the answer can be spoken (answer playback excluded)")
+    print(f"{'ack s':>6} {'fetch s':>8} {'blocking s':>11} {'queued s':>9} {'max s':>6}")
+    for fetch in args.fetch:
+        blocking = run_turn(speech, fetch, overlap=False)
+        queued = run_turn(speech, fetch, overlap=True)
+        print(f"{args.ack:>6.2f} {fetch:>8.2f} {blocking:>11.2f} {queued:>9.2f} {max(args.ack, fetch):>6.2f}")
+    speech.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+CPU cost and detection latency of wake word spotting on recorded audio fixtures.
+
+Each WAV file in the fixture folder is split into utterances the same way the
+microphone stream is, and every utterance is passed to the backend. Files whose
+name starts with "wake" are expected to contain a wake word; all other files are
+expected not to.
+
+Latency is the time from the end of an utterance to the backend's answer. CPU is
+reported as process time per second of audio (the real-time factor).
+
+Usage:
+    python -m benchmarks.bench_wake_word FIXTURES_DIR [--google]
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import List
+
+from src.core.audio import AudioSourceExhausted, CaptureStream, WavFileSource
+from src.core.constants import WAKE_WORDS
+from src.core.speech import GoogleBackend, KeywordSpotter, RecognitionBackend
+
+
+def read_utterances(path: Path) -> list:
+    stream = CaptureStream(WavFileSource(path)).start()
+    utterances = []
+    try:
+        while True:
+            utterances.append(stream.next_utterance().audio)
+    except AudioSourceExhausted:
+        pass
+    stream.close()
+    return utterances
+
+
+def run(name: str, backend: RecognitionBackend, fixtures: List[Path]) -> None:
+    latencies = []
+    cpu_seconds = 0.0
+    audio_seconds = 0.0
+    hits = misses = false_alarms = 0
+
+    for path in fixtures:
+        detected = False
+        for audio in read_utterances(path):
+            wall, cpu = time.perf_counter(), time.process_time()
+            text = backend.recognize(audio)
+            latencies.append(time.perf_counter() - wall)
+            cpu_seconds += time.process_time() - cpu
+            audio_seconds += len(audio.frame_data) / audio.sample_width / audio.sample_rate
+            detected = detected or any(wake_word in text for wake_word in WAKE_WORDS)
+        expected = path.name.startswith("wake")
+        hits += detected and expected
+        misses += expected and not detected
+        false_alarms += detected and not expected
+
+    if not latencies:
+        print(f"{name:>8}: no utterances found")
+        return
+    p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"{name:>8} {len(latencies):>11} {cpu_seconds / audio_seconds:>6.3f} "
+        f"{statistics.mean(latencies) * 1000:>10.1f} {p95 * 1000:>9.1f} {hits:>5} {misses:>7} {false_alarms:>13}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", type=Path, help="folder of 16-bit WAV recordings")
+    parser.add_argument("--google", action="store_true", help="also measure the Google recognizer (needs network)")
+    args = parser.parse_args()
+
+    fixtures = sorted(args.fixtures.glob("*.wav"))
+    if not fixtures:
+        parser.error(f"no WAV files in {args.fixtures}")
+
+    print(f"{'backend':>8} {'utterances':>11} {'rtf':>6} {'mean ms':>10} {'p95 ms':>9} {'hits':>5} {'misses':>7} {'false alarms':>13}")
+    run("sphinx", KeywordSpotter(WAKE_WORDS), fixtures)
+    if args.google:
+        run("google", GoogleBackend(), fixtures)
+
+
+if __name__ == "__main__":
+    main()
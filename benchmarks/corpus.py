@@ -0,0 +1,75 @@
+"""
+Synthetic corpus generators shared by the benchmarks.
+"""
+import csv
+import itertools
+import random
+from pathlib import Path
+from typing import Dict, List
+
+TEMPLATES = [
+    "what is the {} of {}",
+    "who invented the {} {}",
+    "how many {} are in a {}",
+    "why is the {} {}",
+    "where does the {} {} live",
+]
+
+
+def generate_commands(size: int, categories: int = 50) -> Dict[str, List[str]]:
+    """
+    Generate a synthetic command corpus with the given number of phrases.
+
+    Args:
+        size (int): Total number of command phrases.
+        categories (int): Number of categories to spread the phrases over.
+
+    Returns:
+        Dict[str, List[str]]: Command phrases grouped by category.
+    """
+    commands: Dict[str, List[str]] = {f"category_{i}": [] for i in range(categories)}
+    for i in range(size):
+        commands[f"category_{i % categories}"].append(f"synthetic command number {i}")
+    return commands
+
+
+def generate_q_and_a(size: int, vocabulary: int = 50_000, seed: int = 7) -> Dict[str, str]:
+    """
+    Generate a synthetic Q&A corpus with Zipf-like word frequencies.
+
+    Args:
+        size (int): Number of questions.
+        vocabulary (int): Number of distinct content words.
+        seed (int): Random seed.
+
+    Returns:
+        Dict[str, str]: Answers keyed by question.
+    """
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocabulary)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary)))
+    q_and_a: Dict[str, str] = {}
+    while len(q_and_a) < size:
+        first, second = rng.choices(words, cum_weights=cum_weights, k=2)
+        question = rng.choice(TEMPLATES).format(first, second)
+        q_and_a[question] = f"answer {len(q_and_a)}"
+    return q_and_a
+
+
+def write_corpus(folder: Path, commands: Dict[str, List[str]], q_and_a: Dict[str, str]) -> None:
+    """
+    Write a corpus as input.csv and q_and_a.csv in the folder.
+
+    Args:
+        folder (Path): The folder.
+        commands (Dict[str, List[str]]): Command phrases grouped by category.
+        q_and_a (Dict[str, str]): Answers keyed by question.
+    """
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(folder / "input.csv", "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        for category, phrases in commands.items():
+            for i, phrase in enumerate(phrases):
+                writer.writerow([category, phrase, f"reply {i} for {category}, Sir!"])
+    with open(folder / "q_and_a.csv", "w", newline="", encoding="utf-8") as file:
+        csv.writer(file).writerows(q_and_a.items())
@@ -0,0 +1,103 @@
+"""
+Stand-ins for the microphone, speakers and network services, so the assistant's
+own code can be timed on any machine.
+"""
+import time
+from concurrent.futures import Future
+from typing import Iterable, List
+
+from src.core.audio import AudioSourceExhausted
+from src.core.batch import StubCalendarService, StubWeatherService
+from src.core.constants import CALENDAR, WEATHER
+from src.core.recognizer import Recognizer
+from src.core.selection import ResponseSelector
+from src.core.warmup import UsageHistory
+
+
+class FakeSpeech:
+    """
+    Plays back a script of recognized utterances and records what is spoken, and when.
+    Every scripted command is preceded by a wake word, said on its own or in the same
+    breath as the command.
+    """
+
+    def __init__(
+        self,
+        script: Iterable[str] = (),
+        speak_seconds: float = 0.0,
+        recognize_seconds: float = 0.0,
+        one_breath: bool = False,
+    ):
+        """
+        Args:
+            script (Iterable[str]): Utterances returned by get_audio, in order.
+            speak_seconds (float): Time each spoken answer takes.
+            recognize_seconds (float): Time each utterance takes to be heard and recognized.
+            one_breath (bool): Say each command together with the wake word.
+        """
+        self.script = list(script)
+        self.position = 0
+        self.speak_seconds = speak_seconds
+        self.recognize_seconds = recognize_seconds
+        self.one_breath = one_breath
+        self.spoken: List[str] = []
+        # [start, end] of each turn, from the wake word to the last answer
+        self.turns: List[List[float]] = []
+
+    def start_listening(self) -> None:
+        pass
+
+    def prerender(self, texts) -> None:
+        return None
+
+    def listen_for_wake_word(self, ready=None) -> str:
+        if self.position >= len(self.script):
+            raise AudioSourceExhausted()
+        self.turns.append([time.perf_counter(), time.perf_counter()])
+        if self.recognize_seconds:
+            time.sleep(self.recognize_seconds)
+        if self.one_breath:
+            self.position += 1
+            return f"hey assistant {self.script[self.position - 1]}"
+        return "hey assistant"
+
+    def get_audio(self) -> str:
+        if self.position >= len(self.script):
+            raise AudioSourceExhausted()
+        if self.recognize_seconds:
+            time.sleep(self.recognize_seconds)
+        self.position += 1
+        return self.script[self.position - 1]
+
+    def speak_async(self, text: str, cache: bool = False) -> Future:
+        self.speak(text, cache)
+        future: Future = Future()
+        future.set_result(None)
+        return future
+
+    def speak(self, text: str, cache: bool = False) -> None:
+        if self.speak_seconds:
+            time.sleep(self.speak_seconds)
+        self.spoken.append(text)
+        if self.turns:
+            self.turns[-1][1] = time.perf_counter()
+
+    def turn_latencies(self) -> List[float]:
+        return [end - start for start, end in self.turns]
+
+
+def make_recognizer(speech: FakeSpeech, flow_latency: float = 0.0) -> Recognizer:
+    """
+    Create a Recognizer that talks to the fakes instead of devices and services.
+
+    Args:
+        speech (FakeSpeech): The speech stand-in.
+        flow_latency (float): Simulated network time of the calendar and weather flows.
+
+    Returns:
+        Recognizer: The recognizer.
+    """
+    recognizer = Recognizer(speech=speech, usage=UsageHistory(None), selector=ResponseSelector(None))  # type: ignore[arg-type]
+    recognizer.services[CALENDAR].instance = StubCalendarService(flow_latency)
+    recognizer.services[WEATHER].instance = StubWeatherService(flow_latency)
+    return recognizer
@@ -0,0 +1,271 @@
+"""
+Offline benchmark suite for the assistant's hot paths, at increasing corpus sizes:
+
+- init_replies load time, from the CSV files and from the snapshot
+- process_command dispatch throughput
+- Q&A lookup latency
+- end-to-end turn latency, from the wake word to the last spoken answer
+- the same with recognition and speaking delays, for commands said after the wake
+  word and for commands said in the same breath as the wake word
+- turn latency of compound commands triggering the calendar, time and weather flows
+  at once, with 50 ms of simulated network time per flow
+
+Speech, calendar and weather are replaced by the fakes in benchmarks/fakes.py, so
+no microphone, speakers or network are needed. Results are written as JSON and
+compared against a stored baseline; any metric that is worse than the baseline by
+more than the tolerance is reported and the suite exits with status 1.
+
+Usage:
+    python -m benchmarks.suite [--sizes 1000 10000 100000] [--output results.json]
+    python -m benchmarks.suite --update-baseline --repeat 3
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.corpus import generate_commands, generate_q_and_a, write_corpus
+from benchmarks.fakes import FakeSpeech, make_recognizer
+from src.core.logger import configure as configure_logging
+from src.core.logger import flush as flush_logging
+from src.data import commands as corpus
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+# Metrics where a higher value is better; for all others lower is better
+HIGHER_IS_BETTER = ("dispatch_per_s",)
+# Latency changes smaller than this are scheduler noise, however large the ratio
+NOISE_FLOOR_S = 0.001
+
+
+def percentiles_ms(samples: List[float]) -> Dict[str, float]:
+    p50, p95 = np.percentile(np.array(samples) * 1000, [50, 95])
+    return {"p50": float(p50), "p95": float(p95)}
+
+
+def timed(func: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def measure_init(folder: Path) -> Dict[str, float]:
+    corpus.INPUT_PATH = folder / "input.csv"
+    corpus.Q_AND_A_PATH = folder / "q_and_a.csv"
+    corpus.SNAPSHOT_PATH = folder / "corpus.snap"
+    csv_seconds = timed(lambda: corpus.init_replies())
+    compile_seconds = timed(lambda: corpus.init_replies(use_snapshot=True))
+    # A millisecond or so; the best of a few loads is steadier than one
+    snapshot_seconds = min(timed(lambda: corpus.init_replies(use_snapshot=True)) for _ in range(3))
+    return {
+        "init_csv_s": csv_seconds,
+        "init_snapshot_compile_s": compile_seconds,
+        "init_snapshot_s": snapshot_seconds,
+    }
+
+
+def command_mix(commands: Dict[str, List[str]], rng: random.Random, count: int) -> List[str]:
+    """
+    Utterances that exercise every dispatch path, questions excluded.
+    """
+    phrases = [phrase for category in commands.values() for phrase in category]
+    fixed = [
+        "what's the weather like",
+        "what time is it",
+        "what's next in my calendar",
+        "tell me a fun fact",
+        "sing me a song please",
+    ]
+    return [rng.choice(fixed) if i % 2 else rng.choice(phrases) for i in range(count)]
+
+
+def measure_dispatch(utterances: List[str], budget: float) -> float:
+    recognizer = make_recognizer(FakeSpeech())
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < budget:
+        for utterance in utterances:
+            recognizer.process_command(utterance)
+        calls += len(utterances)
+    return calls / (time.perf_counter() - start)
+
+
+def measure_qa(questions: List[str], rounds: int = 5) -> Dict[str, float]:
+    """
+    Q&A lookup latency percentiles: the median of each percentile over several rounds
+    after a warm-up round, since a single round of sub-millisecond lookups is noisy.
+    """
+    per_round: List[Dict[str, float]] = []
+    for round_number in range(rounds + 1):
+        samples = []
+        for question in questions:
+            start = time.perf_counter()
+            with corpus.lock:
+                corpus.q_and_a.get(question) or corpus.qa_index.best_answer(question)
+            samples.append(time.perf_counter() - start)
+        if round_number:
+            per_round.append(percentiles_ms(samples))
+    return {name: float(np.median([percentiles[name] for percentiles in per_round])) for name in per_round[0]}
+
+
+def measure_turns(utterances: List[str], questions: List[str], flow_latency: float) -> List[float]:
+    script: List[str] = []
+    for i, utterance in enumerate(utterances):
+        if i % 5 == 0:
+            script += ["i have a question", questions[i % len(questions)]]
+        else:
+            script.append(utterance)
+    speech = FakeSpeech(script)
+    make_recognizer(speech, flow_latency).start()
+    return speech.turn_latencies()
+
+
+def measure_wake_modes(utterances: List[str], recognize_seconds: float = 0.02) -> Dict[str, List[float]]:
+    """
+    Turn latencies with a wake word said alone, followed by "Yes, Sir?" and the
+    command, and with the command said in the same breath as the wake word.
+    """
+    latencies = {}
+    for mode, one_breath in (("two_step", False), ("one_breath", True)):
+        speech = FakeSpeech(utterances, speak_seconds=recognize_seconds, recognize_seconds=recognize_seconds, one_breath=one_breath)
+        make_recognizer(speech).start()
+        latencies[mode] = speech.turn_latencies()
+    return latencies
+
+
+def measure_compound(turns: int = 20, flow_latency: float = 0.05) -> List[float]:
+    """
+    Turn latencies of commands that trigger the calendar, time and weather flows at
+    once; about one flow latency when the flows run concurrently, not three.
+    """
+    speech = FakeSpeech(["what's on my calendar today, the time and the weather"] * turns)
+    make_recognizer(speech, flow_latency).start()
+    return speech.turn_latencies()
+
+
+def run_size(size: int, budget: float, flow_latency: float) -> Dict[str, float]:
+    rng = random.Random(size)
+    commands = generate_commands(size)
+    q_and_a = generate_q_and_a(size)
+    # Paraphrases: the question with its first word dropped
+    questions = [" ".join(question.split()[1:]) for question in rng.sample(list(q_and_a), min(200, size))]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folder = Path(temp_dir)
+        write_corpus(folder, commands, q_and_a)
+        results = measure_init(folder)
+
+        # Each phase starts once the records logged by the previous one are written out,
+        # so the listener thread does not compete with it
+        utterances = command_mix(commands, rng, 200)
+        flush_logging()
+        results["dispatch_per_s"] = measure_dispatch(utterances, budget)
+        flush_logging()
+        for name, value in measure_qa(questions).items():
+            results[f"qa_{name}_ms"] = value
+        flush_logging()
+        for name, value in percentiles_ms(measure_turns(utterances, questions, flow_latency)).items():
+            results[f"turn_{name}_ms"] = value
+        flush_logging()
+        for mode, samples in measure_wake_modes(utterances[:20]).items():
+            for name, value in percentiles_ms(samples).items():
+                results[f"turn_{mode}_{name}_ms"] = value
+        flush_logging()
+        for name, value in percentiles_ms(measure_compound()).items():
+            results[f"turn_compound_{name}_ms"] = value
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """
+    Find the metrics that are worse than the baseline by more than the tolerance;
+    latencies must also be worse by at least NOISE_FLOOR_S.
+
+    Args:
+        results (Dict[str, Dict[str, float]]): Metrics keyed by corpus size.
+        baseline (Dict[str, Dict[str, float]]): Baseline metrics keyed by corpus size.
+        tolerance (float): Allowed relative change, e.g. 0.3 for 30%.
+
+    Returns:
+        List[str]: A description of each regression.
+    """
+    regressions = []
+    for size, metrics in results.items():
+        for name, value in metrics.items():
+            expected = baseline.get(size, {}).get(name)
+            if not expected:
+                continue
+            change = value / expected - 1
+            worse = -change if name in HIGHER_IS_BETTER else change
+            seconds = (value - expected) / 1000 if name.endswith("_ms") else value - expected
+            if name not in HIGHER_IS_BETTER and seconds < NOISE_FLOOR_S:
+                continue
+            if worse > tolerance:
+                regressions.append(f"{name} at {size} rows: {value:.4g} vs baseline {expected:.4g} ({change:+.0%})")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'rows':>8} {'metric':<26} {'value':>12} {'baseline':>12} {'change':>8}")
+    for size, metrics in results.items():
+        for name, value in metrics.items():
+            expected = baseline.get(size, {}).get(name)
+            change = f"{value / expected - 1:+.0%}" if expected else ""
+            print(f"{size:>8} {name:<26} {value:>12.4g} {expected if expected is not None else '':>12.4} {change:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="corpus rows per file")
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds spent measuring dispatch throughput")
+    parser.add_argument("--flow-latency", type=float, default=0.0, help="simulated network seconds per flow")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"), help="where to write the results")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per size; each metric is the median over them")
+    args = parser.parse_args()
+    # No log file: its writes would compete with the measured code
+    configure_logging(path=None, console_level=logging.ERROR)
+
+    results = {}
+    for size in args.sizes:
+        runs = [run_size(size, args.budget, args.flow_latency) for _ in range(args.repeat)]
+        results[str(size)] = {name: float(np.median([run[name] for run in runs])) for name in runs[0]}
+    report = {
+        "environment": {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system()},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    baseline = {}
+    if args.baseline.exists():
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+    print_table(results, baseline)
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} REGRESSION(S) beyond {args.tolerance:.0%} of the baseline:", file=sys.stderr)
+        for regression in regressions:
+            print(f"  REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.tolerance:.0%} of the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,123 @@
+import time
+
+# Taken before the other imports so the startup report includes them
+STARTED_AT = time.perf_counter()
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from src.core.audio import StdinSource, WavFileSource
+from src.core.batch import BatchRunner, load_sessions, stub_services
+from src.core.constants import WAKE_WORDS
+from src.core.resilience import TURN_BUDGET
+from src.core.speech import create_partial_backend, create_wake_backend
+from src.core.tracing import MetricsExporter, tracer
 from src.data.commands import init_replies
+from src.data.watcher import CorpusWatcher
 from src.core.recognizer import Recognizer
-from src.core.logger import Logger
+from src.core.server import AssistantServer
+from src.core.logger import Logger, configure as configure_logging
+from src.core.warmup import StartupReport
 
 logger = Logger(__name__).get_logger()
 
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Jarvis-like voice assistant")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--batch",
+        metavar="PATH",
+        help="run headless over a transcript file (- for stdin, sessions separated by blank lines) or a directory of WAV files",
+    )
+    source.add_argument("--serve", type=int, metavar="PORT", help="serve text and audio/wav sessions over HTTP on this port instead of listening")
+    source.add_argument("--wav", type=Path, help="read audio input from a 16-bit WAV file instead of the microphone")
+    source.add_argument("--stdin", action="store_true", help="read raw 16-bit mono PCM audio input from stdin")
+    parser.add_argument("--sample-rate", type=int, default=16000, help="sample rate of the --stdin audio")
+    parser.add_argument(
+        "--wake-backend",
+        choices=["sphinx", "google"],
+        default="sphinx",
+        help="spot the wake word offline with pocketsphinx, or send every utterance to Google",
+    )
+    parser.add_argument(
+        "--partials",
+        action="store_true",
+        help="recognize speech offline while it is still going on and act on a command before the utterance ends",
+    )
+    parser.add_argument(
+        "--turn-budget",
+        type=float,
+        default=TURN_BUDGET,
+        help="seconds from hearing the command after which calls to Google and the weather APIs fail fast",
+    )
+    parser.add_argument("--trace-file", type=Path, help="trace each interaction and write stage latency percentiles to this JSON file")
+    parser.add_argument("--trace-port", type=int, help="trace each interaction and serve stage latency percentiles at http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--log-json", metavar="PATH", help="also write the log as JSON lines to this file")
+    parser.add_argument("--host", default="127.0.0.1", help="interface --serve listens on")
+    parser.add_argument("--workers", type=int, default=4, help="--batch sessions, or --serve flow calls, processed in parallel")
+    parser.add_argument("--batch-output", type=Path, help="write --batch turns as JSON lines to this file instead of stdout")
+    parser.add_argument("--stub-services", action="store_true", help="answer calendar and weather with canned replies in --batch and --serve mode")
+    return parser.parse_args()
+
+
+def run_batch(args: argparse.Namespace) -> None:
+    """
+    Replay the --batch input through the assistant, write each turn to the output and
+    the throughput and latency report to stderr.
+    """
+    wake_backend = create_wake_backend(WAKE_WORDS) if args.wake_backend == "sphinx" else None
+    sessions = load_sessions(args.batch, wake_backend=wake_backend)
+    services = stub_services() if args.stub_services else None
+    sink = open(args.batch_output, "w", encoding="utf-8") if args.batch_output else sys.stdout
+    try:
+        batch_report = BatchRunner(services, args.workers, sink).run(sessions)
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+    print(json.dumps(batch_report._asdict()), file=sys.stderr)
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.log_json:
+        configure_logging(json_path=args.log_json)
+    report = StartupReport(STARTED_AT)
+    report.mark("imports")
     try:
         logger.info("Initializing commands and replies")
-        init_replies()
+        init_replies(use_snapshot=True)
+        if args.batch:
+            run_batch(args)
+            sys.exit(0)
+        CorpusWatcher().start()
+        report.mark("corpus")
+
+        # Before --serve, so the sessions of the server are traced too
+        if args.trace_file or args.trace_port is not None:
+            tracer.enabled = True
+            MetricsExporter(tracer, args.trace_file, args.trace_port).start()
+
+        if args.serve is not None:
+            services = stub_services() if args.stub_services else None
+            asyncio.run(AssistantServer(args.host, args.serve, services, args.workers).serve_forever())
+            sys.exit(0)
+
+        source = None
+        if args.wav:
+            source = WavFileSource(args.wav)
+        elif args.stdin:
+            source = StdinSource(args.sample_rate)
+
+        wake_backend = create_wake_backend(WAKE_WORDS) if args.wake_backend == "sphinx" else None
 
         logger.info("Starting the recognizer")
-        recognizer = Recognizer()
+        partial_backend = create_partial_backend() if args.partials else None
+        recognizer = Recognizer(source, wake_backend, report, partial_backend=partial_backend, turn_budget=args.turn_budget)
+        recognizer.prerender_phrases()
         recognizer.start()
     except Exception as e:
-        logger.exception("An error occurred in the main application: %s", e)
\ No newline at end of file
+        logger.exception("An error occurred in the main application: %s", e)
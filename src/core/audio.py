@@ -0,0 +1,378 @@
+import queue
+import sys
+import threading
+import time
+import wave
+from abc import ABC, abstractmethod
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Deque, List, NamedTuple, Optional
+
+import numpy as np
+import speech_recognition as sr
+
+from src.core.logger import Logger
+
+logger = Logger(__name__).get_logger()
+
+SAMPLE_WIDTH = 2  # 16-bit PCM
+# Utterances kept for the listener; beyond this a live source drops the oldest
+MAX_QUEUED_UTTERANCES = 32
+
+
+class AudioSourceExhausted(Exception):
+    """
+    Raised when a finite audio source (a file or a closed stdin) has no more audio.
+    """
+
+
+class AudioSource(ABC):
+    """
+    A source of 16-bit mono PCM audio.
+    """
+
+    sample_rate = 16000
+    # Live sources capture in real time, so captured audio can overlap our own speech
+    live = False
+
+    @abstractmethod
+    def read(self, frames: int) -> bytes:
+        """
+        Read up to the given number of frames.
+
+        Args:
+            frames (int): Number of frames to read.
+
+        Returns:
+            bytes: The audio, or b"" once the source is exhausted.
+        """
+
+    def close(self) -> None:
+        pass
+
+
+class MicrophoneSource(AudioSource):
+    """
+    The default input device, opened once and kept open.
+    """
+
+    live = True
+
+    def __init__(self, sample_rate: int = 16000, device_index: Optional[int] = None):
+        import pyaudio
+
+        self.sample_rate = sample_rate
+        self.audio = pyaudio.PyAudio()
+        self.stream = self.audio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=sample_rate,
+            input=True,
+            input_device_index=device_index,
+            frames_per_buffer=1024,
+        )
+
+    def read(self, frames: int) -> bytes:
+        return self.stream.read(frames, exception_on_overflow=False)
+
+    def close(self) -> None:
+        self.stream.stop_stream()
+        self.stream.close()
+        self.audio.terminate()
+
+
+class WavFileSource(AudioSource):
+    """
+    A 16-bit WAV file; multi-channel audio is mixed down to mono.
+    """
+
+    def __init__(self, path: Path):
+        self.wav = wave.open(str(path), "rb")
+        if self.wav.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError(f"Only 16-bit WAV files are supported: {path}")
+        self.sample_rate = self.wav.getframerate()
+        self.channels = self.wav.getnchannels()
+
+    def read(self, frames: int) -> bytes:
+        data = self.wav.readframes(frames)
+        if self.channels > 1 and data:
+            samples = np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels)
+            data = samples.mean(axis=1).astype(np.int16).tobytes()
+        return data
+
+    def close(self) -> None:
+        self.wav.close()
+
+
+class StdinSource(AudioSource):
+    """
+    Raw 16-bit little-endian mono PCM from a binary stream, stdin by default.
+    """
+
+    def __init__(self, sample_rate: int = 16000, stream: Optional[BinaryIO] = None):
+        self.sample_rate = sample_rate
+        self.stream = stream or sys.stdin.buffer
+
+    def read(self, frames: int) -> bytes:
+        data = self.stream.read(frames * SAMPLE_WIDTH)
+        # Drop a trailing odd byte so samples stay aligned
+        return data[: len(data) - len(data) % SAMPLE_WIDTH]
+
+
+def frame_energy(frame: bytes) -> float:
+    """
+    Get the RMS energy of a 16-bit PCM frame.
+
+    Args:
+        frame (bytes): The audio frame.
+
+    Returns:
+        float: The RMS energy.
+    """
+    samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+
+
+class Segmenter:
+    """
+    Splits a continuous stream of frames into utterances using an energy threshold.
+    The threshold is calibrated on the first second of audio and keeps adapting to
+    the background noise between utterances.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        frame_ms: int = 30,
+        calibration: float = 1.0,
+        multiplier: float = 2.0,
+        min_energy: float = 100.0,
+        adapt_rate: float = 0.05,
+        pre_roll: float = 0.3,
+        pause: float = 0.8,
+        quick_pause: float = 0.4,
+        quick_after: float = 0.6,
+        min_phrase: float = 0.2,
+        max_phrase: float = 15.0,
+    ):
+        """
+        Args:
+            sample_rate (int): Sample rate of the frames.
+            frame_ms (int): Duration of one frame in milliseconds.
+            calibration (float): Seconds of audio used for the initial noise estimate.
+            multiplier (float): Speech threshold as a multiple of the noise energy.
+            min_energy (float): Lowest speech threshold, for digitally silent input.
+            adapt_rate (float): Weight of each non-speech frame in the noise estimate.
+            pre_roll (float): Seconds of audio kept before the detected speech start.
+            pause (float): Seconds of silence that end an utterance.
+            quick_pause (float): Seconds of silence that end an utterance once it has
+                quick_after seconds of speech; a short start may be a hesitation, a
+                longer phrase followed by a pause is most likely complete.
+            quick_after (float): Seconds of speech after which quick_pause applies.
+            min_phrase (float): Seconds of speech below which an utterance is discarded.
+            max_phrase (float): Seconds after which an utterance is cut off.
+        """
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        frames_per_second = 1000 / frame_ms
+        self.calibration_frames = int(calibration * frames_per_second)
+        self.multiplier = multiplier
+        self.min_energy = min_energy
+        self.adapt_rate = adapt_rate
+        self.pause_frames = max(1, int(pause * frames_per_second))
+        self.quick_pause_frames = min(self.pause_frames, max(1, int(quick_pause * frames_per_second)))
+        self.quick_after_frames = int(quick_after * frames_per_second)
+        self.min_voiced_frames = max(1, int(min_phrase * frames_per_second))
+        self.max_frames = int(max_phrase * frames_per_second)
+
+        self.noise_energy = 0.0
+        self.calibrated_frames = 0
+        self.ring: Deque[bytes] = deque(maxlen=max(1, int(pre_roll * frames_per_second)))
+        self.frames: List[bytes] = []
+        self.voiced_frames = 0
+        self.silent_frames = 0
+
+    @property
+    def threshold(self) -> float:
+        return max(self.noise_energy * self.multiplier, self.min_energy)
+
+    @property
+    def in_speech(self) -> bool:
+        return bool(self.frames)
+
+    def feed(self, frame: bytes) -> Optional[bytes]:
+        """
+        Process one frame.
+
+        Args:
+            frame (bytes): The audio frame.
+
+        Returns:
+            Optional[bytes]: A complete utterance, if this frame ended one.
+        """
+        energy = frame_energy(frame)
+        if self.calibrated_frames < self.calibration_frames:
+            self.calibrated_frames += 1
+            self.noise_energy += (energy - self.noise_energy) / self.calibrated_frames
+            self.ring.append(frame)
+            if self.calibrated_frames == self.calibration_frames:
+                logger.debug("Calibrated speech threshold: %.1f", self.threshold)
+            return None
+
+        if not self.in_speech:
+            if energy > self.threshold:
+                self.frames = list(self.ring) + [frame]
+                self.voiced_frames = 1
+                self.silent_frames = 0
+            else:
+                self.noise_energy += self.adapt_rate * (energy - self.noise_energy)
+                self.ring.append(frame)
+            return None
+
+        self.frames.append(frame)
+        if energy > self.threshold:
+            self.voiced_frames += 1
+            self.silent_frames = 0
+        else:
+            self.silent_frames += 1
+        pause_frames = self.quick_pause_frames if self.voiced_frames >= self.quick_after_frames else self.pause_frames
+        if self.silent_frames >= pause_frames or len(self.frames) >= self.max_frames:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        """
+        End the current utterance, e.g. when the stream ends.
+
+        Returns:
+            Optional[bytes]: The utterance, or None if it was too short or there was none.
+        """
+        frames, voiced = self.frames, self.voiced_frames
+        self.frames = []
+        self.voiced_frames = 0
+        self.silent_frames = 0
+        self.ring.clear()
+        if voiced < self.min_voiced_frames:
+            return None
+        return b"".join(frames)
+
+
+class Utterance(NamedTuple):
+    audio: sr.AudioData
+    # time.monotonic() when capture of the utterance started
+    started_at: float
+    # False for the audio so far of an utterance that is still going on
+    final: bool = True
+
+
+class CaptureStream:
+    """
+    Reads an audio source continuously in a background thread and queues the
+    utterances found in it, so no audio is lost between listening turns.
+    """
+
+    def __init__(
+        self,
+        source: AudioSource,
+        segmenter: Optional[Segmenter] = None,
+        partial_interval: Optional[float] = None,
+        max_queued: int = MAX_QUEUED_UTTERANCES,
+    ):
+        """
+        Args:
+            source (AudioSource): The audio to capture.
+            segmenter (Optional[Segmenter]): Splits the audio into utterances.
+            partial_interval (Optional[float]): Seconds between partial utterances queued
+                while speech goes on, or None to queue complete utterances only.
+            max_queued (int): Utterances kept until they are listened to. A live source
+                drops the oldest when the queue is full; other sources wait for room.
+        """
+        self.source = source
+        self.segmenter = segmenter or Segmenter(source.sample_rate)
+        frame_seconds = self.segmenter.frame_samples / source.sample_rate
+        self.partial_frames = max(1, round(partial_interval / frame_seconds)) if partial_interval else 0
+        self.utterances: "queue.Queue[Optional[Utterance]]" = queue.Queue(max_queued)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "CaptureStream":
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        frame_seconds = self.segmenter.frame_samples / self.source.sample_rate
+        started_at = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                frame = self.source.read(self.segmenter.frame_samples)
+                if not frame:
+                    self._emit(self.segmenter.flush(), started_at)
+                    break
+                was_in_speech = self.segmenter.in_speech
+                utterance = self.segmenter.feed(frame)
+                if not was_in_speech and self.segmenter.in_speech:
+                    started_at = time.monotonic() - frame_seconds * len(self.segmenter.frames)
+                self._emit(utterance, started_at)
+                if self.partial_frames and self.segmenter.in_speech and len(self.segmenter.frames) % self.partial_frames == 0:
+                    self._emit(b"".join(self.segmenter.frames), started_at, final=False)
+        except Exception as e:
+            logger.error("Audio capture stopped: %s", e)
+        finally:
+            self._put(None)
+
+    def _emit(self, data: Optional[bytes], started_at: float, final: bool = True) -> None:
+        if data:
+            self._put(Utterance(sr.AudioData(data, self.source.sample_rate, SAMPLE_WIDTH), started_at, final))
+
+    def _put(self, utterance: Optional[Utterance]) -> None:
+        if not self.source.live:
+            # Files and pipes are read faster than real time; wait for the listener to catch up
+            while not self._stop.is_set():
+                try:
+                    self.utterances.put(utterance, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+            return
+        while True:
+            try:
+                self.utterances.put_nowait(utterance)
+                return
+            except queue.Full:
+                # Nobody listened to it in time; what was said since matters more
+                try:
+                    self.utterances.get_nowait()
+                    logger.warning("Dropped the oldest unheard utterance")
+                except queue.Empty:
+                    pass
+
+    def next_utterance(self, timeout: Optional[float] = None, partials: bool = False) -> Utterance:
+        """
+        Wait for the next utterance.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait, or None to wait indefinitely.
+            partials (bool): Also return partial utterances; they are skipped otherwise.
+
+        Returns:
+            Utterance: The utterance.
+
+        Raises:
+            AudioSourceExhausted: If the source has ended.
+            queue.Empty: If the timeout passed without an utterance.
+        """
+        while True:
+            utterance = self.utterances.get(timeout=timeout)
+            if utterance is None:
+                # Leave the marker for any later caller
+                self.utterances.put(None)
+                raise AudioSourceExhausted()
+            if utterance.final or partials:
+                return utterance
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.source.close()
@@ -0,0 +1,306 @@
+import json
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, IO, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from src.core.audio import AudioSourceExhausted, CaptureStream, WavFileSource
+from src.core.constants import CALENDAR, WEATHER
+from src.core.logger import Logger
+from src.core.recognizer import Recognizer, default_services
+from src.core.selection import ResponseSelector
+from src.core.speech import GoogleBackend, RecognitionBackend, recognize_wake_utterance
+from src.core.warmup import LazyService, SerializedService, UsageHistory
+
+logger = Logger(__name__).get_logger()
+
+
+class TranscriptInput:
+    """
+    Utterances given as text, one per line, as the recognizer would have heard them.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        self.lines = iter(lines)
+
+    def next(self, wake: bool) -> str:
+        line = next(self.lines, None)
+        if line is None:
+            raise AudioSourceExhausted()
+        return line.strip().lower()
+
+
+class AudioInput:
+    """
+    Utterances segmented from a WAV file and recognized like microphone input.
+    """
+
+    def __init__(self, path: Path, backend: RecognitionBackend, wake_backend: Optional[RecognitionBackend] = None):
+        """
+        Args:
+            path (Path): The WAV file.
+            backend (RecognitionBackend): Recognizes commands.
+            wake_backend (Optional[RecognitionBackend]): Recognizes the wake word; the
+                command backend by default.
+        """
+        self.stream = CaptureStream(WavFileSource(path)).start()
+        self.backend = backend
+        self.wake_backend = wake_backend or backend
+
+    def next(self, wake: bool) -> str:
+        try:
+            audio = self.stream.next_utterance().audio
+        except AudioSourceExhausted:
+            self.stream.close()
+            raise
+        if wake:
+            return recognize_wake_utterance(audio, self.wake_backend, self.backend)
+        return self.backend.recognize(audio)
+
+
+class Turn(NamedTuple):
+    session: str
+    heard: List[str]
+    spoken: List[str]
+    # From the wake word being heard to the last answer being spoken
+    seconds: float
+
+
+class CaptureSpeech:
+    """
+    Stands in for Speech in batch mode: utterances come from an input instead of the
+    microphone, and everything the assistant says is captured per turn instead of
+    being spoken.
+    """
+
+    def __init__(self, session: str, source):
+        """
+        Args:
+            session (str): Name of the input, reported with each turn.
+            source (TranscriptInput | AudioInput): The utterances.
+        """
+        self.session = session
+        self.source = source
+        self.turns: List[Turn] = []
+        self.heard: List[str] = []
+        self.spoken: List[str] = []
+        self.started_at = 0.0
+        self.ended_at = 0.0
+
+    def _end_turn(self) -> None:
+        if self.spoken:
+            self.turns.append(Turn(self.session, self.heard, self.spoken, self.ended_at - self.started_at))
+        self.heard, self.spoken = [], []
+
+    def start_listening(self) -> None:
+        pass
+
+    def prerender(self, texts) -> None:
+        return None
+
+    def listen_for_wake_word(self, ready=None) -> str:
+        self._end_turn()
+        try:
+            text = self.source.next(wake=True)
+        except AudioSourceExhausted:
+            self._end_turn()
+            raise
+        self.started_at = self.ended_at = time.perf_counter()
+        self.heard.append(text)
+        return text
+
+    def get_audio(self) -> str:
+        text = self.source.next(wake=False)
+        self.heard.append(text)
+        return text
+
+    def speak_async(self, text: str, cache: bool = False) -> Future:
+        self.speak(text, cache)
+        future: Future = Future()
+        future.set_result(None)
+        return future
+
+    def speak(self, text: str, cache: bool = False) -> None:
+        self.spoken.append(text)
+        self.ended_at = time.perf_counter()
+
+
+class StubCalendarService:
+    """
+    Canned calendar answers, for runs without Google credentials.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def get_calendar_events(self, data: List[str]) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return "Upcoming events:\n2024-05-20T10:00:00+03:00: Standup"
+
+
+class StubWeatherService:
+    """
+    Canned weather answers, for runs without network access.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def get_weather_info(self, city: Optional[str] = None) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return f"The weather in {city or 'Cluj-Napoca'} is Clear sky with a temperature of 21°C."
+
+
+def stub_services(latency: float = 0.0) -> Dict[str, LazyService]:
+    """
+    Create flow services with the calendar and weather replaced by stubs.
+
+    Args:
+        latency (float): Simulated network seconds per stubbed call.
+
+    Returns:
+        Dict[str, LazyService]: The services keyed by keyword.
+    """
+    services = default_services()
+    services[CALENDAR].instance = StubCalendarService(latency)
+    services[WEATHER].instance = StubWeatherService(latency)
+    return services
+
+
+def read_transcript_sessions(stream: IO[str]) -> List[List[str]]:
+    """
+    Split a transcript into sessions at blank lines; lines starting with # are skipped.
+
+    Args:
+        stream (IO[str]): The transcript, one utterance per line.
+
+    Returns:
+        List[List[str]]: The utterances of each session.
+    """
+    sessions: List[List[str]] = [[]]
+    for line in stream:
+        line = line.strip()
+        if line.startswith("#"):
+            continue
+        if not line:
+            if sessions[-1]:
+                sessions.append([])
+            continue
+        sessions[-1].append(line)
+    return [session for session in sessions if session]
+
+
+class BatchReport(NamedTuple):
+    turns: int
+    seconds: float
+    turns_per_second: float
+    latency_ms: Dict[str, float]
+
+
+class BatchRunner:
+    """
+    Runs input sessions through wake word detection and process_command in parallel,
+    each with its own Recognizer, sharing the flow services between them. Calendar
+    commands are answered one at a time.
+    """
+
+    def __init__(
+        self,
+        services: Optional[Dict[str, LazyService]] = None,
+        workers: int = 4,
+        sink: Optional[IO[str]] = None,
+    ):
+        """
+        Args:
+            services (Optional[Dict[str, LazyService]]): Flow services shared by all sessions.
+            workers (int): Sessions processed at the same time.
+            sink (Optional[IO[str]]): Where each turn is written as a JSON line, if anywhere.
+        """
+        self.services = dict(services or default_services())
+        # The calendar client shares one httplib2 connection, which is not thread-safe,
+        # so the sessions' calendar commands run one at a time
+        if CALENDAR in self.services:
+            self.services[CALENDAR] = SerializedService(self.services[CALENDAR])
+        self.workers = workers
+        self.sink = sink
+        self.sink_lock = threading.Lock()
+        self.turns: List[Turn] = []
+
+    def _run_session(self, name: str, make_source: Callable[[], object]) -> List[Turn]:
+        speech = CaptureSpeech(name, make_source())
+        recognizer = Recognizer(  # type: ignore[arg-type]
+            speech=speech, services=self.services, usage=UsageHistory(None), selector=ResponseSelector(None)
+        )
+        recognizer.run()
+        if self.sink:
+            with self.sink_lock:
+                for turn in speech.turns:
+                    self.sink.write(json.dumps({**turn._asdict(), "seconds": round(turn.seconds, 6)}) + "\n")
+                self.sink.flush()
+        return speech.turns
+
+    def run(self, sessions: Dict[str, Callable[[], object]]) -> BatchReport:
+        """
+        Process the sessions.
+
+        Args:
+            sessions (Dict[str, Callable[[], object]]): Input factories keyed by session name.
+
+        Returns:
+            BatchReport: Throughput and turn latency percentiles.
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as executor:
+            futures = {name: executor.submit(self._run_session, name, make_source) for name, make_source in sessions.items()}
+            for name, future in futures.items():
+                try:
+                    self.turns.extend(future.result())
+                except Exception as e:
+                    logger.error("Session %s failed: %s", name, e)
+        seconds = time.perf_counter() - start
+
+        latency_ms: Dict[str, float] = {}
+        if self.turns:
+            samples = np.array([turn.seconds for turn in self.turns]) * 1000
+            latency_ms = {f"p{p}": float(v) for p, v in zip((50, 95, 99), np.percentile(samples, [50, 95, 99]))}
+        return BatchReport(len(self.turns), seconds, len(self.turns) / seconds if seconds else 0.0, latency_ms)
+
+
+def load_sessions(
+    path: str,
+    backend: Optional[RecognitionBackend] = None,
+    wake_backend: Optional[RecognitionBackend] = None,
+) -> Dict[str, Callable[[], object]]:
+    """
+    Find the input sessions: one per WAV file when the path is a directory, otherwise
+    one per blank-line separated group of a transcript file, or of stdin for "-".
+
+    Args:
+        path (str): The WAV directory, the transcript file or "-".
+        backend (Optional[RecognitionBackend]): Recognizes commands in WAV files.
+        wake_backend (Optional[RecognitionBackend]): Recognizes wake words in WAV files.
+
+    Returns:
+        Dict[str, Callable[[], object]]: Input factories keyed by session name.
+    """
+    if path != "-" and Path(path).is_dir():
+        command_backend = backend or GoogleBackend()
+        return {
+            wav.name: (lambda wav=wav: AudioInput(wav, command_backend, wake_backend))
+            for wav in sorted(Path(path).glob("*.wav"))
+        }
+
+    if path == "-":
+        groups = read_transcript_sessions(sys.stdin)
+        name = "stdin"
+    else:
+        with open(path, "r", encoding="utf-8") as file:
+            groups = read_transcript_sessions(file)
+        name = Path(path).name
+    return {f"{name}#{i}": (lambda lines=lines: TranscriptInput(lines)) for i, lines in enumerate(groups, 1)}
@@ -1,9 +1,155 @@
+import atexit
+import datetime
+import json
 import logging
+import logging.handlers
+import queue
+import threading
+from typing import Optional
+
 import colorlog
-import datetime
-import pytz
 import tzlocal
 
+FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+LOG_PATH = "app.log"
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, so they cannot change before the record is written,
+        # but leave formatting to the listener and skip the copy the base class makes
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+# Records are put on this queue by the calling thread and formatted and written by
+# one listener thread, so logging from the audio loop never waits on the disk
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_queue_handler = _QueueHandler(_queue)  # type: ignore[arg-type]
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+def _local_converter():
+    # Resolved once; the converter runs for every record
+    local_tz = tzlocal.get_localzone()
+
+    def converter(created: float):
+        return datetime.datetime.fromtimestamp(created, local_tz).timetuple()
+
+    return converter
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object per line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure(
+    path: Optional[str] = LOG_PATH,
+    json_path: Optional[str] = None,
+    max_bytes: int = MAX_BYTES,
+    backup_count: int = BACKUP_COUNT,
+    console_level: int = logging.INFO,
+) -> None:
+    """
+    Set up the process-wide log pipeline: a console handler, a size-rotated log file
+    and optionally a JSON-lines file, all fed from one queue. Calling it again
+    replaces the outputs.
+
+    Args:
+        path (Optional[str]): The log file, or None for no log file.
+        json_path (Optional[str]): The JSON-lines log file, or None for none.
+        max_bytes (int): Size at which a log file is rotated.
+        backup_count (int): Rotated files kept per log file.
+        console_level (int): Lowest level shown on the console.
+    """
+    global _listener
+    converter = _local_converter()
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(console_level)
+    color_formatter = colorlog.ColoredFormatter(
+        "%(log_color)s" + FORMAT,
+        log_colors={
+            'DEBUG': 'cyan',
+            'INFO': 'green',
+            'WARNING': 'yellow',
+            'ERROR': 'red',
+            'CRITICAL': 'bold_red',
+        },
+    )
+    color_formatter.converter = converter
+    console_handler.setFormatter(color_formatter)
+    handlers = [console_handler]
+
+    for file_path, formatter in ((path, logging.Formatter(FORMAT)), (json_path, JsonLinesFormatter())):
+        if not file_path:
+            continue
+        file_handler = logging.handlers.RotatingFileHandler(
+            file_path, mode="a", maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        file_handler.setLevel(logging.DEBUG)
+        formatter.converter = converter  # type: ignore[assignment]
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    with _lock:
+        if _listener:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+        _listener = logging.handlers.QueueListener(_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+
+def flush() -> None:
+    """
+    Wait until the queued records have been written, e.g. before timing something
+    that should not compete with the listener thread.
+    """
+    with _lock:
+        if _listener:
+            # Stopping drains the queue; the handlers stay open
+            _listener.stop()
+            _listener.start()
+
+
+def shutdown() -> None:
+    """
+    Write out the queued records and close the log files.
+    """
+    global _listener
+    with _lock:
+        if _listener:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+atexit.register(shutdown)
+
+
 class Logger:
     def __init__(self, name: str):
         """
@@ -13,49 +159,13 @@ class Logger:
             name (str): The name of the logger.
         """
         self.logger = logging.getLogger(name)
-        if not self.logger.hasHandlers():
+        if _listener is None:
+            configure()
+        if _queue_handler not in self.logger.handlers:
             self.logger.setLevel(logging.DEBUG)
-
-            # Create handlers
-            console_handler = logging.StreamHandler()
-            file_handler = logging.FileHandler("app.log", mode="a", encoding="utf-8")
-
-            # Set levels for handlers
-            console_handler.setLevel(logging.INFO)
-            file_handler.setLevel(logging.DEBUG)
-
-            # Create formatter with colors for console
-            color_formatter = colorlog.ColoredFormatter(
-                "%(log_color)s%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-                log_colors={
-                    'DEBUG': 'cyan',
-                    'INFO': 'green',
-                    'WARNING': 'yellow',
-                    'ERROR': 'red',
-                    'CRITICAL': 'bold_red',
-                },
-                datefmt=None  # Removed datefmt to use custom formatter
-            )
-
-            file_formatter = logging.Formatter(
-                "%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-                datefmt=None  # Removed datefmt to use custom formatter
-            )
-
-            # Add custom time converter for local timezone
-            def custom_time(*args):
-                utc_dt = datetime.datetime.utcnow().replace(tzinfo=pytz.utc)
-                local_tz = tzlocal.get_localzone()  # Dynamically get the local timezone
-                return utc_dt.astimezone(local_tz).timetuple()
-
-            logging.Formatter.converter = custom_time
-
-            console_handler.setFormatter(color_formatter)
-            file_handler.setFormatter(file_formatter)
-
-            # Add handlers to the logger
-            self.logger.addHandler(console_handler)
-            self.logger.addHandler(file_handler)
+            self.logger.addHandler(_queue_handler)
+            # Parent loggers may feed the same queue; don't write the record twice
+            self.logger.propagate = False
 
     def get_logger(self) -> logging.Logger:
         """
@@ -64,4 +174,4 @@ class Logger:
         Returns:
             logging.Logger: Configured logger instance.
         """
-        return self.logger
\ No newline at end of file
+        return self.logger
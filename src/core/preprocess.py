@@ -0,0 +1,172 @@
+from typing import NamedTuple, Tuple
+
+import numpy as np
+import speech_recognition as sr
+
+from src.core.audio import SAMPLE_WIDTH
+from src.core.logger import Logger
+
+logger = Logger(__name__).get_logger()
+
+
+class PreprocessStats(NamedTuple):
+    bytes_in: int
+    bytes_out: int
+    ms_in: float
+    ms_out: float
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+    @property
+    def saved_ms(self) -> float:
+        return self.ms_in - self.ms_out
+
+
+def lowpass_taps(cutoff: float, taps: int = 63) -> np.ndarray:
+    """
+    Design a windowed-sinc low-pass FIR filter.
+
+    Args:
+        cutoff (float): Cutoff frequency as a fraction of the sample rate (below 0.5).
+        taps (int): Filter length; odd, so the filter has no delay after "same" convolution.
+
+    Returns:
+        np.ndarray: The filter coefficients, summing to 1.
+    """
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return h / h.sum()
+
+
+class Preprocessor:
+    """
+    Prepares an utterance for recognition: leading and trailing silence is trimmed
+    using frame-level voice activity detection, and the audio is downsampled to the
+    rate the recognizer works at, so less audio is uploaded and decoded.
+    """
+
+    def __init__(
+        self,
+        target_rate: int = 16000,
+        frame_ms: int = 10,
+        multiplier: float = 3.0,
+        min_energy: float = 100.0,
+        peak_ratio: float = 0.1,
+        hangover: float = 0.1,
+        margin: float = 0.05,
+    ):
+        """
+        Args:
+            target_rate (int): Sample rate sent to the recognizer; higher rates are downsampled.
+            frame_ms (int): Duration of one VAD frame in milliseconds.
+            multiplier (float): Voice threshold as a multiple of the utterance's noise floor.
+            min_energy (float): Lowest voice threshold, for digitally silent input.
+            peak_ratio (float): Highest voice threshold as a fraction of the loudest frame,
+                so an utterance without pauses is never trimmed into its speech.
+            hangover (float): Seconds around each voiced frame also counted as voiced,
+                so quiet onsets and word endings are kept.
+            margin (float): Seconds of audio kept before and after the voiced part.
+        """
+        self.target_rate = target_rate
+        self.frame_ms = frame_ms
+        self.multiplier = multiplier
+        self.min_energy = min_energy
+        self.peak_ratio = peak_ratio
+        self.hangover = hangover
+        self.margin = margin
+
+    def voiced(self, samples: np.ndarray, sample_rate: int) -> np.ndarray:
+        """
+        Classify each frame as voiced or not.
+
+        Args:
+            samples (np.ndarray): 16-bit mono samples.
+            sample_rate (int): Their sample rate.
+
+        Returns:
+            np.ndarray: One bool per whole frame.
+        """
+        frame = max(1, sample_rate * self.frame_ms // 1000)
+        count = samples.size // frame
+        if not count:
+            return np.zeros(0, dtype=bool)
+        frames = samples[: count * frame].reshape(count, frame).astype(np.float32)
+        energy = np.sqrt(np.mean(frames * frames, axis=1))
+        noise = float(np.percentile(energy, 10))
+        threshold = max(self.min_energy, min(noise * self.multiplier, float(energy.max()) * self.peak_ratio))
+        voiced = energy > threshold
+        spread = int(self.hangover * 1000 / self.frame_ms)
+        if spread and voiced.any():
+            voiced = np.convolve(voiced, np.ones(2 * spread + 1), mode="same") > 0
+        return voiced
+
+    def trim(self, samples: np.ndarray, sample_rate: int) -> np.ndarray:
+        """
+        Cut leading and trailing silence, keeping the margin.
+
+        Args:
+            samples (np.ndarray): 16-bit mono samples.
+            sample_rate (int): Their sample rate.
+
+        Returns:
+            np.ndarray: The trimmed samples; unchanged when no frame is voiced.
+        """
+        voiced = np.flatnonzero(self.voiced(samples, sample_rate))
+        if not voiced.size:
+            return samples
+        frame = max(1, sample_rate * self.frame_ms // 1000)
+        margin = int(self.margin * sample_rate)
+        start = max(0, voiced[0] * frame - margin)
+        end = min(samples.size, (voiced[-1] + 1) * frame + margin)
+        return samples[start:end]
+
+    def resample(self, samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, int]:
+        """
+        Downsample to the target rate, low-pass filtering first to avoid aliasing.
+
+        Args:
+            samples (np.ndarray): 16-bit mono samples.
+            sample_rate (int): Their sample rate.
+
+        Returns:
+            Tuple[np.ndarray, int]: The samples and their sample rate; unchanged when
+                already at or below the target rate.
+        """
+        if sample_rate <= self.target_rate or not samples.size:
+            return samples, sample_rate
+        # Cut off a little below the new Nyquist frequency to leave room for the filter's roll-off
+        cutoff = 0.45 * self.target_rate / sample_rate
+        filtered = np.convolve(samples.astype(np.float32), lowpass_taps(cutoff), mode="same")
+        if sample_rate % self.target_rate == 0:
+            resampled = filtered[:: sample_rate // self.target_rate]
+        else:
+            count = int(samples.size * self.target_rate / sample_rate)
+            resampled = np.interp(np.arange(count) * (sample_rate / self.target_rate), np.arange(samples.size), filtered)
+        return np.clip(np.round(resampled), -32768, 32767).astype(np.int16), self.target_rate
+
+    def process(self, audio: sr.AudioData) -> Tuple[sr.AudioData, PreprocessStats]:
+        """
+        Trim and downsample an utterance.
+
+        Args:
+            audio (sr.AudioData): The utterance.
+
+        Returns:
+            Tuple[sr.AudioData, PreprocessStats]: The processed utterance, and the bytes
+                and milliseconds before and after.
+        """
+        raw = audio.get_raw_data(convert_width=SAMPLE_WIDTH)
+        samples = np.frombuffer(raw, dtype=np.int16)
+        trimmed = self.trim(samples, audio.sample_rate)
+        resampled, rate = self.resample(trimmed, audio.sample_rate)
+        data = resampled.tobytes()
+        stats = PreprocessStats(
+            len(raw),
+            len(data),
+            samples.size * 1000 / audio.sample_rate,
+            resampled.size * 1000 / rate,
+        )
+        logger.debug("Preprocessing saved %d bytes and %.0f ms of audio", stats.saved_bytes, stats.saved_ms)
+        return sr.AudioData(data, rate, SAMPLE_WIDTH), stats
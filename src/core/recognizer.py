@@ -1,52 +1,122 @@
-from importlib import import_module
-import json
-import random
-import time
+from typing import Dict, List, Optional
 
-import requests
-from src.core.constants import WAKE_WORDS, CALENDAR, FUNFACT, QUESTION_KEYWORD, TIME, WEATHER, TIME
+from src.core.audio import AudioSource, AudioSourceExhausted
+from src.core.constants import WAKE_WORDS
 from src.core.logger import Logger
-from src.core.speech import Speech
-from src.data.commands import commands, replies, q_and_a
+from src.core.registry import Flow, FlowRegistry, default_registry
+from src.core.resilience import TURN_BUDGET, resilience
+from src.core.selection import ResponseSelector
+from src.core.speech import RecognitionBackend, Speech, split_wake_word
+from src.core.tracing import tracer
+from src.core.tts_cache import PhraseCache
+from src.core.warmup import LazyService, StartupReport, UsageHistory, WarmupScheduler
+from src.data import commands as corpus
+
+# Spoken instead of the flows' own acknowledgements when a command triggers several
+COMBINED_ACKNOWLEDGEMENT = "On it, Sir!"
+
+# Fixed phrases spoken by the recognizer, worth having in the TTS cache up front;
+# the flows' acknowledgements are added from the registry
+ACKNOWLEDGEMENTS = [
+    "Yes, Sir?",
+    COMBINED_ACKNOWLEDGEMENT,
+    "I didn't hear you, Sir! Please repeat.",
+    "I don't have an answer for that, Sir!",
+    "I didn't hear your question, Sir!",
+    "I'm sorry, Sir! I did not understand your request, Sir!",
+]
+
+def default_services(registry: Optional[FlowRegistry] = None) -> Dict[str, LazyService]:
+    """
+    Create lazy handles to the flow services, keyed by flow name, in priority order.
+
+    Args:
+        registry (Optional[FlowRegistry]): The flows; the built-in and installed flows by default.
+    """
+    return (registry or default_registry()).create_services()
+
 
 class Recognizer:
-    def __init__(self):
+    def __init__(
+        self,
+        source: Optional[AudioSource] = None,
+        wake_backend: Optional[RecognitionBackend] = None,
+        report: Optional[StartupReport] = None,
+        speech: Optional[Speech] = None,
+        services: Optional[Dict[str, LazyService]] = None,
+        usage: Optional[UsageHistory] = None,
+        registry: Optional[FlowRegistry] = None,
+        partial_backend: Optional[RecognitionBackend] = None,
+        selector: Optional[ResponseSelector] = None,
+        turn_budget: Optional[float] = TURN_BUDGET,
+    ):
+        """
+        Args:
+            source (Optional[AudioSource]): Audio input; the microphone by default.
+            wake_backend (Optional[RecognitionBackend]): Recognizes the wake word; the
+                full recognizer by default.
+            report (Optional[StartupReport]): Startup timings, completed once listening
+                has started and the services are warm.
+            speech (Optional[Speech]): Speech input and output; created from the
+                source and wake backend by default.
+            services (Optional[Dict[str, LazyService]]): Flow services keyed by flow name,
+                to share them between recognizers.
+            usage (Optional[UsageHistory]): Flow use counts; user_data/usage.json by default.
+            registry (Optional[FlowRegistry]): The flows commands are dispatched to; the
+                built-in and installed flows by default.
+            partial_backend (Optional[RecognitionBackend]): Recognizes speech while it is
+                still going on, to act on a command before the utterance ends.
+            selector (Optional[ResponseSelector]): Picks replies and fun facts without
+                repeats; its state is kept in user_data/selection.json by default.
+            turn_budget (Optional[float]): Seconds from hearing the command after which
+                the turn's external calls fail fast, or None for no limit.
+        """
         self.logger = Logger(__name__).get_logger()
-        self.speech = Speech()
-        self.calendar_service = None
-        self.time_service = None
-        self.weather_service = None
-        self.city = None
-
-    def lazy_load_calendar_service(self):
-        if not self.calendar_service:
-            self.logger.debug("Lazy loading CalendarService")
-            calendar_module = import_module("src.flows.calendar_flow")
-            self.calendar_service = calendar_module.CalendarService()
-    
-    def lazy_load_time_service(self):
-        if not self.time_service:
-            self.logger.debug("Lazy loading TimeService")
-            time_module = import_module("src.flows.time_flow")
-            self.time_service = time_module.TimeService()
-    
-    def lazy_load_weather_service(self):
-        if not self.weather_service:
-            self.logger.debug("Lazy loading WeatherService")
-            weather_module = import_module("src.flows.weather_flow")
-            self.weather_service = weather_module.WeatherService()
-        
-        if not self.city:
-            try:
-                self.logger.debug("Fetching city from IP info service")
-                res = requests.get("https://ipinfo.io/", timeout=5)
-                res_dict = json.loads(res.text)
-                self.logger.debug(f"Response from IP info service: {res.status_code}: {res.text}")
-                self.city = res_dict.get("city", "Cluj-Napoca")
-            except requests.RequestException as e:
-                self.logger.error(f"Failed to fetch city from IP info service: {e}")
-                self.logger.debug("No city set, using default city")
-                self.city = "Cluj-Napoca"
+        self.speech = speech or Speech(
+            cache=PhraseCache(), source=source, wake_backend=wake_backend, partial_backend=partial_backend
+        )
+        self.report = report
+        self.usage = usage or UsageHistory()
+        self.selector = selector or ResponseSelector()
+        self.turn_budget = turn_budget
+        self.registry = registry or default_registry()
+        self.services = services or default_services(self.registry)
+
+    def prerender_phrases(self, include_replies: bool = True) -> None:
+        """
+        Render the acknowledgements, and optionally the predefined replies, into the
+        TTS cache in the background.
+
+        Args:
+            include_replies (bool): Also render the replies from input.csv.
+        """
+        def phrases():
+            yield from ACKNOWLEDGEMENTS
+            yield from self.registry.acknowledgements
+            if include_replies:
+                for category in list(corpus.replies):
+                    yield from corpus.replies.get(category, ())
+
+        self.speech.prerender(phrases())
+
+    def answer_question(self, question: str) -> None:
+        """
+        Answer a question from the Q&A corpus.
+
+        Args:
+            question (str): The recognized question text.
+        """
+        if not question:
+            self.logger.warning("No question detected")
+            self.speech.speak("I didn't hear your question, Sir!", cache=True)
+            return
+        self.logger.debug("Recognized question: %s", question)
+        with tracer.span("flow"), corpus.lock:
+            answer = corpus.q_and_a.get(question) or corpus.qa_index.best_answer(question)
+        if answer:
+            self.speech.speak(answer)
+        else:
+            self.speech.speak("I don't have an answer for that, Sir!", cache=True)
 
     def process_command(self, data: str) -> None:
         """
@@ -55,103 +125,122 @@ class Recognizer:
         Args:
             data (str): The recognized command text.
         """
-        self.logger.debug(f"Processing command: {data}")
+        self.logger.debug("Processing command: %s", data)
         if not data:
             self.logger.warning("No command detected")
-            self.speech.speak("I didn't hear you, Sir! Please repeat.")
+            self.speech.speak("I didn't hear you, Sir! Please repeat.", cache=True)
             return
 
-        def handle_calendar():
-            self.lazy_load_calendar_service()
-            self.logger.info("Calendar command detected")
-            self.speech.speak("Opening calendar, Sir!")
-            message_to_speak = self.calendar_service.get_calendar_events(data.split()) # type: ignore
-            self.speech.speak(message_to_speak)
-
-        def handle_time():
-            self.lazy_load_time_service()
-            self.logger.info("Time command detected")
-            self.speech.speak("Opening time, Sir!")
-            message_to_speak = self.time_service.get_time_info(data.split()) # type: ignore
-            self.speech.speak(message_to_speak)
-
-        def handle_weather():
-            self.lazy_load_weather_service()
-            self.logger.info("Weather command detected")
-            self.speech.speak("Opening weather, Sir!")
-            message_to_speak = self.weather_service.get_weather_info(self.city) # type: ignore
-            self.speech.speak(message_to_speak)
-
-
-        def handle_question():
-            self.logger.info("Question command detected")
-            self.speech.speak("What is your question, Sir?")
-            question = self.speech.get_audio()
-            if question:
-                self.logger.debug(f"Recognized question: {question}")
-                if question in q_and_a.keys():
-                    self.speech.speak(q_and_a[question])
-                else:
-                    for key in q_and_a.keys():
-                        if question in key:
-                            self.speech.speak(q_and_a[key])
-                            return
-                    self.speech.speak("I don't have an answer for that, Sir!")
-            else:
-                self.logger.warning("No question detected")
-                self.speech.speak("I didn't hear your question, Sir!")
-
-        def handle_funfact():
-            self.logger.info("Fun fact command detected")
-            self.speech.speak("Fetching a fun fact for you, Sir!")
-            choices = list(q_and_a.values())
-            random.shuffle(choices)
-            self.speech.speak(random.choice(choices))
-
-        def handle_predefined():
-            self.logger.info("Searching for matching command in predefined replies")
-            for command, reply_list in commands.items():
-                if data in reply_list:
-                    self.speech.speak(random.choice(replies[command]))
-                    return True
-            return False
-
-        # Command handler mapping
-        command_handlers = [
-            (lambda d: CALENDAR in d, handle_calendar),
-            (lambda d: TIME in d, handle_time),
-            (lambda d: WEATHER in d, handle_weather),
-            (lambda d: QUESTION_KEYWORD in d, handle_question),
-            (lambda d: FUNFACT in d, handle_funfact),
-        ]
-
-        for condition, handler in command_handlers:
-            if condition(data):
-                handler()
-                self.logger.info("Command processed successfully")
-                return
+        with tracer.span("dispatch"):
+            flows = self.registry.match_all(data)
+        if flows:
+            self.logger.info("%s command detected", " and ".join(flow.name for flow in flows).capitalize())
+            tracer.tag("+".join(flow.name for flow in flows))
+            self.run_flows(flows, data)
+            self.logger.info("Command processed successfully")
+            return
 
-        if handle_predefined():
+        self.logger.info("Searching for matching command in predefined replies")
+        with tracer.span("dispatch"), corpus.lock:
+            command = corpus.intent_index.match_phrase(data)
+            reply = self.selector.pick(command, corpus.replies[command], save=False) if command else None
+        if reply:
+            self.selector.save()
+            tracer.tag("predefined")
+            self.speech.speak(reply, cache=True)
             self.logger.info("Command processed successfully")
             return
 
         self.logger.warning("Unrecognized command")
-        self.speech.speak("I'm sorry, Sir! I did not understand your request, Sir!")
+        tracer.tag("unknown")
+        self.speech.speak("I'm sorry, Sir! I did not understand your request, Sir!", cache=True)
         self.logger.info("Command processed successfully")
 
+    def run_flows(self, flows: List[Flow], command: str) -> None:
+        """
+        Answer a command with the flows it triggered. Several flows run at the same time
+        on the registry's threads, sharing the turn's budget, and their replies are
+        spoken as one in priority order, so the answer takes as long as the slowest
+        flow. Flows that ask for more input run after it, one by one.
+
+        Args:
+            flows (List[Flow]): The triggered flows, in priority order.
+            command (str): The recognized command text.
+        """
+        concurrent = [flow for flow in flows if not flow.interactive]
+        if len(concurrent) == 1:
+            concurrent[0].run(self, command)
+        elif concurrent:
+            self.speech.speak_async(COMBINED_ACKNOWLEDGEMENT, cache=True)
+            interaction = tracer.current()
+            remaining = resilience.remaining()
+
+            def answer(flow: Flow) -> str:
+                with tracer.joined(interaction), resilience.budget(remaining):
+                    return flow.answer(self, command)
+
+            futures = [self.registry.executor.submit(answer, flow) for flow in concurrent]
+            replies = []
+            for flow, future in zip(concurrent, futures):
+                try:
+                    replies.append(future.result())
+                except Exception as e:
+                    # One broken flow must not cost the others their replies
+                    self.logger.error("%s flow failed: %s", flow.name.capitalize(), e)
+                    replies.append(f"Sorry, Sir, I can't get the {flow.name} right now.")
+            self.speech.speak("\n".join(replies))
+        for flow in flows:
+            if flow.interactive:
+                flow.run(self, command)
+
     def start(self) -> None:
         """
         Start the speech recognizer and process commands.
         """
-        self.logger.info(f"Waiting for wake words: {WAKE_WORDS}")
+        self.speech.start_listening()
+        self.logger.info("Waiting for wake words: %s", WAKE_WORDS)
+        if self.report:
+            self.report.mark("listening")
+        # Services are created in the background once listening, never before
+        WarmupScheduler(list(self.services.values()), self.usage, self.report).start()
+        self.run()
+
+    def can_act_on(self, text: str) -> bool:
+        """
+        Tell whether a partial transcript already holds a wake word and a command for a flow.
+
+        Args:
+            text (str): The partial transcript.
+        """
+        command = split_wake_word(text)
+        return bool(command) and self.registry.match(command) is not None
+
+    def run(self) -> None:
+        """
+        Wait for wake words and process the commands that follow, until the audio input ends.
+        """
         while True:
             try:
-                data = self.speech.get_audio()
-                if any(wake_word in data for wake_word in WAKE_WORDS):
-                    self.logger.info("Wake word detected")
-                    self.speech.speak("Yes, Sir?")
-                    command = self.speech.get_audio()
-                    self.process_command(command)
+                # Only the wake word spotter runs until a wake word is heard
+                data = self.speech.listen_for_wake_word(self.can_act_on)
+                command = split_wake_word(data)
+                if command is None:
+                    continue
+                self.logger.info("Wake word detected")
+                # One interaction per command, from listening to the answer
+                with tracer.interaction():
+                    if command:
+                        # Said in the same breath as the wake word; no need to prompt for it
+                        self.logger.info("Command given with the wake word: %s", command)
+                    else:
+                        self.speech.speak("Yes, Sir?", cache=True)
+                        command = self.speech.get_audio()
+                    # The budget starts once the command is heard, as in the server; the
+                    # time the user takes to say it is not the dependencies'
+                    with resilience.budget(self.turn_budget):
+                        self.process_command(command)
+            except AudioSourceExhausted:
+                self.logger.info("Audio input ended, stopping the recognizer")
+                return
             except Exception as e:
                 self.logger.error("Error in recognizer loop: %s", e)
-            time.sleep(1)
\ No newline at end of file
@@ -0,0 +1,275 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+
+from src.core.logger import Logger
+from src.core.resilience import DependencyError
+from src.core.tracing import tracer
+from src.core.warmup import LazyService
+from src.data.intent_index import KeywordMatcher
+
+if TYPE_CHECKING:
+    from src.core.recognizer import Recognizer
+
+logger = Logger(__name__).get_logger()
+
+# Entry point group other packages declare their flows in, e.g. with Poetry:
+# [tool.poetry.plugins."jarvis_assistant.flows"]
+# "reminders" = "reminders_plugin.flow:flow"
+ENTRY_POINT_GROUP = "jarvis_assistant.flows"
+
+
+def _handle(service: Any, command: str) -> str:
+    return service.handle(command)
+
+
+class Flow:
+    """
+    A capability of the assistant, triggered by any of its keywords occurring in a command.
+
+    The service behind the flow is named by a "module:attribute" factory and is only
+    imported and constructed when the flow first runs, or when it is warmed up.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keywords: Sequence[str],
+        priority: int = 100,
+        factory: Optional[str] = None,
+        respond: Callable[[Any, str], str] = _handle,
+        acknowledgement: Optional[str] = None,
+        warm: bool = False,
+        can_warm: Callable[[], bool] = lambda: True,
+        interactive: bool = False,
+        warm_priority: Optional[int] = None,
+    ):
+        """
+        Args:
+            name (str): The flow name, also its intent in traces and usage counts.
+            keywords (Sequence[str]): Lowercase phrases that trigger the flow.
+            priority (int): Lower runs first when a command contains keywords of several flows.
+            factory (Optional[str]): "module:attribute" of the service class or factory
+                function, or None for a flow without a service.
+            respond (Callable[[Any, str], str]): Gets the reply from the service and the
+                command; calls service.handle(command) by default.
+            acknowledgement (Optional[str]): Spoken while the service works on the reply.
+            warm (bool): Create the service in the background after startup instead of
+                when the flow first runs.
+            can_warm (Callable[[], bool]): Whether the service may be created in the
+                background right now, e.g. False while creating it would need user interaction.
+            interactive (bool): The flow asks the user for more input, so it cannot run
+                at the same time as other flows triggered by the same command.
+            warm_priority (Optional[int]): Lower is warmed up first while no use has been
+                recorded; the priority by default.
+        """
+        self.name = name
+        self.keywords = [keyword.lower() for keyword in keywords]
+        self.priority = priority
+        self.factory = factory
+        self.respond = respond
+        self.acknowledgement = acknowledgement
+        self.warm = warm
+        self.can_warm = can_warm
+        self.interactive = interactive
+        self.warm_priority = priority if warm_priority is None else warm_priority
+
+    def create_service(self) -> Optional[LazyService]:
+        """
+        Create the lazy handle to this flow's service; nothing is imported yet.
+
+        Returns:
+            Optional[LazyService]: The handle, or None for a flow without a service.
+        """
+        if not self.factory:
+            return None
+        module, _, attribute = self.factory.partition(":")
+        can_warm = self.can_warm if self.warm else lambda: False
+        return LazyService(self.name, module, attribute, can_warm=can_warm)
+
+    def answer(self, recognizer: "Recognizer", command: str) -> str:
+        """
+        Get the reply to a command that triggered this flow, without speaking it. May
+        run on a worker thread, next to the other flows triggered by the same command.
+
+        Args:
+            recognizer (Recognizer): The recognizer, for its services and usage history.
+            command (str): The recognized command text.
+
+        Returns:
+            str: The reply.
+        """
+        recognizer.usage.record(self.name)
+        with tracer.span("flow"):
+            try:
+                return self.respond(recognizer.services[self.name].get(), command)
+            except DependencyError as e:
+                logger.error("%s flow could not answer: %s", self.name.capitalize(), e)
+                return f"Sorry, Sir, I can't get the {self.name} right now."
+
+    def run(self, recognizer: "Recognizer", command: str) -> None:
+        """
+        Answer a command that triggered this flow.
+
+        Args:
+            recognizer (Recognizer): The recognizer, for its speech, services and usage history.
+            command (str): The recognized command text.
+        """
+        if self.acknowledgement:
+            recognizer.speech.speak_async(self.acknowledgement, cache=True)
+        recognizer.speech.speak(self.answer(recognizer, command))
+
+
+class FlowRegistry:
+    """
+    The flows the assistant can dispatch to. Registering a flow recompiles the keyword
+    automaton and the keyword to flow table once, so dispatching a command is a
+    single pass over its text however many flows there are.
+    """
+
+    def __init__(self, flows: Sequence[Flow] = (), max_workers: int = 8):
+        """
+        Args:
+            flows (Sequence[Flow]): Flows to register.
+            max_workers (int): Threads running the flows of commands that trigger several.
+        """
+        self.flows: Dict[str, Flow] = {}
+        self.table: Dict[str, Flow] = {}
+        self.matcher = KeywordMatcher([])
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.register(*flows)
+
+    def register(self, *flows: Flow) -> None:
+        """
+        Register flows, replacing registered flows of the same name.
+
+        Args:
+            *flows (Flow): The flows.
+        """
+        for flow in flows:
+            self.flows[flow.name] = flow
+        self._compile()
+
+    def _compile(self) -> None:
+        # Keywords in flow priority order; registration order breaks ties, and the
+        # first flow to claim a keyword keeps it
+        table: Dict[str, Flow] = {}
+        ordered = sorted(enumerate(self.flows.values()), key=lambda item: (item[1].priority, item[0]))
+        for _, flow in ordered:
+            for keyword in flow.keywords:
+                table.setdefault(keyword, flow)
+        self.table = table
+        self.matcher = KeywordMatcher(list(table))
+
+    def load_entry_points(self, group: str = ENTRY_POINT_GROUP) -> int:
+        """
+        Register the flows other installed packages declare under the entry point group.
+        Each entry point refers to a Flow, or to a list of them. A broken entry point, or
+        one that refers to anything else, is logged and skipped.
+
+        Args:
+            group (str): The entry point group.
+
+        Returns:
+            int: The number of flows registered.
+        """
+        from importlib.metadata import entry_points
+
+        found = entry_points()
+        # entry_points() returns a dict of groups before Python 3.10
+        points = found.select(group=group) if hasattr(found, "select") else found.get(group, [])  # type: ignore[attr-defined]
+        flows: List[Flow] = []
+        for point in points:
+            try:
+                loaded = point.load()
+                loaded = list(loaded) if isinstance(loaded, (list, tuple)) else [loaded]
+                for flow in loaded:
+                    if not isinstance(flow, Flow):
+                        raise TypeError(f"{flow!r} is not a Flow")
+                flows.extend(loaded)
+            except Exception as e:
+                logger.error("Could not load flow entry point %s: %s", point.name, e)
+        self.register(*flows)
+        return len(flows)
+
+    def match(self, text: str) -> Optional[Flow]:
+        """
+        Get the flow triggered by a command.
+
+        Args:
+            text (str): The recognized command text.
+
+        Returns:
+            Optional[Flow]: The highest-priority flow with a keyword in the text, or None.
+        """
+        keyword = self.matcher.first(text)
+        return self.table[keyword] if keyword else None
+
+    def match_all(self, text: str) -> List[Flow]:
+        """
+        Get every flow triggered by a command, e.g. "the time and the weather".
+
+        Args:
+            text (str): The recognized command text.
+
+        Returns:
+            List[Flow]: The flows with a keyword in the text, in priority order.
+        """
+        flows: List[Flow] = []
+        for keyword in self.matcher.find_all(text):
+            flow = self.table[keyword]
+            if flow not in flows:
+                flows.append(flow)
+        return flows
+
+    def create_services(self) -> Dict[str, LazyService]:
+        """
+        Create lazy handles to the flows' services, in warm-up priority order.
+
+        Returns:
+            Dict[str, LazyService]: The services keyed by flow name.
+        """
+        services: Dict[str, LazyService] = {}
+        for flow in sorted(self.flows.values(), key=lambda flow: flow.warm_priority):
+            service = flow.create_service()
+            if service is not None:
+                services[flow.name] = service
+        return services
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="flow")
+            return self._executor
+
+    @property
+    def acknowledgements(self) -> List[str]:
+        return [flow.acknowledgement for flow in self.flows.values() if flow.acknowledgement]
+
+
+_default_registry: Optional[FlowRegistry] = None
+_default_lock = threading.Lock()
+
+
+def default_registry() -> FlowRegistry:
+    """
+    Get the process-wide registry of the built-in flows and the flows installed
+    packages declare as entry points, created on first use.
+
+    Returns:
+        FlowRegistry: The registry.
+    """
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            from src.flows.builtin import BUILTIN_FLOWS
+
+            registry = FlowRegistry(BUILTIN_FLOWS)
+            count = registry.load_entry_points()
+            if count:
+                logger.info("Registered %d flows from entry points", count)
+            _default_registry = registry
+        return _default_registry
@@ -0,0 +1,308 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set, TypeVar
+
+from src.core.logger import Logger
+
+logger = Logger(__name__).get_logger()
+
+# Dependencies of the assistant, each with its own circuit breaker
+GOOGLE_SPEECH = "google speech"
+GOOGLE_CALENDAR = "google calendar"
+OPENWEATHERMAP = "openweathermap"
+IPINFO = "ipinfo"
+
+# Seconds from hearing the command until external calls of the turn fail fast
+TURN_BUDGET = 12.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+T = TypeVar("T")
+
+
+class DependencyError(Exception):
+    """
+    An external dependency failed, timed out, or was not called because its circuit is open.
+    """
+
+    def __init__(self, dependency: str, reason: str):
+        super().__init__(f"{dependency}: {reason}")
+        self.dependency = dependency
+
+
+class CircuitOpen(DependencyError):
+    def __init__(self, dependency: str):
+        super().__init__(dependency, "circuit open, failing fast")
+
+
+class DeadlineExceeded(DependencyError):
+    def __init__(self, dependency: str, reason: str = "timed out"):
+        super().__init__(dependency, reason)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency after consecutive failures. While open, calls fail
+    at once; after the reset timeout one trial call is let through, and its outcome
+    closes the circuit again or keeps it open for another reset timeout.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            name (str): The dependency.
+            failure_threshold (int): Consecutive failures that open the circuit.
+            reset_timeout (float): Seconds the circuit stays open before a trial call.
+            clock (Callable[[], float]): Monotonic time source.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        """
+        Tell whether a call may be made now; in the half-open state only one may.
+        """
+        with self.lock:
+            state = self._state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info("Circuit for %s closed", self.name)
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.warning("Circuit for %s opened after %d failures", self.name, self.failures)
+                self.opened_at = self.clock()
+            self.trial_running = False
+
+    def release(self) -> None:
+        """
+        End a call that told nothing about the dependency, e.g. one cut short by the
+        turn budget; in the half-open state the next call is the trial.
+        """
+        with self.lock:
+            self.trial_running = False
+
+
+class Resilience:
+    """
+    Guards the calls to external dependencies: a circuit breaker per dependency, an
+    optional timeout with hedged retries, and a latency budget shared by all calls
+    of the current turn, so a dependency that is down costs a turn its budget at
+    most, and nothing at all once its circuit is open.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        max_workers: int = 16,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open a dependency's circuit.
+            reset_timeout (float): Seconds an open circuit waits before a trial call.
+            max_workers (int): Threads running calls that have a timeout or are hedged.
+            clock (Callable[[], float]): Monotonic time source of the circuit breakers.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_workers = max_workers
+        self.clock = clock
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        """
+        Get the circuit breaker of a dependency, creating it on first use.
+
+        Args:
+            name (str): The dependency.
+        """
+        with self.lock:
+            if name not in self.breakers:
+                self.breakers[name] = CircuitBreaker(name, self.failure_threshold, self.reset_timeout, self.clock)
+            return self.breakers[name]
+
+    def reset(self) -> None:
+        """
+        Forget the state of all circuit breakers.
+        """
+        with self.lock:
+            self.breakers = {}
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="dependency")
+            return self._executor
+
+    @contextmanager
+    def budget(self, seconds: Optional[float], restart: bool = False) -> Iterator[None]:
+        """
+        Limit the time the external calls made by this thread in the block may take
+        together. Nested budgets cannot extend the outer one, unless they restart it.
+
+        Args:
+            seconds (Optional[float]): The budget, or None for no limit.
+            restart (bool): Replace the outer budget instead of nesting in it, e.g. while
+                waiting for the user and after they have answered a follow-up question.
+        """
+        outer = getattr(self.local, "deadline", None)
+        deadline = None if restart else outer
+        if seconds is not None:
+            end = time.monotonic() + seconds
+            deadline = end if deadline is None else min(end, deadline)
+        self.local.deadline = deadline
+        try:
+            yield
+        finally:
+            self.local.deadline = outer
+
+    def remaining(self) -> Optional[float]:
+        """
+        Seconds left of this thread's budget, or None without one.
+        """
+        deadline = getattr(self.local, "deadline", None)
+        return None if deadline is None else deadline - time.monotonic()
+
+    def call(
+        self,
+        dependency: str,
+        func: Callable[[], T],
+        timeout: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+        attempts: int = 1,
+    ) -> T:
+        """
+        Call a dependency through its circuit breaker. Any exception raised by the
+        function counts as a failure of the dependency.
+
+        Without a timeout or hedging the function runs on the calling thread, for
+        clients that must not be used from two threads at once; the turn budget then
+        only keeps it from starting once spent. Otherwise it runs on a worker thread
+        and is waited for until the timeout or the end of the budget, whichever comes
+        first. A failed attempt is retried at once, and an attempt still running after
+        hedge_after seconds is raced by another, up to the number of attempts.
+
+        Args:
+            dependency (str): The dependency, e.g. OPENWEATHERMAP.
+            func (Callable[[], T]): Makes the call; must be safe to run more than once.
+            timeout (Optional[float]): Seconds to wait for a result, over all attempts.
+            hedge_after (Optional[float]): Seconds after which a slow attempt is raced.
+            attempts (int): Calls made at most.
+
+        Returns:
+            T: The result of the first attempt that succeeded.
+
+        Raises:
+            CircuitOpen: If the dependency's circuit is open.
+            DeadlineExceeded: If the budget is spent, or no attempt succeeded in time;
+                only the dependency's own timeout counts as a failure of it.
+            DependencyError: If every attempt failed.
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(dependency, "turn budget spent")
+        breaker = self.breaker(dependency)
+        if not breaker.allow():
+            raise CircuitOpen(dependency)
+
+        if timeout is None and hedge_after is None and attempts == 1:
+            try:
+                result = func()
+            except Exception as e:
+                breaker.record_failure()
+                raise DependencyError(dependency, str(e)) from e
+            breaker.record_success()
+            return result
+
+        # A call cut short by the turn budget says nothing about the dependency
+        budget_bound = remaining is not None and (timeout is None or remaining < timeout)
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        now = time.monotonic()
+        deadline = None if timeout is None else now + timeout
+        hedge_at = None if hedge_after is None else now + hedge_after
+        pending: Set[Future] = {self.executor.submit(func)}
+        started = 1
+        errors: List[BaseException] = []
+        while True:
+            waits = []
+            if deadline is not None:
+                waits.append(deadline - time.monotonic())
+            if hedge_at is not None and started < attempts:
+                waits.append(hedge_at - time.monotonic())
+            done, pending = wait(pending, timeout=max(0.0, min(waits)) if waits else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    breaker.record_success()
+                    return future.result()
+                logger.warning("Call to %s failed: %s", dependency, error)
+                errors.append(error)
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                if budget_bound:
+                    breaker.release()
+                    raise DeadlineExceeded(dependency, "turn budget spent")
+                breaker.record_failure()
+                raise DeadlineExceeded(dependency, f"no answer within {timeout:.1f} s")
+            if started < attempts and (done or (hedge_at is not None and now >= hedge_at)):
+                if not done:
+                    logger.info("Hedging a slow call to %s", dependency)
+                pending.add(self.executor.submit(func))
+                started += 1
+                hedge_at = None if hedge_after is None else now + hedge_after
+            elif not pending:
+                breaker.record_failure()
+                raise DependencyError(dependency, str(errors[-1])) from errors[-1]
+
+
+# The process-wide instance; circuit breakers are shared by all sessions
+resilience = Resilience()
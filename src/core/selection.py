@@ -0,0 +1,185 @@
+import json
+import os
+import random
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.core.logger import Logger
+
+logger = Logger(__name__).get_logger()
+
+SELECTION_PATH = Path(__file__).parent.parent.parent / "user_data" / "selection.json"
+
+ROUNDS = 4
+
+
+def _mix(value: int, key: int) -> int:
+    value = ((value ^ key) * 0x45D9F3B) & 0xFFFFFFFF
+    return value ^ (value >> 16)
+
+
+class FeistelPermutation:
+    """
+    A pseudo-random permutation of range(size), computed one position at a time
+    with a Feistel network, so the shuffled order of a pool of any size takes no
+    memory and any position of it is found in O(1).
+    """
+
+    def __init__(self, size: int, seed: int):
+        """
+        Args:
+            size (int): Number of items permuted.
+            seed (int): Selects the permutation.
+        """
+        self.size = size
+        # An even number of bits, so the network works on a domain of less than 4 * size
+        # and cycle walking back into range takes fewer than 4 steps on average
+        bits = max(2, (size - 1).bit_length())
+        self.half = (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
+        rng = random.Random(seed)
+        self.keys = [rng.getrandbits(32) for _ in range(ROUNDS)]
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half, value & self.mask
+        for key in self.keys:
+            left, right = right, left ^ (_mix(right, key) & self.mask)
+        return (left << self.half) | right
+
+    def __getitem__(self, position: int) -> int:
+        value = self._encrypt(position)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class ShuffleBag:
+    """
+    Draws every item of a pool once in a random order before starting over in a new
+    order. Items drawn recently are not drawn again at the start of the next round.
+    """
+
+    def __init__(self, size: int, memory: int = 8, seed: Optional[int] = None, position: int = 0, recent: Sequence[int] = ()):
+        """
+        Args:
+            size (int): Number of items in the pool.
+            memory (int): How many of the last drawn items are not repeated across rounds.
+            seed (Optional[int]): Order of the current round; random by default.
+            position (int): Items of the current round already drawn.
+            recent (Sequence[int]): The last items drawn, oldest first.
+        """
+        self.size = size
+        self.memory = min(memory, size - 1)
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.position = position
+        self.recent = [index for index in recent if index < size][-self.memory:] if self.memory else []
+        self.order = FeistelPermutation(size, self.seed)
+
+    def draw(self) -> int:
+        """
+        Draw the next item.
+
+        Returns:
+            int: The index of the item in the pool.
+        """
+        while True:
+            if self.position >= self.size:
+                self.seed = random.getrandbits(32)
+                self.order = FeistelPermutation(self.size, self.seed)
+                self.position = 0
+            index = self.order[self.position]
+            self.position += 1
+            # Only possible early in a round, so at most `memory` items are skipped per round
+            if index not in self.recent:
+                break
+        if self.memory:
+            self.recent.append(index)
+            del self.recent[: -self.memory]
+        return index
+
+    def state(self) -> List[object]:
+        return [self.size, self.seed, self.position, self.recent]
+
+
+class ResponseSelector:
+    """
+    Picks responses from pools such as the replies of a category or the fun facts,
+    without repeating one until the whole pool has been heard. Each pick is O(1) in
+    the size of the pool, and where each pool is in its round is persisted across runs.
+    """
+
+    def __init__(self, path: Optional[Path] = SELECTION_PATH, memory: int = 8):
+        """
+        Args:
+            path (Optional[Path]): File the state is kept in, or None to keep it in memory.
+            memory (int): How many of the last picks of a pool are not repeated across rounds.
+        """
+        self.path = path
+        self.memory = memory
+        self.bags: Dict[str, ShuffleBag] = {}
+        self.lock = threading.Lock()
+        self.saved: Dict[str, Tuple[int, int, int, List[int]]] = {}
+        if path and path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    for name, (size, seed, position, recent) in json.load(file).items():
+                        self.saved[str(name)] = (int(size), int(seed), int(position), [int(index) for index in recent])
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                logger.warning("Ignoring unreadable selection state %s: %s", path, e)
+
+    def _bag(self, pool: str, size: int) -> ShuffleBag:
+        bag = self.bags.get(pool)
+        if bag is not None and bag.size == size:
+            return bag
+        saved = self.saved.pop(pool, None)
+        if saved is not None and saved[0] == size:
+            bag = ShuffleBag(size, self.memory, saved[1], saved[2], saved[3])
+        else:
+            # A new pool, or one that changed size: start a new round
+            recent = bag.recent if bag is not None else saved[3] if saved is not None else ()
+            bag = ShuffleBag(size, self.memory, recent=recent)
+        self.bags[pool] = bag
+        return bag
+
+    def pick(self, pool: str, items: Sequence[str], save: bool = True) -> Optional[str]:
+        """
+        Pick the next response from a pool.
+
+        Args:
+            pool (str): Name of the pool, e.g. the reply category.
+            items (Sequence[str]): The responses in the pool; must support O(1) indexing.
+            save (bool): Save the state right away. Pass False while holding a lock other
+                threads wait on, and call save() once it is released.
+
+        Returns:
+            Optional[str]: The response, or None if the pool is empty.
+        """
+        if not items:
+            return None
+        with self.lock:
+            index = self._bag(pool, len(items)).draw()
+        if save:
+            self.save()
+        return items[index]
+
+    def save(self) -> None:
+        """
+        Save where each pool is in its round, if the selector has a file.
+        """
+        if not self.path:
+            return
+        with self.lock:
+            state = {name: bag.state() for name, bag in self.bags.items()}
+            state.update({name: list(saved) for name, saved in self.saved.items()})
+            # Written under the lock, so a later state is never replaced by an earlier one
+            temp_path = self.path.with_suffix(".tmp")
+            try:
+                with open(temp_path, "w", encoding="utf-8") as file:
+                    json.dump(state, file)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                logger.warning("Could not save the selection state: %s", e)
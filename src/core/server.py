@@ -0,0 +1,294 @@
+import asyncio
+import io
+import json
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import speech_recognition as sr
+
+from src.core.constants import CALENDAR
+from src.core.logger import Logger
+from src.core.recognizer import Recognizer, default_services
+from src.core.resilience import resilience
+from src.core.selection import ResponseSelector
+from src.core.speech import GoogleBackend, RecognitionBackend
+from src.core.tracing import tracer
+from src.core.warmup import LazyService, SerializedService, UsageHistory, WarmupScheduler
+
+logger = Logger(__name__).get_logger()
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    204: "No Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class AwaitingInput(Exception):
+    """
+    Raised by SessionSpeech when a flow asks for another utterance, which in server
+    mode arrives with the session's next turn.
+    """
+
+
+class SessionSpeech:
+    """
+    Speech of one server session: replies are collected for the HTTP response
+    instead of being spoken.
+    """
+
+    def __init__(self):
+        self.replies: List[str] = []
+
+    def start_listening(self) -> None:
+        pass
+
+    def prerender(self, texts) -> None:
+        return None
+
+    def get_audio(self) -> str:
+        raise AwaitingInput()
+
+    def speak_async(self, text: str, cache: bool = False) -> Future:
+        self.speak(text, cache)
+        future: Future = Future()
+        future.set_result(None)
+        return future
+
+    def speak(self, text: str, cache: bool = False) -> None:
+        self.replies.append(text)
+
+
+class Session:
+    def __init__(self, session_id: str, services: Dict[str, LazyService], usage: UsageHistory):
+        self.id = session_id
+        self.speech = SessionSpeech()
+        self.recognizer = Recognizer(  # type: ignore[arg-type]
+            speech=self.speech, services=services, usage=usage, selector=ResponseSelector(None)
+        )
+        # Set when the last turn asked a question, e.g. "What is your question, Sir?"
+        self.awaiting_question = False
+        self.last_seen = time.monotonic()
+        # One turn at a time per session; other sessions are not held up
+        self.lock = asyncio.Lock()
+
+
+class AssistantServer:
+    """
+    Serves the assistant to many clients over HTTP on one asyncio event loop. Each
+    session has its own conversation state, while the flow services and their caches
+    are shared by all sessions. Flow calls block, so they run on a bounded thread pool.
+
+    Endpoints:
+        POST /sessions                   -> 201 {"session": id}
+        POST /sessions/<id>/turns        -> 200 {"heard", "replies", "awaiting"}; the body
+                                            is {"text": ...} JSON or audio/wav
+        DELETE /sessions/<id>            -> 204
+        GET /health                      -> 200 {"sessions", "pending"}
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        services: Optional[Dict[str, LazyService]] = None,
+        workers: int = 8,
+        max_pending: int = 1024,
+        backend: Optional[RecognitionBackend] = None,
+        usage: Optional[UsageHistory] = None,
+        idle_timeout: float = 600.0,
+        max_body: int = 10 * 1024 * 1024,
+    ):
+        """
+        Args:
+            host (str): The interface to listen on.
+            port (int): The port, or 0 for any free port.
+            services (Optional[Dict[str, LazyService]]): Flow services shared by all sessions.
+            workers (int): Threads running flow calls and speech recognition.
+            max_pending (int): Turns queued or running before new ones are refused with 503.
+            backend (Optional[RecognitionBackend]): Recognizes audio/wav turns; Google by default.
+            usage (Optional[UsageHistory]): Flow use counts of all sessions; user_data/usage.json by default.
+            idle_timeout (float): Seconds after which an unused session or connection is dropped.
+            max_body (int): Largest accepted request body in bytes.
+        """
+        self.host = host
+        self.port = port
+        self.services = dict(services or default_services())
+        # The calendar client shares one httplib2 connection, which is not thread-safe,
+        # so the sessions' calendar commands run one at a time
+        if CALENDAR in self.services:
+            self.services[CALENDAR] = SerializedService(self.services[CALENDAR])
+        self.usage = usage or UsageHistory()
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="session")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.backend = backend or GoogleBackend()
+        self.idle_timeout = idle_timeout
+        self.max_body = max_body
+        self.sessions: Dict[str, Session] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """
+        Start listening, warm up the services and start dropping idle sessions.
+        """
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        WarmupScheduler(list(self.services.values()), self.usage).start()
+        self._sweeper = asyncio.ensure_future(self._sweep_idle_sessions())
+        logger.info("Serving the assistant at http://%s:%d", self.host, self.port)
+
+    async def serve_forever(self) -> None:
+        """
+        Start the server and serve until cancelled.
+        """
+        await self.start()
+        try:
+            await self.server.serve_forever()  # type: ignore[union-attr]
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """
+        Stop accepting connections and wait for running flow calls.
+        """
+        if self._sweeper:
+            self._sweeper.cancel()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    async def _sweep_idle_sessions(self) -> None:
+        while True:
+            await asyncio.sleep(min(60.0, self.idle_timeout / 4))
+            expired = time.monotonic() - self.idle_timeout
+            for session_id, session in list(self.sessions.items()):
+                if session.last_seen < expired and not session.lock.locked():
+                    del self.sessions[session_id]
+            logger.debug("%d sessions open", len(self.sessions))
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                length = int(headers.get("content-length", 0))
+                if length > self.max_body:
+                    await self._respond(writer, 413, {"error": "request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self._route(method, target.split("?")[0], headers, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError:
+            await self._respond(writer, 400, {"error": "malformed request"}, False)
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Optional[dict], keep_alive: bool) -> None:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        head = (
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _route(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Optional[dict]]:
+        parts = [part for part in path.split("/") if part]
+        if parts == ["health"]:
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            return 200, {"sessions": len(self.sessions), "pending": self.pending}
+        if parts == ["sessions"]:
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            session = Session(uuid.uuid4().hex, self.services, self.usage)
+            self.sessions[session.id] = session
+            return 201, {"session": session.id}
+        if len(parts) >= 2 and parts[0] == "sessions":
+            session = self.sessions.get(parts[1])
+            if session is None:
+                return 404, {"error": "no such session"}
+            if len(parts) == 2:
+                if method != "DELETE":
+                    return 405, {"error": "use DELETE"}
+                del self.sessions[session.id]
+                return 204, None
+            if parts[2:] == ["turns"]:
+                if method != "POST":
+                    return 405, {"error": "use POST"}
+                return await self._turn(session, headers.get("content-type", ""), body)
+        return 404, {"error": "not found"}
+
+    async def _turn(self, session: Session, content_type: str, body: bytes) -> Tuple[int, Optional[dict]]:
+        if self.pending >= self.max_pending:
+            return 503, {"error": "too many turns in progress"}
+        session.last_seen = time.monotonic()
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            async with session.lock:
+                if content_type.startswith("audio/"):
+                    text = await loop.run_in_executor(self.executor, self._recognize, body)
+                else:
+                    try:
+                        text = str(json.loads(body or b"{}").get("text", "")).strip().lower()
+                    except (ValueError, AttributeError):
+                        return 400, {"error": 'expected {"text": ...} or audio/wav'}
+                replies = await loop.run_in_executor(self.executor, self._run_turn, session, text)
+        except Exception as e:
+            logger.error("Turn of session %s failed: %s", session.id, e)
+            return 500, {"error": str(e)}
+        finally:
+            self.pending -= 1
+            session.last_seen = time.monotonic()
+        awaiting = "question" if session.awaiting_question else None
+        return 200, {"heard": text, "replies": replies, "awaiting": awaiting}
+
+    def _recognize(self, body: bytes) -> str:
+        with sr.AudioFile(io.BytesIO(body)) as source:
+            audio = sr.Recognizer().record(source)
+        return self.backend.recognize(audio)
+
+    def _run_turn(self, session: Session, text: str) -> List[str]:
+        session.speech.replies = []
+        with tracer.interaction(), resilience.budget(session.recognizer.turn_budget):
+            try:
+                if session.awaiting_question:
+                    session.awaiting_question = False
+                    session.recognizer.answer_question(text)
+                else:
+                    session.recognizer.process_command(text)
+            except AwaitingInput:
+                session.awaiting_question = True
+        return session.speech.replies
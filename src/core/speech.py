@@ -1,39 +1,498 @@
+import itertools
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Callable, Iterable, Optional, Sequence, Tuple
+
 import pyttsx3
 import speech_recognition as sr
+from src.core.audio import AudioSource, CaptureStream, MicrophoneSource
+from src.core.constants import WAKE_WORDS
 from src.core.logger import Logger
+from src.core.preprocess import Preprocessor
+from src.core.resilience import GOOGLE_SPEECH, DependencyError, resilience
+from src.core.tracing import tracer
+from src.core.tts_cache import PhraseCache, play_wav
 
 
 logger = Logger(__name__).get_logger()
 
 
+# Priorities of the tasks run by the TTS worker, lowest first
+SPEAK = 0
+PRERENDER = 1
+
+
+class RecognitionBackend(ABC):
+    """
+    Turns an utterance into text.
+    """
+
+    @abstractmethod
+    def recognize(self, audio: sr.AudioData) -> str:
+        """
+        Recognize an utterance.
+
+        Args:
+            audio (sr.AudioData): The utterance.
+
+        Returns:
+            str: The recognized text in lowercase, or "" if nothing was understood.
+        """
+
+
+class GoogleBackend(RecognitionBackend):
+    """
+    Full transcription through the Google Web Speech API; needs a network round-trip.
+    A request that is slow is raced by a second one, and while the API is failing the
+    fallback backend answers instead, or nothing is recognized.
+    """
+
+    def __init__(
+        self,
+        language: str = "en-US",
+        timeout: float = 6.0,
+        hedge_after: float = 2.0,
+        fallback: Optional[RecognitionBackend] = None,
+    ):
+        """
+        Args:
+            language (str): Language of the speech to recognize.
+            timeout (float): Seconds to wait for a transcript, over both requests.
+            hedge_after (float): Seconds after which a second request is sent.
+            fallback (Optional[RecognitionBackend]): Offline backend used while Google is unavailable.
+        """
+        self.language = language
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.fallback = fallback
+        self.recognizer = sr.Recognizer()
+        self.recognizer.operation_timeout = timeout
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        def request() -> str:
+            try:
+                return self.recognizer.recognize_google(audio, language=self.language).lower()  # type: ignore
+            except sr.UnknownValueError:
+                logger.warning("Speech recognition could not understand the audio")
+                return ""
+
+        try:
+            return resilience.call(GOOGLE_SPEECH, request, self.timeout, self.hedge_after, attempts=2)
+        except DependencyError as e:
+            logger.error("Error with speech recognition service: %s", e)
+            if self.fallback is None:
+                return ""
+            logger.info("Recognizing offline instead")
+            return self.fallback.recognize(audio)
+
+
+class SphinxBackend(RecognitionBackend):
+    """
+    Offline transcription with pocketsphinx's bundled US English model. Less accurate
+    than Google, but local and fast enough to run on partial audio while the user is
+    still speaking.
+    """
+
+    SAMPLE_RATE = 16000
+
+    def __init__(self, **config):
+        """
+        Args:
+            **config: Extra pocketsphinx decoder options.
+
+        Raises:
+            ImportError: If pocketsphinx is not installed.
+        """
+        from pocketsphinx import Decoder
+
+        self.decoder = Decoder(samprate=self.SAMPLE_RATE, **config)
+        # A decoder holds one utterance at a time; batch sessions share the backend
+        self.lock = threading.Lock()
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        raw = audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2)
+        with self.lock:
+            self.decoder.start_utt()
+            self.decoder.process_raw(raw, full_utt=True)
+            self.decoder.end_utt()
+            hypothesis = self.decoder.hyp()
+        return hypothesis.hypstr.lower() if hypothesis else ""
+
+
+class KeywordSpotter(SphinxBackend):
+    """
+    Offline keyword spotting with pocketsphinx. Only the given phrases can be
+    recognized, which is all that is needed to wait for a wake word and costs a
+    fraction of the CPU of full decoding and no network traffic.
+    """
+
+    def __init__(self, keyphrases: Sequence[str], threshold: float = 1e-20):
+        """
+        Args:
+            keyphrases (Sequence[str]): The phrases to spot, lowercase.
+            threshold (float): Detection threshold; lower values give more detections
+                and more false alarms.
+
+        Raises:
+            ImportError: If pocketsphinx is not installed.
+        """
+        # pocketsphinx only reads multiple keyphrases from a file
+        with tempfile.NamedTemporaryFile("w", suffix=".kws", delete=False) as file:
+            for phrase in keyphrases:
+                file.write(f"{phrase} /{threshold}/\n")
+        try:
+            super().__init__(kws=file.name)
+        finally:
+            os.unlink(file.name)
+        self.keyphrases = list(keyphrases)
+
+
+def split_wake_word(text: str, wake_words: Sequence[str] = WAKE_WORDS) -> Optional[str]:
+    """
+    Find a wake word in a transcript and get the command said after it.
+
+    Args:
+        text (str): The recognized text, lowercase.
+        wake_words (Sequence[str]): The wake phrases.
+
+    Returns:
+        Optional[str]: The command, "" if the wake word was said on its own, or None
+            if the text contains no wake word.
+    """
+    # Longest first, so "hey assistant" wins over the "assistant" inside it
+    pattern = "|".join(re.escape(word) for word in sorted(wake_words, key=len, reverse=True))
+    match = re.search(pattern, text)
+    if match is None:
+        return None
+    return text[match.end():].strip(" ,.!?")
+
+
+def recognize_wake_utterance(
+    audio: sr.AudioData,
+    wake_backend: RecognitionBackend,
+    backend: RecognitionBackend,
+    wake_only_seconds: float = 1.2,
+) -> str:
+    """
+    Recognize an utterance that may start with the wake word. When the wake word
+    spotter hears the wake word in an utterance too long to be the wake word alone,
+    the utterance is also recognized in full, so a command said in the same breath
+    is not lost.
+
+    Args:
+        audio (sr.AudioData): The utterance.
+        wake_backend (RecognitionBackend): Recognizes the wake word.
+        backend (RecognitionBackend): Recognizes commands.
+        wake_only_seconds (float): Longest utterance taken to be only the wake word.
+
+    Returns:
+        str: The recognized text in lowercase, or "" if nothing was understood.
+    """
+    with tracer.span("wake_word"):
+        text = wake_backend.recognize(audio)
+    if not text or wake_backend is backend or split_wake_word(text) != "":
+        return text
+    seconds = len(audio.frame_data) / audio.sample_width / audio.sample_rate
+    if seconds <= wake_only_seconds:
+        return text
+    with tracer.span("recognize"):
+        full_text = backend.recognize(audio)
+    if not full_text:
+        return text
+    # The full transcript may have missed the wake word the spotter heard
+    return full_text if split_wake_word(full_text) is not None else f"{text} {full_text}"
+
+
+def create_wake_backend(wake_words: Sequence[str]) -> Optional[RecognitionBackend]:
+    """
+    Create the offline wake word spotter, if pocketsphinx is available.
+
+    Args:
+        wake_words (Sequence[str]): The wake phrases.
+
+    Returns:
+        Optional[RecognitionBackend]: The spotter, or None to fall back to the full recognizer.
+    """
+    try:
+        return KeywordSpotter(wake_words)
+    except Exception as e:
+        logger.warning("Offline wake word spotting unavailable, using the full recognizer: %s", e)
+        return None
+
+
+def create_partial_backend() -> Optional[RecognitionBackend]:
+    """
+    Create the offline recognizer for partial results, if pocketsphinx is available.
+
+    Returns:
+        Optional[RecognitionBackend]: The recognizer, or None to act on complete utterances only.
+    """
+    try:
+        return SphinxBackend()
+    except Exception as e:
+        logger.warning("Offline partial recognition unavailable: %s", e)
+        return None
+
+
 class Speech:
-    def __init__(self, language: str = "en-US") -> None:
+    def __init__(
+        self,
+        language: str = "en-US",
+        cache: Optional[PhraseCache] = None,
+        source: Optional[AudioSource] = None,
+        backend: Optional[RecognitionBackend] = None,
+        wake_backend: Optional[RecognitionBackend] = None,
+        preprocessor: Optional[Preprocessor] = None,
+        partial_backend: Optional[RecognitionBackend] = None,
+        partial_interval: float = 0.3,
+    ) -> None:
+        """
+        Args:
+            language (str): Language of the speech to recognize.
+            cache (Optional[PhraseCache]): Cache of rendered phrases.
+            source (Optional[AudioSource]): Audio input; the microphone by default.
+            backend (Optional[RecognitionBackend]): Recognizes commands; Google by default.
+            wake_backend (Optional[RecognitionBackend]): Recognizes the wake word; the
+                command backend by default.
+            preprocessor (Optional[Preprocessor]): Trims and downsamples each utterance
+                before recognition.
+            partial_backend (Optional[RecognitionBackend]): Recognizes the audio so far
+                while the user is still speaking, so a command can be acted on before
+                the utterance ends; None to only recognize complete utterances.
+            partial_interval (float): Seconds of speech between partial recognitions.
+        """
         self.logger = logger
+        self.language = language
+        self.cache = cache
+        # Audio input is captured continuously from the first get_audio call on
+        self.source = source
+        self.stream: Optional[CaptureStream] = None
+        # While Google is unavailable, the offline partial backend can stand in for it
+        self.backend = backend or GoogleBackend(language, fallback=partial_backend)
+        self.wake_backend = wake_backend or self.backend
+        self.preprocessor = preprocessor or Preprocessor()
+        self.partial_backend = partial_backend
+        self.partial_interval = partial_interval
+        # Set once a partial result has been acted on, until its utterance has ended
+        self.acted_on_partial = False
+        self.last_spoken_at = 0.0
+
+        # The TTS engine is created and driven by a single worker thread; utterances
+        # are queued to it in order and each one gets a future that completes when
+        # it has been spoken
+        self.queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        ready: Future = Future()
+        self.worker = threading.Thread(target=self._run, args=(ready,), name="tts-worker", daemon=True)
+        self.worker.start()
+        ready.result()
+
+    def _init_engine(self) -> None:
         self.engine = pyttsx3.init()
         self.engine.setProperty("rate", 150)
         self.voices = self.engine.getProperty("voices")
         self.engine.setProperty("voice", self.voices[1].id)
-        self.language = language
 
-    def speak(self, text: str) -> None:
-        self.logger.debug(f"Speaking text: {text}")
+    def _run(self, ready: Future) -> None:
+        try:
+            self._init_engine()
+        except Exception as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+
+        while True:
+            priority, _, task, future = self.queue.get()
+            if task is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(task())
+            except Exception as e:
+                self.logger.error("Error in TTS worker: %s", e)
+                future.set_exception(e)
+            finally:
+                if priority == SPEAK:
+                    self.last_spoken_at = time.monotonic()
+
+    def _submit(self, task: Callable[[], object], priority: int = SPEAK) -> Future:
+        future: Future = Future()
+        self.queue.put((priority, next(self.sequence), task, future))
+        return future
+
+    def speak_async(self, text: str, cache: bool = False) -> Future:
+        """
+        Queue the text to be spoken and return immediately.
+
+        Args:
+            text (str): The text to speak.
+            cache (bool): Play the phrase from the TTS cache, rendering it into the
+                cache first if needed. Meant for fixed phrases that repeat.
+
+        Returns:
+            Future: Completes once the text has been spoken.
+        """
+        self.logger.debug("Queueing text to speak: %s", text)
+        return self._submit(lambda: self._say(text, cache))
+
+    def speak(self, text: str, cache: bool = False) -> None:
+        """
+        Speak the text and wait until it has been spoken.
+
+        Args:
+            text (str): The text to speak.
+            cache (bool): Play the phrase from the TTS cache, rendering it into the
+                cache first if needed. Meant for fixed phrases that repeat.
+        """
+        with tracer.span("speak"):
+            self.speak_async(text, cache).result()
+
+    def _say(self, text: str, cache: bool) -> None:
+        self.logger.debug("Speaking text: %s", text)
+        if cache and self.cache:
+            voice, rate = self.engine.getProperty("voice"), self.engine.getProperty("rate")
+            path = self.cache.get(text, voice, rate) or self.cache.render(self.engine, text, voice, rate)
+            if path:
+                try:
+                    play_wav(path)
+                    return
+                except Exception as e:
+                    self.logger.warning("Could not play cached phrase, speaking it instead: %s", e)
+                    self.cache.discard(path.stem)
+
         self.engine.say(text)
         self.engine.runAndWait()
 
+    def prerender(self, texts: Iterable[str]) -> Optional[Future]:
+        """
+        Render phrases into the TTS cache in the background. Phrases are rendered one
+        at a time at a lower priority than utterances, so speaking is never held up
+        by more than one render.
+
+        Args:
+            texts (Iterable[str]): The phrases, most important first. Rendering stops
+                once the cache is full.
+
+        Returns:
+            Optional[Future]: Completes with the number of rendered phrases, or None without a cache.
+        """
+        if not self.cache:
+            return None
+        cache = self.cache
+        pending = iter(texts)
+        seen = set()
+        done: Future = Future()
+        rendered = 0
+
+        def render_next() -> None:
+            nonlocal rendered
+            text = next((text for text in pending if text not in seen), None)
+            seen.add(text)
+            if text is None or cache.is_full():
+                self.logger.info("Pre-rendered %d phrases into the TTS cache", rendered)
+                done.set_result(rendered)
+                return
+            voice, rate = self.engine.getProperty("voice"), self.engine.getProperty("rate")
+            if cache.get(text, voice, rate) is None and cache.render(self.engine, text, voice, rate):
+                rendered += 1
+            self._submit(render_next, PRERENDER)
+
+        self._submit(render_next, PRERENDER)
+        return done
+
+    def close(self) -> None:
+        """
+        Stop the TTS worker once the queued utterances have been spoken.
+        """
+        self.queue.put((PRERENDER, next(self.sequence), None, None))
+        self.worker.join()
+
+    def start_listening(self) -> None:
+        """
+        Open the audio source and start capturing, if not capturing yet.
+        """
+        if self.stream is None:
+            self.source = self.source or MicrophoneSource()
+            partial_interval = self.partial_interval if self.partial_backend else None
+            self.stream = CaptureStream(self.source, partial_interval=partial_interval).start()
+
+    def _next_utterance(self, partials: bool = False) -> Tuple[sr.AudioData, bool]:
+        self.start_listening()
+        while True:
+            utterance = self.stream.next_utterance(partials=partials)  # type: ignore[union-attr]
+            if self.acted_on_partial:
+                # The rest of an utterance whose partial result was acted on; checked
+                # first, since the reply was spoken before this utterance ended
+                self.acted_on_partial = not utterance.final
+                continue
+            # The microphone also hears the assistant; skip what was captured while it spoke
+            if self.source.live and utterance.started_at < self.last_spoken_at:  # type: ignore[union-attr]
+                self.logger.debug("Dropping audio captured while speaking")
+                continue
+            if utterance.final:
+                # From the start of speech until the utterance was complete
+                tracer.record("listen", time.monotonic() - utterance.started_at)
+            with tracer.span("preprocess"):
+                audio, _ = self.preprocessor.process(utterance.audio)
+            return audio, utterance.final
+
     def get_audio(self) -> str:
+        """
+        Wait for the next utterance and recognize it.
+
+        Returns:
+            str: The recognized text in lowercase, or "" if nothing was understood.
+
+        Raises:
+            AudioSourceExhausted: If the audio source has ended.
+        """
         self.logger.info("Listening for audio input...")
-        recognizer = sr.Recognizer()
-        with sr.Microphone() as source:
-            self.logger.debug("Microphone opened for listening")
-            audio = recognizer.listen(source)
-        try:
-            # Use Google Speech Recognition with Romanian language
-            recognized_text = recognizer.recognize_google(audio, language=self.language).lower()  # type: ignore
-            self.logger.info(f"Recognized audio: {recognized_text}")
-            return recognized_text
-        except sr.UnknownValueError:
-            self.logger.warning("Speech recognition could not understand the audio")
-            return ""
-        except sr.RequestError as e:
-            self.logger.error(f"Error with speech recognition service: {e}")
-            return ""
\ No newline at end of file
+        audio, _ = self._next_utterance()
+        with tracer.span("recognize"):
+            recognized_text = self.backend.recognize(audio)
+        self.logger.info("Recognized audio: %s", recognized_text)
+        return recognized_text
+
+    def listen_for_wake_word(self, ready: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Wait for the next utterance and recognize it with the wake word backend. A
+        command said in the same breath as the wake word is recognized with it.
+
+        Args:
+            ready (Optional[Callable[[str], bool]]): Tells whether a partial result can
+                be acted on. With a partial backend, the first partial result that is
+                ready and unchanged since the previous one is returned without waiting
+                for the utterance to end.
+
+        Returns:
+            str: The recognized text in lowercase, or "" if nothing was understood.
+
+        Raises:
+            AudioSourceExhausted: If the audio source has ended.
+        """
+        partials = ready is not None and self.partial_backend is not None
+        previous = None
+        while True:
+            audio, final = self._next_utterance(partials)
+            if final:
+                break
+            with tracer.span("partial"):
+                partial_text = self.partial_backend.recognize(audio)  # type: ignore[union-attr]
+            # Only a partial result that stopped changing is taken to be complete
+            if partial_text and partial_text == previous and ready(partial_text):  # type: ignore[misc]
+                self.logger.info("Acting on partial result: %s", partial_text)
+                self.acted_on_partial = True
+                return partial_text
+            previous = partial_text
+
+        recognized_text = recognize_wake_utterance(audio, self.wake_backend, self.backend)
+        if recognized_text:
+            self.logger.debug("Heard while waiting for the wake word: %s", recognized_text)
+        return recognized_text
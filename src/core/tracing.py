@@ -0,0 +1,270 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.logger import Logger
+
+logger = Logger(__name__).get_logger()
+
+# Intent of the spans recorded outside an interaction, e.g. while waiting for the wake word
+NO_INTENT = "none"
+PERCENTILES = (50, 95, 99)
+
+
+class _NoopSpan:
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "stage", "start")
+
+    def __init__(self, tracer: "Tracer", stage: str):
+        self.tracer = tracer
+        self.stage = stage
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.tracer.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Interaction:
+    """
+    The spans of one command, from hearing it to speaking the answer.
+    """
+
+    def __init__(self):
+        self.intent = NO_INTENT
+        self.spans: List[Tuple[str, float]] = []
+        self.start = time.perf_counter()
+
+
+class Tracer:
+    """
+    Times the stages of each interaction (listen, recognize, dispatch, flow, speak)
+    and keeps the latest durations per stage and intent for latency percentiles.
+    Disabled, a span is a shared no-op object and nothing is recorded.
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window (int): Durations kept per stage and intent.
+        """
+        self.enabled = False
+        self.window = window
+        self.durations: Dict[Tuple[str, str], Deque[float]] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def span(self, stage: str):
+        """
+        Time a stage of the current interaction.
+
+        Args:
+            stage (str): The stage.
+
+        Returns:
+            A context manager timing its block.
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, stage)
+
+    def record(self, stage: str, seconds: float) -> None:
+        """
+        Record a stage that was timed elsewhere.
+
+        Args:
+            stage (str): The stage.
+            seconds (float): Its duration.
+        """
+        if not self.enabled:
+            return
+        interaction = getattr(self.local, "interaction", None)
+        if interaction is None:
+            self._add(stage, NO_INTENT, seconds)
+        else:
+            interaction.spans.append((stage, seconds))
+
+    def tag(self, intent: str) -> None:
+        """
+        Set the intent of the current interaction.
+
+        Args:
+            intent (str): The intent, e.g. the matched keyword.
+        """
+        interaction = getattr(self.local, "interaction", None)
+        if interaction is not None:
+            interaction.intent = intent
+
+    def current(self) -> Optional[Interaction]:
+        """
+        Get the interaction of this thread, to join it from a worker thread.
+        """
+        return getattr(self.local, "interaction", None)
+
+    @contextmanager
+    def joined(self, interaction: Optional[Interaction]) -> Iterator[None]:
+        """
+        Record the spans of this thread in the block into another thread's interaction,
+        e.g. on a worker running part of its command.
+
+        Args:
+            interaction (Optional[Interaction]): The interaction, from current().
+        """
+        outer = getattr(self.local, "interaction", None)
+        self.local.interaction = interaction
+        try:
+            yield
+        finally:
+            self.local.interaction = outer
+
+    @contextmanager
+    def interaction(self) -> Iterator[Optional[Interaction]]:
+        """
+        Group the spans recorded by this thread in the block into one interaction. The
+        spans are added to the histograms under the interaction's intent when it ends,
+        along with a "total" span for the whole block.
+        """
+        if not self.enabled:
+            yield None
+            return
+        interaction = Interaction()
+        self.local.interaction = interaction
+        try:
+            yield interaction
+        finally:
+            self.local.interaction = None
+            for stage, seconds in interaction.spans:
+                self._add(stage, interaction.intent, seconds)
+            self._add("total", interaction.intent, time.perf_counter() - interaction.start)
+
+    def _add(self, stage: str, intent: str, seconds: float) -> None:
+        with self.lock:
+            durations = self.durations.get((stage, intent))
+            if durations is None:
+                durations = self.durations[(stage, intent)] = deque(maxlen=self.window)
+            durations.append(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Get the latency percentiles of each stage and intent.
+
+        Returns:
+            Dict: {stage: {intent: {"count", "p50", "p95", "p99"}}}, in milliseconds.
+        """
+        with self.lock:
+            durations = {key: list(values) for key, values in self.durations.items()}
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (stage, intent), values in sorted(durations.items()):
+            percentiles = np.percentile(np.array(values) * 1000, PERCENTILES)
+            entry = {"count": len(values)}
+            entry.update({f"p{p}": round(float(value), 3) for p, value in zip(PERCENTILES, percentiles)})
+            result.setdefault(stage, {})[intent] = entry
+        return result
+
+
+# The process-wide tracer, disabled until enabled from main.py
+tracer = Tracer()
+
+
+class MetricsExporter:
+    """
+    Publishes the tracer's percentiles to a JSON file, rewritten every interval, and/or
+    over HTTP at http://127.0.0.1:<port>/metrics.
+    """
+
+    def __init__(self, tracer: Tracer, path: Optional[Path] = None, port: Optional[int] = None, interval: float = 10.0):
+        """
+        Args:
+            tracer (Tracer): The tracer to export.
+            path (Optional[Path]): The metrics file, or None for no file.
+            port (Optional[int]): The local HTTP port, 0 for any free port, or None for no endpoint.
+            interval (float): Seconds between file writes.
+        """
+        self.tracer = tracer
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self.server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start exporting in background threads.
+        """
+        if self.path:
+            self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+            self._thread.start()
+        if self.port is not None:
+            tracer = self.tracer
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.rstrip("/") != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = json.dumps(tracer.snapshot()).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+            self.port = self.server.server_port
+            threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True).start()
+            logger.info("Serving latency metrics at http://127.0.0.1:%d/metrics", self.port)
+
+    def write(self) -> None:
+        """
+        Write the metrics file now.
+        """
+        if not self.path:
+            return
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.tracer.snapshot(), file, indent=2)
+        os.replace(temp_path, self.path)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                logger.error("Failed to write the metrics file: %s", e)
+
+    def stop(self) -> None:
+        """
+        Stop exporting, writing the metrics file one last time.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self.write()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
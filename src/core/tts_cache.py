@@ -0,0 +1,195 @@
+import hashlib
+import os
+import threading
+import wave
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from src.core.logger import Logger
+
+logger = Logger(__name__).get_logger()
+
+DEFAULT_CACHE_FOLDER = Path(__file__).parent.parent.parent / "user_data" / "tts_cache"
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+# PortAudio is initialized once and kept for the life of the process, as the
+# device enumeration behind it takes longer than most cached phrases
+_audio = None
+_audio_lock = threading.Lock()
+
+
+def _output_audio():
+    global _audio
+    with _audio_lock:
+        if _audio is None:
+            import pyaudio
+
+            _audio = pyaudio.PyAudio()
+        return _audio
+
+
+def play_wav(path: Path, chunk_size: int = 4096) -> None:
+    """
+    Play a WAV file on the default output device.
+
+    Args:
+        path (Path): The WAV file.
+        chunk_size (int): Frames written to the device at a time.
+    """
+    with wave.open(str(path), "rb") as wav:
+        audio = _output_audio()
+        stream = audio.open(
+            format=audio.get_format_from_width(wav.getsampwidth()),
+            channels=wav.getnchannels(),
+            rate=wav.getframerate(),
+            output=True,
+        )
+        try:
+            data = wav.readframes(chunk_size)
+            while data:
+                stream.write(data)
+                data = wav.readframes(chunk_size)
+        finally:
+            stream.stop_stream()
+            stream.close()
+
+
+def is_wav(path: Path) -> bool:
+    """
+    Tell whether a file is a WAV file that play_wav can read.
+
+    Args:
+        path (Path): The file.
+    """
+    try:
+        with wave.open(str(path), "rb"):
+            return True
+    except (wave.Error, EOFError, OSError):
+        return False
+
+
+class PhraseCache:
+    """
+    Content-addressed cache of synthesized phrases on disk, keyed by (text, voice, rate)
+    and bounded in size by evicting the least recently used entries. The first phrase
+    rendered is checked to be WAV; with a TTS driver that writes another format, e.g.
+    AIFF, the cache turns itself off and phrases are spoken directly.
+    """
+
+    def __init__(self, folder: Path = DEFAULT_CACHE_FOLDER, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            folder (Path): Folder holding the rendered audio files.
+            max_bytes (int): Maximum total size of the cached files.
+        """
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.folder.mkdir(parents=True, exist_ok=True)
+        # None until the first render shows whether the driver writes WAV
+        self.enabled: Optional[bool] = None
+
+        # Least recently used first; file mtimes carry the order across restarts
+        entries = sorted(self.folder.glob("*.wav"), key=lambda path: path.stat().st_mtime)
+        self.entries: "OrderedDict[str, int]" = OrderedDict((path.stem, path.stat().st_size) for path in entries)
+        self.total_bytes = sum(self.entries.values())
+
+    @staticmethod
+    def key(text: str, voice: str, rate: int) -> str:
+        """
+        Get the cache key of a phrase.
+
+        Args:
+            text (str): The phrase.
+            voice (str): The voice id.
+            rate (int): The speech rate.
+
+        Returns:
+            str: The cache key.
+        """
+        return hashlib.sha256(f"{voice}\0{rate}\0{text}".encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.folder / f"{key}.wav"
+
+    def is_full(self) -> bool:
+        return self.enabled is False or self.total_bytes >= self.max_bytes
+
+    def get(self, text: str, voice: str, rate: int) -> Optional[Path]:
+        """
+        Get the rendered audio of a phrase and mark it as recently used.
+
+        Args:
+            text (str): The phrase.
+            voice (str): The voice id.
+            rate (int): The speech rate.
+
+        Returns:
+            Optional[Path]: The audio file, or None if the phrase is not cached.
+        """
+        key = self.key(text, voice, rate)
+        if self.enabled is False or key not in self.entries:
+            return None
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.discard(key)
+            return None
+        self.entries.move_to_end(key)
+        return path
+
+    def render(self, engine, text: str, voice: str, rate: int) -> Optional[Path]:
+        """
+        Synthesize a phrase into the cache.
+
+        Args:
+            engine (pyttsx3.Engine): The engine to render with, already set to the voice and rate.
+            text (str): The phrase.
+            voice (str): The voice id.
+            rate (int): The speech rate.
+
+        Returns:
+            Optional[Path]: The audio file, or None if rendering failed or the cache is off.
+        """
+        if self.enabled is False:
+            return None
+        key = self.key(text, voice, rate)
+        path = self.path_for(key)
+        temp_path = path.with_suffix(".tmp")
+        try:
+            engine.save_to_file(text, str(temp_path))
+            engine.runAndWait()
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.error("Failed to render phrase to the TTS cache: %s", e)
+            return None
+        if self.enabled is None:
+            self.enabled = is_wav(path)
+            if not self.enabled:
+                logger.warning("The TTS driver does not render WAV files, turning the TTS cache off")
+                path.unlink(missing_ok=True)
+                return None
+
+        logger.debug("Rendered phrase to the TTS cache: %s", text)
+        self.total_bytes -= self.entries.pop(key, 0)
+        self.entries[key] = path.stat().st_size
+        self.total_bytes += self.entries[key]
+        self._evict()
+        return path
+
+    def discard(self, key: str) -> None:
+        """
+        Remove an entry, e.g. when its file cannot be played.
+
+        Args:
+            key (str): The cache key.
+        """
+        self.total_bytes -= self.entries.pop(key, 0)
+        self.path_for(key).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key = next(iter(self.entries))
+            logger.debug("Evicting TTS cache entry %s", key)
+            self.discard(key)
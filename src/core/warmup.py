@@ -0,0 +1,286 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from importlib import import_module
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from src.core.logger import Logger
+
+logger = Logger(__name__).get_logger()
+
+USER_DATA = Path(__file__).parent.parent.parent / "user_data"
+USAGE_PATH = USER_DATA / "usage.json"
+REPORT_PATH = USER_DATA / "startup_report.json"
+
+
+class LazyService:
+    """
+    A flow service that is imported and constructed on first use, by whichever of
+    the warm-up scheduler or a command gets to it first.
+    """
+
+    def __init__(self, name: str, module: str, factory: str, can_warm: Callable[[], bool] = lambda: True):
+        """
+        Args:
+            name (str): The service name, the keyword of its flow.
+            module (str): The module defining the service.
+            factory (str): The service class or factory function in the module.
+            can_warm (Callable[[], bool]): Whether the service may be created in the
+                background, e.g. False while creating it would need user interaction.
+        """
+        self.name = name
+        self.module = module
+        self.factory = factory
+        self.can_warm = can_warm
+        self.instance: Optional[object] = None
+        self.import_seconds: Optional[float] = None
+        self.init_seconds: Optional[float] = None
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.instance is not None
+
+    def get(self) -> object:
+        """
+        Get the service, creating it if needed. A failed creation is retried on the next call.
+
+        Returns:
+            object: The service.
+        """
+        if self.instance is not None:
+            return self.instance
+        with self.lock:
+            if self.instance is None:
+                logger.debug("Lazy loading %s", self.factory)
+                start = time.perf_counter()
+                module = import_module(self.module)
+                self.import_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                self.instance = getattr(module, self.factory)()
+                self.init_seconds = time.perf_counter() - start
+            return self.instance
+
+
+class _OneCallAtATime:
+    def __init__(self, target: Any, lock: threading.Lock):
+        self._target = target
+        self._lock = lock
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attribute(*args, **kwargs)
+
+        return call
+
+
+class SerializedService(LazyService):
+    """
+    A flow service whose methods are called one at a time, whichever session calls
+    them, for services that are not thread-safe.
+    """
+
+    def __init__(self, service: LazyService):
+        """
+        Args:
+            service (LazyService): The service, created on first use as before.
+        """
+        super().__init__(service.name, service.module, service.factory, service.can_warm)
+        self.service = service
+        self.calls = threading.Lock()
+
+    def get(self) -> object:
+        if self.instance is None:
+            self.instance = _OneCallAtATime(self.service.get(), self.calls)
+            self.import_seconds, self.init_seconds = self.service.import_seconds, self.service.init_seconds
+        return self.instance
+
+
+class UsageHistory:
+    """
+    How often each service has been used, persisted across runs.
+    """
+
+    def __init__(self, path: Optional[Path] = USAGE_PATH):
+        """
+        Args:
+            path (Optional[Path]): File the counts are kept in, or None to keep them in memory.
+        """
+        self.path = path
+        self.counts: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        if path and path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    self.counts = {str(name): int(count) for name, count in json.load(file).items()}
+            except (OSError, ValueError, AttributeError) as e:
+                logger.warning("Ignoring unreadable usage history %s: %s", path, e)
+
+    def record(self, name: str) -> None:
+        """
+        Count one use of a service.
+
+        Args:
+            name (str): The service name.
+        """
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            if not self.path:
+                return
+            # Written under the lock: threads recording at once share the temporary
+            # file, and a later count must not be replaced by an earlier one
+            temp_path = self.path.with_suffix(".tmp")
+            try:
+                with open(temp_path, "w", encoding="utf-8") as file:
+                    json.dump(self.counts, file)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                logger.warning("Could not save the usage history: %s", e)
+
+    def order(self, services: Sequence[LazyService]) -> List[LazyService]:
+        """
+        Order services by use, most used first; ties keep the given priority order.
+
+        Args:
+            services (Sequence[LazyService]): The services, highest priority first.
+
+        Returns:
+            List[LazyService]: The services in warm-up order.
+        """
+        with self.lock:
+            return sorted(services, key=lambda service: -self.counts.get(service.name, 0))
+
+
+class StartupReport:
+    """
+    Startup milestones and the import and init time of each service, written out as
+    JSON so that startup regressions can be tracked.
+    """
+
+    def __init__(self, started_at: float, path: Optional[Path] = REPORT_PATH):
+        """
+        Args:
+            started_at (float): time.perf_counter() when the process started.
+            path (Optional[Path]): File the report is written to, or None to only log it.
+        """
+        self.started_at = started_at
+        self.path = path
+        self.milestones: Dict[str, float] = {}
+
+    def mark(self, milestone: str) -> None:
+        """
+        Record that a milestone was reached now.
+
+        Args:
+            milestone (str): The milestone, e.g. "listening".
+        """
+        self.milestones[milestone] = time.perf_counter() - self.started_at
+        logger.info("Startup: %s after %.3f s", milestone, self.milestones[milestone])
+
+    def write(self, services: Sequence[LazyService]) -> Dict[str, object]:
+        """
+        Log the report and write it to the report file.
+
+        Args:
+            services (Sequence[LazyService]): The warmed-up services.
+
+        Returns:
+            Dict[str, object]: The report.
+        """
+        report: Dict[str, object] = {
+            "milestones": self.milestones,
+            "services": {
+                service.name: {"import_seconds": service.import_seconds, "init_seconds": service.init_seconds}
+                for service in services
+            },
+        }
+        for service in services:
+            if service.loaded:
+                logger.info(
+                    "Startup: %s imported in %.3f s, initialized in %.3f s",
+                    service.name, service.import_seconds, service.init_seconds,
+                )
+        if self.path:
+            try:
+                with open(self.path, "w", encoding="utf-8") as file:
+                    json.dump(report, file, indent=2)
+            except OSError as e:
+                logger.warning("Could not write the startup report: %s", e)
+        return report
+
+
+class WarmupScheduler:
+    """
+    Imports and constructs services in a thread pool, most used first, so the first
+    command of each kind does not pay for it. Starting it never blocks the caller.
+    """
+
+    def __init__(
+        self,
+        services: Sequence[LazyService],
+        history: Optional[UsageHistory] = None,
+        report: Optional[StartupReport] = None,
+        workers: int = 2,
+    ):
+        """
+        Args:
+            services (Sequence[LazyService]): The services, highest priority first.
+            history (Optional[UsageHistory]): Usage counts that reorder the services.
+            report (Optional[StartupReport]): Written once all services are warm.
+            workers (int): Services created at the same time.
+        """
+        self.services = list(services)
+        self.history = history
+        self.report = report
+        self.workers = workers
+        self.done: Future = Future()
+
+    def start(self) -> Future:
+        """
+        Start warming up in the background.
+
+        Returns:
+            Future: Completes when every service has been tried.
+        """
+        services = self.history.order(self.services) if self.history else self.services
+        services = [service for service in services if not service.loaded and service.can_warm()]
+        logger.debug("Warming up %s", [service.name for service in services])
+        if not services:
+            self._finish()
+            return self.done
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="warmup")
+        remaining = len(services)
+        lock = threading.Lock()
+
+        def warm(service: LazyService) -> None:
+            nonlocal remaining
+            try:
+                service.get()
+            except Exception as e:
+                logger.warning("Could not warm up %s: %s", service.name, e)
+            finally:
+                with lock:
+                    remaining -= 1
+                    last = remaining == 0
+                if last:
+                    self._finish()
+
+        for service in services:
+            executor.submit(warm, service)
+        executor.shutdown(wait=False)
+        return self.done
+
+    def _finish(self) -> None:
+        if self.report:
+            self.report.mark("warm")
+            self.report.write(self.services)
+        self.done.set_result(None)
@@ -1,13 +1,29 @@
 import csv
-from operator import __and__
+import threading
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterable, List, Mapping, MutableMapping, Optional, Tuple
 from src.core.logger import Logger
+from src.data.intent_index import IntentIndex, normalize
+from src.data.qa_index import QAIndex
+from src.data.snapshot import OverlayMapping, ValuePool, open_snapshot
+
+INPUT_PATH = Path("user_data/input.csv")
+Q_AND_A_PATH = Path("user_data/q_and_a.csv")
+SNAPSHOT_PATH = Path("user_data/corpus.snap")
 
 # Global dictionaries for csv data
 commands: Dict[str, List[str]] = {}
 replies: Dict[str, List[str]] = {}
 q_and_a: Dict[str, str] = {}
+# The answers of q_and_a as an indexable pool, for picking fun facts
+answers: ValuePool[str, str] = ValuePool([], [], {})
+
+# Compiled lookup indexes, rebuilt by init_replies
+intent_index = IntentIndex()
+qa_index = QAIndex()
+
+# Held while the data above is being changed; readers hold it while looking up
+lock = threading.RLock()
 
 logger = Logger(__name__).get_logger()
 
@@ -25,38 +41,167 @@ def load_csv(file_path: str) -> List[List[str]]:
         reader = csv.reader(file)
         return [row for row in reader]
 
-def init_replies() -> None:
+def init_replies(use_snapshot: bool = False) -> None:
     """
     Load user and reply data from a CSV file and store them in global dictionaries.
+
+    Args:
+        use_snapshot (bool): Memory-map a precompiled snapshot of the CSV files instead
+            of parsing them, compiling it first if it is missing or stale.
     """
     logger.info("Initializing replies from CSV files")
-    data = load_csv(str(Path("user_data/input.csv")))
-    q_a_data = load_csv(str(Path("user_data/q_and_a.csv")))
 
     global commands
     global replies
     global q_and_a
+    global answers
+
+    if use_snapshot:
+        with lock:
+            _init_from_snapshot()
+        logger.info("Replies initialized successfully")
+        return
+
+    data = load_csv(str(INPUT_PATH))
+    q_a_data = load_csv(str(Q_AND_A_PATH))
+
+    new_commands: Dict[str, List[str]] = {}
+    new_replies: Dict[str, List[str]] = {}
+    new_q_and_a: Dict[str, str] = {}
 
     for row in data:
         category = row[0]
         command = row[1]
         reply = row[2]
 
-        if category not in commands:
-            commands[category] = []
-        if category not in replies:
-            replies[category] = []
+        if category not in new_commands:
+            new_commands[category] = []
+        if category not in new_replies:
+            new_replies[category] = []
+
+        new_commands[category].append(command)
+        new_replies[category].append(reply)
 
-        commands[category].append(command)
-        replies[category].append(reply)
-    
     for row in q_a_data:
         question = row[0]
         answer = row[1]
 
-        if question not in q_and_a:
-            q_and_a[question] = ""
-
-        q_and_a[question] = answer
+        new_q_and_a[question] = answer
 
+    with lock:
+        commands, replies, q_and_a = new_commands, new_replies, new_q_and_a
+        answers = ValuePool(list(q_and_a), list(q_and_a.values()), {question: row for row, question in enumerate(q_and_a)})
+        intent_index.build(commands)
+        qa_index.build(q_and_a)
     logger.info("Replies initialized successfully")
+
+
+def _init_from_snapshot() -> None:
+    global commands
+    global replies
+    global q_and_a
+    global answers
+
+    snapshot = open_snapshot(SNAPSHOT_PATH, [INPUT_PATH, Q_AND_A_PATH], load_csv)
+    commands = snapshot.commands  # type: ignore[assignment]
+    replies = snapshot.replies  # type: ignore[assignment]
+    q_and_a = snapshot.q_and_a  # type: ignore[assignment]
+    answers = ValuePool(snapshot.questions, snapshot.answers, snapshot.question_rows)
+    intent_index.use_phrases(snapshot.phrases)
+    snapshot.load_qa_index(qa_index)
+
+
+def _writable(mapping: Mapping) -> MutableMapping:
+    return mapping if isinstance(mapping, MutableMapping) else OverlayMapping(mapping)
+
+
+def apply_command_changes(
+    added: List[List[str]],
+    removed: List[List[str]],
+    owners: Optional[Mapping[str, Optional[str]]] = None,
+) -> None:
+    """
+    Apply a diff of input.csv to the loaded commands, replies and intent index.
+
+    Args:
+        added (List[List[str]]): Rows (category, command, reply) added to the file.
+        removed (List[List[str]]): Rows removed from the file.
+        owners (Optional[Mapping[str, Optional[str]]]): First category listing each
+            affected normalized phrase in the new file, or None for phrases no longer
+            listed. Without it, added phrases keep their current category if they have one.
+    """
+    global commands
+    global replies
+
+    # Removed and added rows, grouped by category
+    by_category: Dict[str, Tuple[List[List[str]], List[List[str]]]] = {}
+    for row in removed:
+        by_category.setdefault(row[0], ([], []))[0].append(row)
+    for row in added:
+        by_category.setdefault(row[0], ([], []))[1].append(row)
+
+    with lock:
+        commands = _writable(commands)  # type: ignore[assignment]
+        replies = _writable(replies)  # type: ignore[assignment]
+
+        for category, (removed_rows, added_rows) in by_category.items():
+            # Only the categories that change are copied
+            command_list = list(commands.get(category, ()))
+            reply_list = list(replies.get(category, ()))
+            for _, command, reply in removed_rows:
+                for i in range(len(command_list)):
+                    if command_list[i] == command and reply_list[i] == reply:
+                        del command_list[i]
+                        del reply_list[i]
+                        break
+            for _, command, reply in added_rows:
+                command_list.append(command)
+                reply_list.append(reply)
+            if command_list:
+                commands[category] = command_list
+                replies[category] = reply_list
+            elif category in commands:
+                del commands[category]
+                del replies[category]
+
+        changes: Dict[str, Optional[str]] = {}
+        if owners is not None:
+            changes.update(owners)
+        else:
+            for category, command, _ in added:
+                phrase = normalize(command)
+                if phrase not in changes and intent_index.match_phrase(phrase) is None:
+                    changes[phrase] = category
+        intent_index.update_phrases(changes)
+
+    logger.info("Applied command changes: %d added, %d removed", len(added), len(removed))
+
+
+def apply_q_and_a_changes(upserts: Mapping[str, str], deletions: Iterable[str]) -> None:
+    """
+    Apply a diff of q_and_a.csv to the loaded questions, answers and Q&A index.
+
+    Args:
+        upserts (Mapping[str, str]): New or changed answers keyed by question.
+        deletions (Iterable[str]): Questions no longer in the file.
+    """
+    global q_and_a
+
+    deletions = list(deletions)
+    if not upserts and not deletions:
+        return
+    with lock:
+        q_and_a = _writable(q_and_a)  # type: ignore[assignment]
+        for question in deletions:
+            q_and_a.pop(question, None)
+            answers.remove(question)
+        q_and_a.update(upserts)
+        # Updated in place, so neither a change nor picking a fun fact copies the corpus
+        for question, answer in upserts.items():
+            answers.set(question, answer)
+        qa_index.update(upserts, deletions)
+        if qa_index.needs_compaction():
+            logger.info("Rebuilding the Q&A index after accumulated changes")
+            qa_index.build(dict(q_and_a))
+
+    logger.info("Applied Q&A changes: %d upserted, %d removed", len(upserts), len(deletions))
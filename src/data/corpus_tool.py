@@ -0,0 +1,351 @@
+"""
+Cleans the corpus CSV files with bounded memory, however large they are: rows are
+validated, input.csv is sorted by (category, command, reply) with an external merge
+sort, duplicate rows are removed, and the cleaned CSVs and the corpus snapshot are
+written in one run.
+
+Usage:
+    python -m src.data.corpus_tool [--input FILE] [--q-and-a FILE] [--output-dir DIR]
+"""
+import argparse
+import csv
+import heapq
+import itertools
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Optional, Sequence
+
+from src.core.logger import Logger
+from src.data.commands import INPUT_PATH, Q_AND_A_PATH
+from src.data.snapshot import compile_snapshot
+
+logger = Logger(__name__).get_logger()
+
+INPUT_FIELDS = ["category", "command", "reply"]
+Q_AND_A_FIELDS = ["question", "answer"]
+
+# Rough memory held per row in Python, on top of its text
+ROW_OVERHEAD = 250
+# Invalid rows described in the report; the rest are only counted
+MAX_SAMPLES = 20
+MAX_PARTITIONS = 256
+# Default rough memory limit for the rows held at once
+MEMORY_BYTES = 256 * 1024 * 1024
+
+
+class CorpusReport:
+    """
+    What cleaning a file did: rows read, rejected, dropped as duplicates and written.
+    """
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): The file the report is about.
+        """
+        self.name = name
+        self.rows_read = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.rows_written = 0
+        self.samples: List[str] = []
+
+    def reject(self, line: int, reason: str) -> None:
+        self.invalid += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(f"{self.name}:{line}: {reason}")
+
+    def summary(self) -> str:
+        return (
+            f"{self.name}: {self.rows_read} rows read, {self.invalid} invalid, "
+            f"{self.duplicates} duplicates, {self.rows_written} written"
+        )
+
+
+def read_rows(path: Path, fields: Sequence[str], report: CorpusReport) -> Iterator[List[str]]:
+    """
+    Stream the valid rows of a CSV file. Rows that are not UTF-8, have the wrong
+    number of columns or an empty first column are counted in the report and
+    skipped; a header row naming the fields is skipped too.
+
+    Args:
+        path (Path): The CSV file.
+        fields (Sequence[str]): The expected columns.
+        report (CorpusReport): Collects the invalid rows.
+
+    Yields:
+        List[str]: Each valid row.
+    """
+    line_number = 0
+
+    def lines(file: IO[bytes]) -> Iterator[str]:
+        nonlocal line_number
+        for raw in file:
+            line_number += 1
+            try:
+                yield raw.decode("utf-8-sig" if line_number == 1 else "utf-8")
+            except UnicodeDecodeError as e:
+                report.reject(line_number, f"not valid UTF-8 ({e.reason} at byte {e.start})")
+
+    with open(path, "rb") as file:
+        for row in csv.reader(lines(file)):
+            if not row:
+                continue
+            report.rows_read += 1
+            if len(row) != len(fields):
+                report.reject(line_number, f"expected {len(fields)} columns, got {len(row)}")
+            elif not row[0]:
+                report.reject(line_number, f"empty {fields[0]}")
+            elif report.rows_read == 1 and row == list(fields):
+                report.rows_read -= 1
+            else:
+                yield row
+
+
+def _write_run(rows: Iterable[Sequence[object]], folder: str) -> str:
+    with tempfile.NamedTemporaryFile("w", newline="", encoding="utf-8", dir=folder, suffix=".csv", delete=False) as file:
+        csv.writer(file).writerows(rows)
+        return file.name
+
+
+def _read_run(path: str) -> Iterator[List[str]]:
+    with open(path, newline="", encoding="utf-8") as file:
+        yield from csv.reader(file)
+    os.remove(path)
+
+
+def _row_bytes(row: Sequence[str]) -> int:
+    return ROW_OVERHEAD + sum(map(len, row))
+
+
+def external_sort(rows: Iterable[List[str]], folder: str, memory_bytes: int) -> Iterator[List[str]]:
+    """
+    Sort rows with bounded memory: sorted runs that fit in memory are written to
+    temporary files and merged.
+
+    Args:
+        rows (Iterable[List[str]]): The rows, compared column by column.
+        folder (str): Where the runs are written.
+        memory_bytes (int): Roughly how much memory the rows of one run may take.
+
+    Yields:
+        List[str]: The rows in sorted order.
+    """
+    runs: List[str] = []
+    chunk: List[List[str]] = []
+    size = 0
+    for row in rows:
+        chunk.append(row)
+        size += _row_bytes(row)
+        if size >= memory_bytes:
+            chunk.sort()
+            runs.append(_write_run(chunk, folder))
+            chunk, size = [], 0
+    chunk.sort()
+    if not runs:
+        yield from chunk
+        return
+    runs.append(_write_run(chunk, folder))
+    del chunk
+    yield from heapq.merge(*(_read_run(run) for run in runs))
+
+
+def unique_sorted(rows: Iterable[List[str]], report: CorpusReport) -> Iterator[List[str]]:
+    """
+    Drop duplicates from sorted rows, where they are next to each other.
+
+    Args:
+        rows (Iterable[List[str]]): The rows, sorted.
+        report (CorpusReport): Counts the duplicates.
+
+    Yields:
+        List[str]: Each distinct row.
+    """
+    previous: Optional[List[str]] = None
+    for row in rows:
+        if row == previous:
+            report.duplicates += 1
+            continue
+        previous = row
+        yield row
+
+
+def unique_in_order(
+    rows: Iterable[List[str]],
+    folder: str,
+    memory_bytes: int,
+    report: CorpusReport,
+    size_hint: int = 0,
+) -> Iterator[List[str]]:
+    """
+    Drop duplicate rows, keeping the first of each in the original order, with bounded
+    memory: rows are split into partitions by their hash, so all copies of a row land
+    in the same partition, each partition is deduplicated in memory, and the survivors
+    are merged back by position.
+
+    Args:
+        rows (Iterable[List[str]]): The rows.
+        folder (str): Where the partitions are written.
+        memory_bytes (int): Roughly how much memory the rows of one partition may take.
+        report (CorpusReport): Counts the duplicates.
+        size_hint (int): Approximate bytes of input, to choose the number of partitions.
+
+    Yields:
+        List[str]: Each distinct row.
+    """
+    count = min(MAX_PARTITIONS, max(1, size_hint * 4 // max(1, memory_bytes) + 1))
+    if count == 1:
+        seen = set()
+        for row in rows:
+            key = tuple(row)
+            if key in seen:
+                report.duplicates += 1
+                continue
+            seen.add(key)
+            yield row
+        return
+
+    paths = [os.path.join(folder, f"partition_{i}.csv") for i in range(count)]
+    files = [open(path, "w", newline="", encoding="utf-8") for path in paths]
+    try:
+        writers = [csv.writer(file) for file in files]
+        for position, row in enumerate(rows):
+            writers[hash(tuple(row)) % count].writerow([position, *row])
+    finally:
+        for file in files:
+            file.close()
+
+    survivors = []
+    for path in paths:
+        seen = set()
+        kept = []
+        for position, *row in _read_run(path):
+            key = tuple(row)
+            if key in seen:
+                report.duplicates += 1
+                continue
+            seen.add(key)
+            kept.append((int(position), row))
+        del seen
+        # Written in position order, so the survivors are already sorted
+        survivors.append(_write_run(((position, *row) for position, row in kept), folder))
+    yield from (row for _, *row in heapq.merge(*(_read_run(path) for path in survivors), key=lambda row: int(row[0])))
+
+
+def write_rows(rows: Iterable[List[str]], path: Path, report: CorpusReport, header: Optional[Sequence[str]] = None) -> Iterator[List[str]]:
+    """
+    Write rows to a CSV file as they pass through. The file is replaced only once
+    all rows are written.
+
+    Args:
+        rows (Iterable[List[str]]): The rows.
+        path (Path): The CSV file.
+        report (CorpusReport): Counts the rows written.
+        header (Optional[Sequence[str]]): Column names to write first.
+
+    Yields:
+        List[str]: The rows, after each is written.
+    """
+    temp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(temp_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        if header:
+            writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            report.rows_written += 1
+            yield row
+    os.replace(temp_path, path)
+
+
+def clean_commands(
+    source: Path,
+    destination: Path,
+    folder: str,
+    memory_bytes: int,
+    header: bool = False,
+) -> Iterator[List[str]]:
+    """
+    Validate, sort and deduplicate input.csv rows, writing them to the destination.
+
+    Yields:
+        List[str]: The cleaned rows, after each is written.
+    """
+    report = CorpusReport(str(source))
+    rows = unique_sorted(external_sort(read_rows(source, INPUT_FIELDS, report), folder, memory_bytes), report)
+    yield from write_rows(rows, destination, report, INPUT_FIELDS if header else None)
+    log_report(report)
+
+
+def clean_q_and_a(source: Path, destination: Path, folder: str, memory_bytes: int) -> Iterator[List[str]]:
+    """
+    Validate and deduplicate q_and_a.csv rows in their original order, writing them
+    to the destination. The order matters: a later answer to a question wins.
+
+    Yields:
+        List[str]: The cleaned rows, after each is written.
+    """
+    report = CorpusReport(str(source))
+    rows = read_rows(source, Q_AND_A_FIELDS, report)
+    unique = unique_in_order(rows, folder, memory_bytes, report, source.stat().st_size)
+    yield from write_rows(unique, destination, report)
+    log_report(report)
+
+
+def log_report(report: CorpusReport) -> None:
+    logger.info("Cleaned %s", report.summary())
+    for sample in report.samples:
+        logger.warning("Invalid row %s", sample)
+    if report.invalid > len(report.samples):
+        logger.warning("%d more invalid rows in %s", report.invalid - len(report.samples), report.name)
+
+
+def build_corpus(
+    input_path: Path = INPUT_PATH,
+    q_and_a_path: Path = Q_AND_A_PATH,
+    output_dir: Optional[Path] = None,
+    snapshot: bool = True,
+    memory_bytes: int = MEMORY_BYTES,
+) -> None:
+    """
+    Clean both corpus files and compile the snapshot from the cleaned rows as they are written.
+
+    Args:
+        input_path (Path): The commands and replies CSV.
+        q_and_a_path (Path): The questions and answers CSV.
+        output_dir (Optional[Path]): Where the cleaned files are written; in place by default.
+        snapshot (bool): Also compile corpus.snap next to the cleaned files.
+        memory_bytes (int): Roughly how much memory the rows held at once may take.
+    """
+    output_dir = output_dir or input_path.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+    input_out, q_and_a_out = output_dir / "input.csv", output_dir / "q_and_a.csv"
+    with tempfile.TemporaryDirectory(dir=output_dir) as folder:
+        commands = clean_commands(input_path, input_out, folder, memory_bytes)
+        q_and_a = clean_q_and_a(q_and_a_path, q_and_a_out, folder, memory_bytes)
+        if snapshot:
+            compile_snapshot(commands, q_and_a, output_dir / "corpus.snap", [input_out, q_and_a_out])
+        else:
+            for _ in itertools.chain(commands, q_and_a):
+                pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, default=INPUT_PATH, help="commands and replies CSV")
+    parser.add_argument("--q-and-a", type=Path, default=Q_AND_A_PATH, help="questions and answers CSV")
+    parser.add_argument("--output-dir", type=Path, help="where the cleaned files go; in place by default")
+    parser.add_argument("--no-snapshot", action="store_true", help="do not compile corpus.snap")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_BYTES // 1024 // 1024, help="rough memory limit for the rows held at once")
+    args = parser.parse_args()
+    try:
+        build_corpus(args.input, args.q_and_a, args.output_dir, not args.no_snapshot, args.memory_mb * 1024 * 1024)
+    except OSError as e:
+        print(f"Could not clean the corpus: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
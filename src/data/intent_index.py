@@ -0,0 +1,164 @@
+from typing import Dict, List, Mapping, MutableMapping, Optional, Sequence
+
+
+def normalize(text: str) -> str:
+    """
+    Normalize a phrase for index lookups (lowercase, collapsed whitespace).
+
+    Args:
+        text (str): The raw phrase.
+
+    Returns:
+        str: The normalized phrase.
+    """
+    return " ".join(text.lower().split())
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton that finds every keyword occurring in a text in a single pass.
+    """
+
+    def __init__(self, keywords: Sequence[str]):
+        """
+        Build the automaton for the given keywords.
+
+        Args:
+            keywords (Sequence[str]): The keywords, in priority order.
+        """
+        self.keywords = list(keywords)
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[List[int]] = [[]]
+
+        for keyword_id, keyword in enumerate(self.keywords):
+            node = 0
+            for char in keyword:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                node = next_node
+            self.outputs[node].append(keyword_id)
+
+        # Breadth-first pass to wire the failure links and merge outputs
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+
+        # Lowest keyword id reachable from each node, used for priority dispatch
+        self.best: List[int] = [min(out) if out else len(self.keywords) for out in self.outputs]
+
+    def _step(self, node: int, char: str) -> int:
+        while node and char not in self.goto[node]:
+            node = self.fail[node]
+        return self.goto[node].get(char, 0)
+
+    def find_all(self, text: str) -> List[str]:
+        """
+        Find every keyword occurring in the text.
+
+        Args:
+            text (str): The text to scan.
+
+        Returns:
+            List[str]: The matched keywords in priority order, without duplicates.
+        """
+        found = set()
+        node = 0
+        for char in text:
+            node = self._step(node, char)
+            found.update(self.outputs[node])
+        return [self.keywords[keyword_id] for keyword_id in sorted(found)]
+
+    def first(self, text: str) -> Optional[str]:
+        """
+        Find the highest-priority keyword occurring in the text.
+
+        Args:
+            text (str): The text to scan.
+
+        Returns:
+            Optional[str]: The matched keyword, or None if no keyword occurs.
+        """
+        best = len(self.keywords)
+        node = 0
+        for char in text:
+            node = self._step(node, char)
+            if self.best[node] < best:
+                best = self.best[node]
+                if best == 0:
+                    break
+        return self.keywords[best] if best < len(self.keywords) else None
+
+
+class IntentIndex:
+    """
+    Normalized phrase to category map for the predefined replies; the flow triggers
+    are matched by the flow registry's KeywordMatcher.
+    """
+
+    def __init__(self):
+        self.phrases: Mapping[str, str] = {}
+
+    def build(self, commands: Dict[str, List[str]]) -> None:
+        """
+        Rebuild the phrase map from the loaded commands.
+
+        Args:
+            commands (Dict[str, List[str]]): Command phrases grouped by category.
+        """
+        phrases: Dict[str, str] = {}
+        for category, command_list in commands.items():
+            for command in command_list:
+                # The first category listing a phrase wins, as with the linear scan
+                phrases.setdefault(normalize(command), category)
+        self.phrases = phrases
+
+    def use_phrases(self, phrases: Mapping[str, str]) -> None:
+        """
+        Use a prebuilt normalized phrase to category mapping, e.g. from a corpus snapshot.
+
+        Args:
+            phrases (Mapping[str, str]): Categories keyed by normalized phrase.
+        """
+        self.phrases = phrases
+
+    def update_phrases(self, changes: Mapping[str, Optional[str]]) -> None:
+        """
+        Change the category of individual phrases.
+
+        Args:
+            changes (Mapping[str, Optional[str]]): New categories keyed by normalized
+                phrase; None removes the phrase.
+        """
+        if not isinstance(self.phrases, MutableMapping):
+            # Imported here as the snapshot module depends on this one
+            from src.data.snapshot import OverlayMapping
+            self.phrases = OverlayMapping(self.phrases)
+        for phrase, category in changes.items():
+            if category is None:
+                self.phrases.pop(phrase, None)
+            else:
+                self.phrases[phrase] = category
+
+    def match_phrase(self, text: str) -> Optional[str]:
+        """
+        Get the predefined reply category for a command phrase.
+
+        Args:
+            text (str): The recognized command text.
+
+        Returns:
+            Optional[str]: The category, or None if the phrase is unknown.
+        """
+        return self.phrases.get(normalize(text))
@@ -0,0 +1,285 @@
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Minimum share of the question's terms (weighted by IDF) a match must cover
+DEFAULT_THRESHOLD = 0.6
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into lowercase word tokens.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        List[str]: The tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class QAIndex:
+    """
+    BM25 retrieval over the Q&A questions.
+
+    Postings are stored in CSR layout (one offsets array, one doc id array and one
+    precomputed BM25 impact array) and are sorted by impact within each term, so a
+    query only has to read the head of each posting list.
+
+    Changes made after the index is built go to a small delta index and a set of
+    removed documents, so updates cost proportionally to the change.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_postings: int = 1024):
+        """
+        Args:
+            k1 (float): BM25 term frequency saturation.
+            b (float): BM25 length normalization.
+            max_postings (int): Maximum number of postings read per query term.
+        """
+        self.k1 = k1
+        self.b = b
+        self.max_postings = max_postings
+        self.questions: Sequence[str] = []
+        self.answers: Sequence[str] = []
+        self.vocabulary: Mapping[str, int] = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.impacts = np.zeros(0, dtype=np.float32)
+        self.max_idf = 0.0
+        self.doc_of: Mapping[str, int] = {}
+        self.removed: Set[int] = set()
+        self.delta: Dict[str, str] = {}
+        self.delta_index: Optional["QAIndex"] = None
+
+    def __len__(self) -> int:
+        return len(self.questions) - len(self.removed) + len(self.delta)
+
+    def build(self, q_and_a: Dict[str, str]) -> None:
+        """
+        Build the index from the loaded questions and answers.
+
+        Args:
+            q_and_a (Dict[str, str]): Answers keyed by question.
+        """
+        questions = list(q_and_a.keys())
+        answers = [q_and_a[question] for question in questions]
+        vocabulary: Dict[str, int] = {}
+        term_ids = array("i")
+        doc_ids = array("i")
+        frequencies = array("f")
+        lengths = array("f")
+
+        for doc_id, question in enumerate(questions):
+            tokens = tokenize(question)
+            lengths.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                doc_ids.append(doc_id)
+                frequencies.append(count)
+
+        term_arr = np.frombuffer(term_ids, dtype=np.int32)
+        doc_arr = np.frombuffer(doc_ids, dtype=np.int32)
+        tf_arr = np.frombuffer(frequencies, dtype=np.float32)
+        length_arr = np.frombuffer(lengths, dtype=np.float32)
+
+        doc_count = len(questions)
+        df = np.bincount(term_arr, minlength=len(vocabulary)).astype(np.float32)
+        idf = np.log1p((doc_count - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_length = float(length_arr.mean()) if doc_count else 0.0
+        norm = self.k1 * (1 - self.b + self.b * length_arr[doc_arr] / max(avg_length, 1.0))
+        impacts = idf[term_arr] * tf_arr * (self.k1 + 1) / (tf_arr + norm)
+
+        # Group postings by term, highest impact first
+        order = np.lexsort((-impacts, term_arr))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df.astype(np.int64), out=offsets[1:])
+
+        self.questions = questions
+        self.answers = answers
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.offsets = offsets
+        self.doc_ids = doc_arr[order]
+        self.impacts = impacts[order].astype(np.float32)
+        self.doc_of = {question: doc_id for doc_id, question in enumerate(questions)}
+        self.removed = set()
+        self.delta = {}
+        self.delta_index = None
+        # Unknown words weigh as much as the rarest indexed word
+        self.max_idf = math.log1p((doc_count - 0.5) / 1.5)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Get the index arrays, e.g. to persist them.
+
+        Returns:
+            Dict[str, np.ndarray]: The IDF, offsets, doc id and impact arrays.
+        """
+        return {"idf": self.idf, "offsets": self.offsets, "doc_ids": self.doc_ids, "impacts": self.impacts}
+
+    def params(self) -> Dict[str, float]:
+        """
+        Get the scoring parameters the arrays were built with.
+
+        Returns:
+            Dict[str, float]: The scoring parameters.
+        """
+        return {"k1": self.k1, "b": self.b, "max_postings": self.max_postings, "max_idf": self.max_idf}
+
+    def load(
+        self,
+        questions: Sequence[str],
+        answers: Sequence[str],
+        vocabulary: Mapping[str, int],
+        doc_of: Mapping[str, int],
+        arrays: Dict[str, np.ndarray],
+        params: Dict[str, float],
+    ) -> None:
+        """
+        Use prebuilt index data instead of building it, e.g. from a corpus snapshot.
+
+        Args:
+            questions (Sequence[str]): The indexed questions.
+            answers (Sequence[str]): The answers, aligned with the questions.
+            vocabulary (Mapping[str, int]): Term ids keyed by term.
+            doc_of (Mapping[str, int]): Doc ids keyed by question.
+            arrays (Dict[str, np.ndarray]): The arrays returned by arrays().
+            params (Dict[str, float]): The parameters returned by params().
+        """
+        self.k1 = params["k1"]
+        self.b = params["b"]
+        self.max_postings = int(params["max_postings"])
+        self.max_idf = params["max_idf"]
+        self.questions = questions
+        self.answers = answers
+        self.vocabulary = vocabulary
+        self.idf = arrays["idf"]
+        self.offsets = arrays["offsets"]
+        self.doc_ids = arrays["doc_ids"]
+        self.impacts = arrays["impacts"]
+        self.doc_of = doc_of
+        self.removed = set()
+        self.delta = {}
+        self.delta_index = None
+
+    def update(self, upserts: Mapping[str, str], deletions: Iterable[str]) -> None:
+        """
+        Add, change or remove questions without rebuilding the whole index.
+
+        Args:
+            upserts (Mapping[str, str]): New or changed answers keyed by question.
+            deletions (Iterable[str]): Questions to remove.
+        """
+        for question in list(deletions) + list(upserts):
+            doc_id = self.doc_of.get(question)
+            if doc_id is not None:
+                self.removed.add(doc_id)
+            self.delta.pop(question, None)
+        self.delta.update(upserts)
+
+        self.delta_index = None
+        if self.delta:
+            self.delta_index = QAIndex(self.k1, self.b, self.max_postings)
+            self.delta_index.build(self.delta)
+
+    def needs_compaction(self, ratio: float = 0.1) -> bool:
+        """
+        Check whether enough has changed since the last build to warrant a full rebuild.
+
+        Args:
+            ratio (float): Share of changed documents that triggers a rebuild.
+
+        Returns:
+            bool: True if the index should be rebuilt.
+        """
+        return len(self.removed) + len(self.delta) > max(1000, ratio * len(self.questions))
+
+    def _hits(self, question: str, k: int, threshold: float) -> List[Tuple[float, float, int]]:
+        """
+        Score the indexed questions against the given one.
+
+        Returns:
+            List[Tuple[float, float, int]]: (score, confidence, doc id) tuples, best first.
+        """
+        tokens = set(tokenize(question))
+        if not tokens or not self.questions:
+            return []
+
+        doc_slices = []
+        impact_slices = []
+        idf_slices = []
+        query_idf = 0.0
+        for token in tokens:
+            term_id = self.vocabulary.get(token)
+            if term_id is None:
+                query_idf += self.max_idf
+                continue
+            start = int(self.offsets[term_id])
+            end = min(int(self.offsets[term_id + 1]), start + self.max_postings)
+            query_idf += float(self.idf[term_id])
+            doc_slices.append(self.doc_ids[start:end])
+            impact_slices.append(self.impacts[start:end])
+            idf_slices.append(np.full(end - start, self.idf[term_id], dtype=np.float32))
+
+        if not doc_slices:
+            return []
+
+        docs, inverse = np.unique(np.concatenate(doc_slices), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(impact_slices))
+        coverage = np.bincount(inverse, weights=np.concatenate(idf_slices)) / query_idf
+
+        candidates = np.flatnonzero(coverage >= threshold)
+        if candidates.size > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        # Best score first, earlier questions first on ties
+        candidates = candidates[np.lexsort((docs[candidates], -scores[candidates]))]
+
+        return [(float(scores[i]), float(coverage[i]), int(docs[i])) for i in candidates]
+
+    def search(self, question: str, k: int = 3, threshold: float = 0.0) -> List[Tuple[str, str, float]]:
+        """
+        Find the questions that best match the given one.
+
+        Args:
+            question (str): The question to look up.
+            k (int): Maximum number of results.
+            threshold (float): Minimum confidence (0 to 1) of a result.
+
+        Returns:
+            List[Tuple[str, str, float]]: (question, answer, confidence) tuples, best first.
+        """
+        results = [
+            (score, coverage, self.questions[doc_id], self.answers[doc_id])
+            for score, coverage, doc_id in self._hits(question, k + len(self.removed), threshold)
+            if doc_id not in self.removed
+        ]
+        if self.delta_index:
+            results += [
+                (score, coverage, self.delta_index.questions[doc_id], self.delta_index.answers[doc_id])
+                for score, coverage, doc_id in self.delta_index._hits(question, k, threshold)
+            ]
+            results.sort(key=lambda result: -result[0])
+        return [(question, answer, coverage) for _, coverage, question, answer in results[:k]]
+
+    def best_answer(self, question: str, threshold: float = DEFAULT_THRESHOLD) -> Optional[str]:
+        """
+        Get the answer of the best matching question.
+
+        Args:
+            question (str): The question to look up.
+            threshold (float): Minimum confidence (0 to 1) of the match.
+
+        Returns:
+            Optional[str]: The answer, or None if nothing matches confidently enough.
+        """
+        results = self.search(question, k=1, threshold=threshold)
+        return results[0][1] if results else None
@@ -0,0 +1,580 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, Generic, Iterable, Iterator, List, Mapping, MutableMapping, Optional, Sequence, Set, Tuple, TypeVar
+
+import numpy as np
+
+from src.core.logger import Logger
+from src.data.intent_index import normalize
+from src.data.qa_index import QAIndex
+
+logger = Logger(__name__).get_logger()
+
+MAGIC = b"JVCS"
+VERSION = 1
+HEADER = struct.Struct("<4sII")  # magic, version, table of contents length
+ALIGNMENT = 8
+
+
+def _hash(key: bytes) -> int:
+    return zlib.crc32(key)
+
+
+def _fingerprint(path: Path, with_digest: bool = True) -> Dict[str, object]:
+    stat = path.stat()
+    fingerprint: Dict[str, object] = {"path": str(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_digest:
+        with open(path, "rb") as file:
+            fingerprint["sha256"] = hashlib.sha256(file.read()).hexdigest()
+    return fingerprint
+
+
+class StringTable:
+    """
+    Read-only view over the snapshot's string blob; strings are decoded on access.
+    """
+
+    def __init__(self, blob: memoryview, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def raw(self, string_id: int) -> memoryview:
+        return self.blob[int(self.offsets[string_id]):int(self.offsets[string_id + 1])]
+
+    def __getitem__(self, string_id: int) -> str:
+        return str(self.raw(string_id), "utf-8")
+
+
+class StringColumn(Sequence[str]):
+    """
+    Lazy sequence of strings given by an array of string ids.
+    """
+
+    def __init__(self, table: StringTable, ids: np.ndarray):
+        self.table = table
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return StringColumn(self.table, self.ids[index])
+        return self.table[int(self.ids[index])]
+
+
+class HashIndex:
+    """
+    Open-addressing hash table mapping string keys to row numbers. Each slot holds
+    row + 1 (0 marks an empty slot) and keys are compared against the key column.
+    """
+
+    def __init__(self, table: StringTable, key_ids: np.ndarray, slots: np.ndarray):
+        self.table = table
+        self.key_ids = key_ids
+        self.slots = slots
+        self.mask = len(slots) - 1
+
+    @staticmethod
+    def build(keys: Sequence[bytes]) -> np.ndarray:
+        """
+        Build the slot array for the given (unique) encoded keys.
+
+        Args:
+            keys (Sequence[bytes]): The encoded keys, in row order.
+
+        Returns:
+            np.ndarray: The slot array.
+        """
+        size = 1
+        while size < 2 * len(keys):
+            size *= 2
+        slots = np.zeros(size, dtype=np.uint32)
+        mask = size - 1
+        for row, key in enumerate(keys):
+            slot = _hash(key) & mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = row + 1
+        return slots
+
+    def find(self, key: str) -> Optional[int]:
+        """
+        Find the row of a key.
+
+        Args:
+            key (str): The key to look up.
+
+        Returns:
+            Optional[int]: The row number, or None if the key is not present.
+        """
+        if not len(self.key_ids):
+            return None
+        encoded = key.encode("utf-8")
+        slot = _hash(encoded) & self.mask
+        while True:
+            row = int(self.slots[slot])
+            if not row:
+                return None
+            if self.table.raw(int(self.key_ids[row - 1])) == encoded:
+                return row - 1
+            slot = (slot + 1) & self.mask
+
+
+class IndexedMapping(Mapping[str, str]):
+    """
+    Lazy mapping from the keys of a hash index to a value column.
+    """
+
+    def __init__(self, index: HashIndex, values: Sequence[str]):
+        self.index = index
+        self.values_column = values
+
+    def __getitem__(self, key: str) -> str:
+        row = self.index.find(key)
+        if row is None:
+            raise KeyError(key)
+        return self.values_column[row]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.index.find(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(StringColumn(self.index.table, self.index.key_ids))
+
+    def __len__(self) -> int:
+        return len(self.index.key_ids)
+
+
+class RowMapping(Mapping[str, int]):
+    """
+    Lazy mapping from the keys of a hash index to their row numbers.
+    """
+
+    def __init__(self, index: HashIndex):
+        self.index = index
+
+    def __getitem__(self, key: str) -> int:
+        row = self.index.find(key)
+        if row is None:
+            raise KeyError(key)
+        return row
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(StringColumn(self.index.table, self.index.key_ids))
+
+    def __len__(self) -> int:
+        return len(self.index.key_ids)
+
+
+class GroupedColumn(Mapping[str, Sequence[str]]):
+    """
+    Lazy mapping from category to the slice of a column holding its rows.
+    """
+
+    def __init__(self, ranges: Dict[str, Tuple[int, int]], column: StringColumn):
+        self.ranges = ranges
+        self.column = column
+
+    def __getitem__(self, category: str) -> Sequence[str]:
+        start, end = self.ranges[category]
+        return self.column[start:end]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ranges)
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class OverlayMapping(MutableMapping[K, V]):
+    """
+    Writable in-memory layer over a read-only mapping, used to apply changes on top
+    of a snapshot without touching the mapped file.
+    """
+
+    def __init__(self, base: Mapping[K, V]):
+        self.base = base
+        self.changed: Dict[K, V] = {}
+        # Base keys that were removed, and changed keys that are not in the base
+        self.deleted: Set[K] = set()
+        self.extra: Set[K] = set()
+
+    def __getitem__(self, key: K) -> V:
+        if key in self.changed:
+            return self.changed[key]
+        if key in self.deleted:
+            raise KeyError(key)
+        return self.base[key]
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self.changed[key] = value
+        self.deleted.discard(key)
+        if key not in self.base:
+            self.extra.add(key)
+
+    def __delitem__(self, key: K) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self.changed.pop(key, None)
+        self.extra.discard(key)
+        if key in self.base:
+            self.deleted.add(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.changed or (key not in self.deleted and key in self.base)
+
+    def __iter__(self) -> Iterator[K]:
+        for key in self.base:
+            if key not in self.deleted:
+                yield key
+        yield from (key for key in self.changed if key in self.extra)
+
+    def __len__(self) -> int:
+        return len(self.base) - len(self.deleted) + len(self.extra)
+
+
+class ValuePool(Sequence[V], Generic[K, V]):
+    """
+    The values of a mapping as an indexable sequence, kept in step with the mapping
+    at O(1) per change: a changed value is replaced in place, a new one appended and
+    a removed one swapped with the last. Changes are held in memory over read-only
+    base columns, e.g. those of a snapshot.
+    """
+
+    def __init__(self, keys: Sequence[K], values: Sequence[V], rows: Mapping[K, int]):
+        """
+        Args:
+            keys (Sequence[K]): The keys, row by row.
+            values (Sequence[V]): Their values, row by row.
+            rows (Mapping[K, int]): The row of each key.
+        """
+        self.keys = keys
+        self.values = values
+        self.rows = rows
+        self.length = len(values)
+        # Rows and keys that differ from the base columns; None marks a removed key
+        self.changed_keys: Dict[int, K] = {}
+        self.changed_values: Dict[int, V] = {}
+        self.changed_rows: Dict[K, Optional[int]] = {}
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        if index in self.changed_values:
+            return self.changed_values[index]
+        return self.values[index]
+
+    def _row(self, key: K) -> Optional[int]:
+        if key in self.changed_rows:
+            return self.changed_rows[key]
+        return self.rows.get(key)
+
+    def _key(self, row: int) -> K:
+        return self.changed_keys[row] if row in self.changed_keys else self.keys[row]
+
+    def set(self, key: K, value: V) -> None:
+        """
+        Set the value of a key, appending it if the key is new.
+        """
+        row = self._row(key)
+        if row is None:
+            row = self.length
+            self.length += 1
+            self.changed_keys[row] = key
+            self.changed_rows[key] = row
+        self.changed_values[row] = value
+
+    def remove(self, key: K) -> None:
+        """
+        Remove a key and its value, moving the last value into its row.
+        """
+        row = self._row(key)
+        if row is None:
+            return
+        last = self.length - 1
+        if row != last:
+            moved = self._key(last)
+            self.changed_keys[row] = moved
+            self.changed_values[row] = self[last]
+            self.changed_rows[moved] = row
+        self.changed_keys.pop(last, None)
+        self.changed_values.pop(last, None)
+        self.changed_rows[key] = None
+        self.length = last
+
+
+class _CategoryColumn(Sequence[str]):
+    """
+    Lazy sequence of category names given by an array of category rows.
+    """
+
+    def __init__(self, names: List[str], rows: np.ndarray):
+        self.names = names
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index):  # type: ignore[override]
+        return self.names[int(self.rows[index])]
+
+
+class _Writer:
+    """
+    Accumulates the sections of a snapshot file.
+    """
+
+    def __init__(self):
+        self.strings: Dict[bytes, int] = {}
+        self.blob = bytearray()
+        self.offsets = [0]
+        self.sections: Dict[str, np.ndarray] = {}
+
+    def intern(self, text: str) -> int:
+        encoded = text.encode("utf-8")
+        string_id = self.strings.get(encoded)
+        if string_id is None:
+            string_id = len(self.offsets) - 1
+            self.strings[encoded] = string_id
+            self.blob += encoded
+            self.offsets.append(len(self.blob))
+        return string_id
+
+    def write(self, path: Path, meta: Dict[str, object]) -> None:
+        self.sections["string_offsets"] = np.array(self.offsets, dtype=np.uint64)
+        self.sections["string_blob"] = np.frombuffer(bytes(self.blob), dtype=np.uint8)
+
+        toc: Dict[str, object] = {"meta": meta, "sections": {}}
+        encoded_toc = b""
+        # Section offsets depend on the table of contents length, so lay out until stable
+        while True:
+            position = HEADER.size + len(encoded_toc)
+            sections = {}
+            for name, array in self.sections.items():
+                position += -position % ALIGNMENT
+                sections[name] = [position, array.dtype.str, len(array)]
+                position += array.nbytes
+            toc["sections"] = sections
+            laid_out = json.dumps(toc).encode("utf-8")
+            if len(laid_out) == len(encoded_toc):
+                encoded_toc = laid_out
+                break
+            encoded_toc = laid_out
+
+        temp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(temp_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, len(encoded_toc)))
+            file.write(encoded_toc)
+            for name, array in self.sections.items():
+                file.write(b"\0" * (toc["sections"][name][0] - file.tell()))  # type: ignore[index]
+                file.write(array.tobytes())
+        os.replace(temp_path, path)
+
+
+def compile_snapshot(data: Iterable[List[str]], q_a_data: Iterable[List[str]], path: Path, sources: Sequence[Path] = ()) -> None:
+    """
+    Write a snapshot of the parsed corpus. Each of the rows is iterated once, in order.
+
+    Args:
+        data (Iterable[List[str]]): Rows of input.csv (category, command, reply).
+        q_a_data (Iterable[List[str]]): Rows of q_and_a.csv (question, answer).
+        path (Path): The snapshot file to write.
+        sources (Sequence[Path]): The CSV files the rows come from, used to invalidate the snapshot.
+    """
+    logger.info("Compiling corpus snapshot to %s", path)
+    writer = _Writer()
+
+    # Commands and replies, grouped by category in order of first appearance
+    grouped: Dict[str, List[Tuple[str, str]]] = {}
+    for row in data:
+        grouped.setdefault(row[0], []).append((row[1], row[2]))
+    category_ids, category_starts, command_ids, reply_ids = [], [0], [], []
+    phrases: Dict[str, str] = {}
+    for category, rows in grouped.items():
+        category_ids.append(writer.intern(category))
+        for command, reply in rows:
+            command_ids.append(writer.intern(command))
+            reply_ids.append(writer.intern(reply))
+            phrases.setdefault(normalize(command), category)
+        category_starts.append(len(command_ids))
+    category_rows = {category: row for row, category in enumerate(grouped)}
+
+    writer.sections["category_ids"] = np.array(category_ids, dtype=np.uint32)
+    writer.sections["category_starts"] = np.array(category_starts, dtype=np.uint32)
+    writer.sections["command_ids"] = np.array(command_ids, dtype=np.uint32)
+    writer.sections["reply_ids"] = np.array(reply_ids, dtype=np.uint32)
+    writer.sections["phrase_ids"] = np.array([writer.intern(phrase) for phrase in phrases], dtype=np.uint32)
+    writer.sections["phrase_categories"] = np.array([category_rows[category] for category in phrases.values()], dtype=np.uint32)
+    writer.sections["phrase_slots"] = HashIndex.build([phrase.encode("utf-8") for phrase in phrases])
+
+    # Questions and answers; later rows override earlier ones, as in init_replies
+    q_and_a: Dict[str, str] = {}
+    for row in q_a_data:
+        q_and_a[row[0]] = row[1]
+    writer.sections["question_ids"] = np.array([writer.intern(question) for question in q_and_a], dtype=np.uint32)
+    writer.sections["answer_ids"] = np.array([writer.intern(answer) for answer in q_and_a.values()], dtype=np.uint32)
+    writer.sections["question_slots"] = HashIndex.build([question.encode("utf-8") for question in q_and_a])
+
+    qa_index = QAIndex()
+    qa_index.build(q_and_a)
+    writer.sections["term_ids"] = np.array([writer.intern(term) for term in qa_index.vocabulary], dtype=np.uint32)
+    writer.sections["term_slots"] = HashIndex.build([term.encode("utf-8") for term in qa_index.vocabulary])
+    for name, array in qa_index.arrays().items():
+        writer.sections[f"qa_{name}"] = array
+
+    meta = {
+        "sources": [_fingerprint(source) for source in sources],
+        "qa_params": qa_index.params(),
+    }
+    writer.write(path, meta)
+    logger.info("Corpus snapshot written: %d commands, %d questions", len(command_ids), len(q_and_a))
+
+
+def read_toc(path: Path) -> Dict[str, dict]:
+    """
+    Read the table of contents of a snapshot file without mapping it.
+
+    Args:
+        path (Path): The snapshot file.
+
+    Returns:
+        Dict[str, dict]: The snapshot metadata and section layout.
+
+    Raises:
+        ValueError: If the file is not a snapshot of the supported version.
+    """
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"Unsupported corpus snapshot: {path}")
+        magic, version, toc_length = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported corpus snapshot: {path}")
+        return json.loads(file.read(toc_length))
+
+
+def is_fresh(meta: Dict[str, object], sources: Sequence[Path]) -> bool:
+    """
+    Check whether a snapshot was compiled from the current version of the sources.
+    A changed mtime alone does not invalidate it if the content hash still matches.
+
+    Args:
+        meta (Dict[str, object]): The snapshot metadata.
+        sources (Sequence[Path]): The CSV files the snapshot was compiled from.
+
+    Returns:
+        bool: True if the snapshot is up to date.
+    """
+    recorded = {entry["path"]: entry for entry in meta["sources"]}  # type: ignore[union-attr]
+    if set(recorded) != {str(source) for source in sources}:
+        return False
+    for source in sources:
+        entry = recorded[str(source)]
+        current = _fingerprint(source, with_digest=False)
+        if current["size"] != entry["size"]:
+            return False
+        if current["mtime_ns"] != entry["mtime_ns"] and _fingerprint(source)["sha256"] != entry["sha256"]:
+            return False
+    return True
+
+
+class CorpusSnapshot:
+    """
+    Memory-mapped corpus snapshot. Nothing is decoded until it is looked up.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Map the snapshot file.
+
+        Args:
+            path (Path): The snapshot file.
+
+        Raises:
+            ValueError: If the file is not a snapshot of the supported version.
+        """
+        self.path = path
+        toc = read_toc(path)
+        with open(path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.meta: Dict[str, object] = toc["meta"]
+        self.sections = {
+            name: np.frombuffer(self.buffer, dtype=np.dtype(dtype), count=count, offset=offset)
+            for name, (offset, dtype, count) in toc["sections"].items()
+        }
+        sections = self.sections
+        blob_offset, _, blob_length = toc["sections"]["string_blob"]
+        self.strings = StringTable(memoryview(self.buffer)[blob_offset:blob_offset + blob_length], sections["string_offsets"])
+
+        category_names = StringColumn(self.strings, sections["category_ids"])
+        starts = sections["category_starts"]
+        self.category_names = [category_names[i] for i in range(len(category_names))]
+        ranges = {name: (int(starts[i]), int(starts[i + 1])) for i, name in enumerate(self.category_names)}
+
+        self.commands = GroupedColumn(ranges, StringColumn(self.strings, sections["command_ids"]))
+        self.replies = GroupedColumn(ranges, StringColumn(self.strings, sections["reply_ids"]))
+        self.phrases = IndexedMapping(
+            HashIndex(self.strings, sections["phrase_ids"], sections["phrase_slots"]),
+            _CategoryColumn(self.category_names, sections["phrase_categories"]),
+        )
+        self.questions = StringColumn(self.strings, sections["question_ids"])
+        self.answers = StringColumn(self.strings, sections["answer_ids"])
+        self.q_and_a = IndexedMapping(HashIndex(self.strings, sections["question_ids"], sections["question_slots"]), self.answers)
+        self.vocabulary = RowMapping(HashIndex(self.strings, sections["term_ids"], sections["term_slots"]))
+        self.question_rows = RowMapping(self.q_and_a.index)
+
+    def load_qa_index(self, qa_index: QAIndex) -> None:
+        """
+        Point a QAIndex at the postings stored in the snapshot.
+
+        Args:
+            qa_index (QAIndex): The index to load.
+        """
+        arrays = {name[3:]: array for name, array in self.sections.items() if name.startswith("qa_")}
+        qa_index.load(
+            self.questions, self.answers, self.vocabulary, self.question_rows, arrays, self.meta["qa_params"]  # type: ignore[arg-type]
+        )
+
+def open_snapshot(path: Path, sources: Sequence[Path], load_csv) -> CorpusSnapshot:
+    """
+    Map the snapshot for the given sources, compiling it first if it is missing or stale.
+
+    Args:
+        path (Path): The snapshot file.
+        sources (Sequence[Path]): input.csv and q_and_a.csv, in that order.
+        load_csv (Callable[[str], List[List[str]]]): Reader used to parse the sources when compiling.
+
+    Returns:
+        CorpusSnapshot: The mapped snapshot.
+    """
+    if path.exists():
+        try:
+            if is_fresh(read_toc(path)["meta"], sources):
+                logger.info("Using corpus snapshot %s", path)
+                return CorpusSnapshot(path)
+            logger.info("Corpus snapshot is stale, recompiling")
+        except (ValueError, KeyError, OSError) as e:
+            logger.warning("Ignoring unreadable corpus snapshot %s: %s", path, e)
+
+    input_path, q_and_a_path = sources
+    compile_snapshot(load_csv(str(input_path)), load_csv(str(q_and_a_path)), path, sources)
+    return CorpusSnapshot(path)
+
+
+if __name__ == "__main__":
+    from src.data.commands import INPUT_PATH, Q_AND_A_PATH, SNAPSHOT_PATH, load_csv
+
+    open_snapshot(SNAPSHOT_PATH, [INPUT_PATH, Q_AND_A_PATH], load_csv)
@@ -1,43 +1,44 @@
-import csv
-import time
+import os
+import tempfile
+from pathlib import Path
 
+from src.data.corpus_tool import MEMORY_BYTES, CorpusReport, clean_commands, log_report, unique_in_order
 
-def sort_by_categories() -> None:
-    """
-    Sort the given CSV file by the category.
+
+def sort_by_categories(
+    source: str = "jarvis-like-assistant/unsorted.csv",
+    destination: str = "jarvis-like-assistant/input.csv",
+) -> None:
     """
-    with open("jarvis-like-assistant/unsorted.csv", newline="") as csvfile:
-        spamreader = csv.DictReader(csvfile, delimiter=",")
-        sortedlist = sorted(
-            spamreader,
-            key=lambda row: (row["category"], row["command"], row["reply"]),
-            reverse=False,
-        )
+    Sort the given CSV file by the category, then command and reply, dropping invalid
+    and duplicate rows. Uses an external merge sort, so the file may exceed memory.
 
-    with open("jarvis-like-assistant/input.csv", "w") as f:
-        fieldnames = ["category", "command", "reply"]
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in sortedlist:
-            writer.writerow(row)
-            time.sleep(0.1)
+    Args:
+        source (str): The CSV file to sort, with or without a header row.
+        destination (str): Where the sorted file is written, with a header row.
+    """
+    destination_path = Path(destination)
+    with tempfile.TemporaryDirectory(dir=destination_path.parent) as folder:
+        for _ in clean_commands(Path(source), destination_path, folder, MEMORY_BYTES, header=True):
+            pass
 
 
 def remove_duplicate_lines(file_path: str) -> None:
     """
-    Remove duplicate lines from the given file.
+    Remove duplicate lines from the given file, keeping the first of each in order.
+    Memory use is bounded, so the file may exceed memory.
 
     Args:
         file_path (str): The path to the file.
     """
-    with open(file_path, "r") as file:
-        lines = file.readlines()
-        unique_lines = set(lines)
-
-    with open(file_path, "w") as file:
-        file.writelines(unique_lines)
-
-
-# # Test
-# sort_by_categories()
-# remove_duplicate_lines("jarvis-like-assistant/input.csv")
+    path = Path(file_path)
+    report = CorpusReport(file_path)
+    with tempfile.TemporaryDirectory(dir=path.parent) as folder:
+        temp_path = os.path.join(folder, "unique.txt")
+        with open(path, "r", encoding="utf-8", newline="") as file, open(temp_path, "w", encoding="utf-8", newline="") as out:
+            lines = ([line.rstrip("\r\n")] for line in file)
+            for (line,) in unique_in_order(lines, folder, MEMORY_BYTES, report, path.stat().st_size):
+                out.write(line + "\n")
+                report.rows_written += 1
+        os.replace(temp_path, path)
+    log_report(report)
@@ -0,0 +1,208 @@
+import csv
+import io
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.core.logger import Logger
+from src.data import commands as corpus
+from src.data.intent_index import normalize
+
+logger = Logger(__name__).get_logger()
+
+# Bytes kept from the end of each file to recognize appends
+TAIL_SIZE = 256
+
+
+class FileState(NamedTuple):
+    size: int
+    mtime_ns: int
+    tail: bytes
+
+
+def read_state(path: Path) -> Optional[FileState]:
+    """
+    Get the size, modification time and last bytes of a file.
+
+    Args:
+        path (Path): The file.
+
+    Returns:
+        Optional[FileState]: The file state, or None if the file does not exist.
+    """
+    try:
+        stat = path.stat()
+        with open(path, "rb") as file:
+            file.seek(max(0, stat.st_size - TAIL_SIZE))
+            tail = file.read(TAIL_SIZE)
+    except FileNotFoundError:
+        return None
+    return FileState(stat.st_size, stat.st_mtime_ns, tail)
+
+
+def read_appended_rows(path: Path, old: FileState, new: FileState) -> Optional[List[List[str]]]:
+    """
+    Parse only the rows appended to a file since it had the old state.
+
+    Args:
+        path (Path): The file.
+        old (FileState): The state the rows were last loaded from.
+        new (FileState): The current state.
+
+    Returns:
+        Optional[List[List[str]]]: The appended rows, or None if the file was changed
+            in any other way than appending whole rows.
+    """
+    if new.size <= old.size or (old.tail and not old.tail.endswith(b"\n")):
+        return None
+    with open(path, "rb") as file:
+        file.seek(old.size - len(old.tail))
+        if file.read(len(old.tail)) != old.tail:
+            return None
+        appended = file.read(new.size - old.size)
+    return list(csv.reader(io.StringIO(appended.decode("utf-8"), newline="")))
+
+
+def _valid(rows: List[List[str]], columns: int, path: Path) -> List[List[str]]:
+    valid = [row[:columns] for row in rows if len(row) >= columns]
+    if len(valid) != len(rows):
+        logger.warning("Skipped %d malformed rows in %s", len(rows) - len(valid), path)
+    return valid
+
+
+def diff_commands(rows: List[List[str]]) -> Tuple[List[List[str]], List[List[str]], Dict[str, Optional[str]]]:
+    """
+    Compare the rows of input.csv with the loaded commands and replies.
+
+    Args:
+        rows (List[List[str]]): All rows of the new file.
+
+    Returns:
+        Tuple: The added rows, the removed rows and the first category listing each
+            affected normalized phrase (None if no category lists it anymore).
+    """
+    current: Counter = Counter()
+    for category in corpus.commands:
+        for command, reply in zip(corpus.commands[category], corpus.replies[category]):
+            current[(category, command, reply)] += 1
+    new = Counter(tuple(row) for row in rows)
+
+    added = [list(row) for row in (new - current).elements()]
+    removed = [list(row) for row in (current - new).elements()]
+
+    affected = {normalize(row[1]) for row in added + removed}
+    owners: Dict[str, Optional[str]] = dict.fromkeys(affected)
+    pending = set(affected)
+    for category, command, _ in rows:
+        phrase = normalize(command)
+        if phrase in pending:
+            owners[phrase] = category
+            pending.discard(phrase)
+            if not pending:
+                break
+    return added, removed, owners
+
+
+def diff_q_and_a(rows: List[List[str]]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Compare the rows of q_and_a.csv with the loaded questions and answers.
+
+    Args:
+        rows (List[List[str]]): All rows of the new file.
+
+    Returns:
+        Tuple[Dict[str, str], List[str]]: New or changed answers keyed by question, and
+            the questions no longer in the file.
+    """
+    new = {question: answer for question, answer in rows}
+    upserts = {question: answer for question, answer in new.items() if corpus.q_and_a.get(question) != answer}
+    deletions = [question for question in corpus.q_and_a if question not in new]
+    return upserts, deletions
+
+
+class CorpusWatcher:
+    """
+    Polls the corpus CSV files and applies their changes to the loaded data while the
+    assistant keeps running. Appended rows are parsed on their own; any other edit is
+    diffed row by row against the loaded data. Either way only the changed rows are
+    applied to the lookup structures.
+    """
+
+    def __init__(self, paths: Optional[Sequence[Path]] = None, interval: float = 1.0):
+        """
+        Args:
+            paths (Optional[Sequence[Path]]): input.csv and q_and_a.csv, in that order.
+                Defaults to the files init_replies loads.
+            interval (float): Seconds between polls.
+        """
+        self.input_path, self.q_and_a_path = paths or (corpus.INPUT_PATH, corpus.Q_AND_A_PATH)
+        self.interval = interval
+        self.states: Dict[Path, Optional[FileState]] = {
+            path: read_state(path) for path in (self.input_path, self.q_and_a_path)
+        }
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start polling in a background thread.
+        """
+        logger.info("Watching %s and %s for changes", self.input_path, self.q_and_a_path)
+        self._thread = threading.Thread(target=self._run, name="corpus-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop polling.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error("Failed to reload the corpus: %s", e)
+
+    def poll(self) -> bool:
+        """
+        Check the files once and apply any changes.
+
+        Returns:
+            bool: True if a file had changed.
+        """
+        changed = False
+        for path in (self.input_path, self.q_and_a_path):
+            old = self.states[path]
+            new = read_state(path)
+            if new is None or old == new:
+                continue
+            changed = True
+            appended = read_appended_rows(path, old, new) if old else None
+            if path == self.input_path:
+                self._reload_commands(path, appended)
+            else:
+                self._reload_q_and_a(path, appended)
+            self.states[path] = new
+        return changed
+
+    def _reload_commands(self, path: Path, appended: Optional[List[List[str]]]) -> None:
+        if appended is not None:
+            logger.info("Rows appended to %s", path)
+            corpus.apply_command_changes(_valid(appended, 3, path), [])
+            return
+        logger.info("%s changed, diffing rows", path)
+        added, removed, owners = diff_commands(_valid(corpus.load_csv(str(path)), 3, path))
+        corpus.apply_command_changes(added, removed, owners)
+
+    def _reload_q_and_a(self, path: Path, appended: Optional[List[List[str]]]) -> None:
+        if appended is not None:
+            logger.info("Rows appended to %s", path)
+            corpus.apply_q_and_a_changes(dict(_valid(appended, 2, path)), [])
+            return
+        logger.info("%s changed, diffing rows", path)
+        upserts, deletions = diff_q_and_a(_valid(corpus.load_csv(str(path)), 2, path))
+        corpus.apply_q_and_a_changes(upserts, deletions)
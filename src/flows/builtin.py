@@ -0,0 +1,103 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, List
+
+from src.core.constants import CALENDAR, FUNFACT, QUESTION_KEYWORD, TIME, WEATHER
+from src.core.registry import Flow
+from src.core.resilience import resilience
+from src.core.tracing import tracer
+from src.data import commands as corpus
+
+if TYPE_CHECKING:
+    from src.core.recognizer import Recognizer
+
+# Only flow declarations live here, so importing this module imports no flow service
+TOKEN_PATH = Path(__file__).parent.parent.parent / "user_data" / "token.json"
+
+
+class QuestionFlow(Flow):
+    """
+    Asks for the question and answers it from the Q&A corpus.
+    """
+
+    def __init__(self):
+        super().__init__(
+            QUESTION_KEYWORD,
+            [QUESTION_KEYWORD],
+            priority=40,
+            acknowledgement="What is your question, Sir?",
+            interactive=True,
+        )
+
+    def run(self, recognizer: "Recognizer", command: str) -> None:
+        recognizer.speech.speak(self.acknowledgement, cache=True)
+        # The user takes their time to ask; the budget covers answering, not listening
+        with resilience.budget(None, restart=True):
+            question = recognizer.speech.get_audio()
+        with resilience.budget(recognizer.turn_budget, restart=True):
+            recognizer.answer_question(question)
+
+
+class FunFactFlow(Flow):
+    """
+    Tells an answer from the Q&A corpus, not repeating one until all have been told.
+    """
+
+    def __init__(self):
+        super().__init__(FUNFACT, [FUNFACT], priority=50, acknowledgement="Fetching a fun fact for you, Sir!")
+
+    def answer(self, recognizer: "Recognizer", command: str) -> str:
+        with tracer.span("flow"):
+            with corpus.lock:
+                fact = recognizer.selector.pick(FUNFACT, corpus.answers, save=False)
+            # Not while holding the corpus lock, which every lookup waits on
+            recognizer.selector.save()
+        return fact or "I don't know any fun facts yet, Sir!"
+
+
+def _calendar_events(service: Any, command: str) -> str:
+    return service.get_calendar_events(command.split())
+
+
+def _time_info(service: Any, command: str) -> str:
+    return service.get_time_info(command.split())
+
+
+def _weather_info(service: Any, command: str) -> str:
+    return service.get_weather_info()
+
+
+BUILTIN_FLOWS: List[Flow] = [
+    Flow(
+        CALENDAR,
+        [CALENDAR],
+        priority=10,
+        factory="src.flows.calendar_flow:CalendarService",
+        respond=_calendar_events,
+        acknowledgement="Opening calendar, Sir!",
+        # Logging in needs the browser, so only warm up once the user has logged in
+        warm=True,
+        can_warm=TOKEN_PATH.exists,
+        # Dispatched first, but warmed up after the quicker time and weather services
+        warm_priority=35,
+    ),
+    Flow(
+        TIME,
+        [TIME],
+        priority=20,
+        factory="src.flows.time_flow:TimeService",
+        respond=_time_info,
+        acknowledgement="Opening time, Sir!",
+        warm=True,
+    ),
+    Flow(
+        WEATHER,
+        [WEATHER],
+        priority=30,
+        factory="src.flows.weather_flow:WeatherService",
+        respond=_weather_info,
+        acknowledgement="Opening weather, Sir!",
+        warm=True,
+    ),
+    QuestionFlow(),
+    FunFactFlow(),
+]
@@ -0,0 +1,146 @@
+import datetime
+import threading
+from pathlib import Path
+from typing import Optional
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import Resource, build
+
+from src.core.logger import Logger
+
+logger = Logger(__name__).get_logger()
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+USER_DATA = Path(__file__).parent.parent.parent / "user_data"
+TOKEN_PATH = USER_DATA / "token.json"
+CREDENTIALS_PATH = USER_DATA / "credentials.json"
+
+# Refresh the access token this long before it expires
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+
+def load_credentials(token_path: Path = TOKEN_PATH, credentials_path: Path = CREDENTIALS_PATH) -> Credentials:
+    """
+    Load the user's credentials from token.json, refreshing them or asking the user
+    to log in if needed.
+
+    Args:
+        token_path (Path): The stored OAuth2 token.
+        credentials_path (Path): The OAuth2 client secrets, used to log in.
+
+    Returns:
+        Credentials: Valid credentials.
+    """
+    creds = None
+    if token_path.exists():
+        creds = Credentials.from_authorized_user_file(str(token_path), SCOPES)
+
+    # If there are no valid credentials, request the user to log in
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(str(credentials_path), SCOPES)
+            creds = flow.run_local_server(port=0)
+        save_credentials(creds, token_path)
+    return creds
+
+
+def save_credentials(creds: Credentials, token_path: Path = TOKEN_PATH) -> None:
+    with open(token_path, 'w') as token:
+        token.write(creds.to_json())
+
+
+def build_calendar_service(creds: Credentials) -> Resource:
+    """
+    Build the Calendar API client from the discovery document shipped with the
+    client library, so building it needs no network and follows library upgrades.
+
+    Args:
+        creds (Credentials): The user's credentials.
+
+    Returns:
+        Resource: The Calendar API client.
+    """
+    return build("calendar", "v3", credentials=creds, static_discovery=True, cache_discovery=False)
+
+
+class CredentialRefresher:
+    """
+    Refreshes the access token in a background thread shortly before it expires, so
+    API calls never stop to refresh it.
+    """
+
+    def __init__(self, creds: Credentials, token_path: Optional[Path] = TOKEN_PATH, margin: datetime.timedelta = REFRESH_MARGIN):
+        """
+        Args:
+            creds (Credentials): The credentials to keep fresh; refreshed in place.
+            token_path (Optional[Path]): Where refreshed tokens are saved, or None to not save them.
+            margin (datetime.timedelta): How long before expiry to refresh.
+        """
+        self.creds = creds
+        self.token_path = token_path
+        self.margin = margin
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def seconds_until_refresh(self) -> float:
+        if not self.creds.expiry:
+            return 0.0
+        # Credentials keep their expiry as naive UTC
+        expiry = self.creds.expiry.replace(tzinfo=datetime.timezone.utc)
+        return (expiry - self.margin - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+
+    def start(self) -> None:
+        """
+        Start refreshing in a background thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="credential-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop refreshing.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(max(self.seconds_until_refresh(), 0.0)):
+            if not self.creds.expiry or not self.creds.refresh_token:
+                logger.debug("Credentials do not expire or cannot be refreshed")
+                return
+            try:
+                self.creds.refresh(Request())
+                logger.debug("Refreshed the access token, valid until %s", self.creds.expiry)
+                if self.token_path:
+                    save_credentials(self.creds, self.token_path)
+            except Exception as e:
+                logger.error("Failed to refresh the access token: %s", e)
+                # Try again later instead of spinning
+                if self._stop.wait(60):
+                    return
+
+
+_service: Optional[Resource] = None
+_service_lock = threading.Lock()
+
+
+def get_calendar_service() -> Resource:
+    """
+    Get the process-wide Calendar API client, creating it on first use.
+
+    Returns:
+        Resource: The Calendar API client.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            creds = load_credentials()
+            CredentialRefresher(creds).start()
+            _service = build_calendar_service(creds)
+            logger.info("Google Calendar service initialized successfully")
+        return _service
@@ -1,14 +1,11 @@
 import datetime
-import os
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional, Sequence
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from src.core.logger import Logger
+from src.core.resilience import DependencyError
+from src.flows.calendar_client import get_calendar_service
+from src.flows.calendar_store import CalendarSet
 
 logger = Logger(__name__).get_logger()
 
@@ -16,44 +13,35 @@ logger = Logger(__name__).get_logger()
 TODAY = "today"
 TOMORROW = "tomorrow"
 NEXT = "next"
-SCOPES = ['https://www.googleapis.com/auth/calendar']
+# One calendar id or name per line; every calendar of the user if missing
+CALENDARS_PATH = Path(__file__).parent.parent.parent / "user_data" / "calendars.txt"
 
 class CalendarService:
-    def __init__(self):
+    def __init__(self, service=None, calendars: Optional[Sequence[str]] = None):
         logger.info("Initializing CalendarService")
         """
-        Initialize the CalendarService by authenticating with Google Calendar API.
-        """
-        # Path to the credentials file 
-        user_specific_folder = Path(__file__).parent.parent.parent / "user_data"
-        self.creds = None
-        # Check if token.json file exists for storing user credentials
-        if os.path.exists(Path(f'{user_specific_folder}/token.json').resolve()):
-            self.creds = Credentials.from_authorized_user_file(Path(f'{user_specific_folder}/token.json').resolve(), SCOPES)
-
-        # If there are no valid credentials, request the user to log in
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(Path(f'{user_specific_folder}/credentials.json').resolve(), SCOPES)
-                self.creds = flow.run_local_server(port=0)
+        Initialize the CalendarService with the process-wide Google Calendar API client,
+        and mirror the user's calendars into local event stores that are synced in the
+        background.
 
-            # Save the credentials for the next run
-            with open(Path(f'{user_specific_folder}/token.json').resolve(), 'w') as token:
-                token.write(self.creds.to_json())
+        Args:
+            service: The Calendar API service; the shared client by default.
+            calendars (Optional[Sequence[str]]): Ids or names of the calendars to answer
+                from; read from user_data/calendars.txt if it exists, and every calendar
+                of the user otherwise.
+        """
+        self.service = service or get_calendar_service()
+        if calendars is None and CALENDARS_PATH.exists():
+            with open(CALENDARS_PATH, "r", encoding="utf-8") as f:
+                calendars = [line.strip() for line in f if line.strip()]
 
-        try:
-            self.service = build('calendar', 'v3', credentials=self.creds)
-            logger.info("Google Calendar service initialized successfully")
-        except HttpError as error:
-            logger.error("An error occurred during CalendarService initialization: %s", error)
-            self.service = None
-            raise
-        
         # Get system timezone
         self.local_tz = datetime.datetime.now().astimezone().tzinfo
 
+        self.store = CalendarSet(self.service, calendars, tz=self.local_tz)
+        # The first sync runs in the background too; a query made before it is done waits for it
+        self.store.start()
+
     def get_date_from_keyword(self, keyword: str) -> datetime.date:
         """
         Get the date based on a keyword like 'today', 'tomorrow', or 'yesterday'.
@@ -85,10 +73,28 @@ class CalendarService:
         except ValueError:
             raise ValueError("Invalid date format. Use 'day month' (e.g., '20 May').")
 
+    def format_events(self, events: List[Dict[str, Any]], title: str, empty: str) -> str:
+        """
+        Format events for speaking.
+
+        Args:
+            events (List[Dict[str, Any]]): The events.
+            title (str): First line of the answer.
+            empty (str): The answer if there are no events.
+
+        Returns:
+            str: The answer.
+        """
+        if not events:
+            return empty
+        event_list = [f"{event['start'].get('dateTime', event['start'].get('date'))}: {event['summary']}" for event in events]
+        return f"{title}:\n" + "\n".join(event_list)
+
     def get_events_for_date(self, target_date: datetime.date) -> str:
-        logger.debug(f"Fetching events for date: {target_date}")
+        logger.debug("Fetching events for date: %s", target_date)
         """
-        Retrieve events for a specific date from Google Calendar.
+        Retrieve events for a specific date from the local event store, or from the API
+        for a date outside the synced window.
 
         Args:
             target_date (datetime.date): The target date.
@@ -96,27 +102,22 @@ class CalendarService:
         Returns:
             str: A string containing the events for the specified date.
         """
-        start_of_day = datetime.datetime.combine(target_date, datetime.time.min, tzinfo=self.local_tz).isoformat()
-        end_of_day = datetime.datetime.combine(target_date, datetime.time.max, tzinfo=self.local_tz).isoformat()
-
-        events_result = self.service.events().list( # type: ignore
-            calendarId='primary',  # Use 'primary' for the main calendar
-            timeMin=start_of_day,
-            timeMax=end_of_day,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-
-        events = events_result.get('items', [])
-        if not events:
-            return f"No events found for {target_date.strftime('%d %B %Y')}."
-
-        event_list = [f"{event['start'].get('dateTime', event['start'].get('date'))}: {event['summary']}" for event in events]
-        logger.info(f"Events fetched for {target_date}")
-        return f"Events for {target_date.strftime('%d %B %Y')}:\n" + "\n".join(event_list)
+        start_of_day = datetime.datetime.combine(target_date, datetime.time.min, tzinfo=self.local_tz)
+        end_of_day = datetime.datetime.combine(target_date, datetime.time.max, tzinfo=self.local_tz)
+        if self.store.covers(start_of_day, end_of_day):
+            events = self.store.between(start_of_day, end_of_day)
+        else:
+            # Outside the synced window, e.g. a day long past: ask the API
+            events = self.store.fetch_between(start_of_day, end_of_day)
+        logger.info("Events fetched for %s", target_date)
+        return self.format_events(
+            events,
+            f"Events for {target_date.strftime('%d %B %Y')}",
+            f"No events found for {target_date.strftime('%d %B %Y')}.",
+        )
 
     def get_calendar_events(self, data: List[str]) -> str:
-        logger.debug(f"Fetching calendar events with data: {data}")
+        logger.debug("Fetching calendar events with data: %s", data)
         """
         Get the calendar events for today, tomorrow, yesterday, or a specific date.
 
@@ -128,37 +129,16 @@ class CalendarService:
         """
         try:
             if NEXT in data:
-                now = datetime.datetime.now(self.local_tz).isoformat()
-                event_results = self.service.events().list( # type: ignore
-                    calendarId='primary', 
-                    timeMin=now, 
-                    maxResults=3, 
-                    singleEvents=True, 
-                    orderBy="startTime"
-                ).execute() 
-                events = event_results.get('items', [])
-                if not events:
-                    return "No upcoming events found."
-                event_list = [f"{event['start'].get('dateTime', event['start'].get('date'))}: {event['summary']}" for event in events]
+                now = datetime.datetime.now(self.local_tz)
+                events = self.store.upcoming(now, 3)
                 logger.info("Calendar events fetched successfully")
-                return "Upcoming events:\n" + "\n".join(event_list)
+                return self.format_events(events, "Upcoming events", "No upcoming events found.")
             elif TODAY in data:
-                target_date = datetime.date.today()
-                start_of_day = datetime.datetime.now(self.local_tz).isoformat()
-                end_of_day = datetime.datetime.combine(target_date, datetime.time.max, tzinfo=self.local_tz).isoformat()
-                event_results = self.service.events().list( # type: ignore
-                    calendarId='primary', 
-                    timeMin=start_of_day,
-                    timeMax=end_of_day,
-                    singleEvents=True, 
-                    orderBy="startTime"
-                ).execute() 
-                events = event_results.get('items', [])
-                if not events:
-                    return "No upcoming events found."
-                event_list = [f"{event['start'].get('dateTime', event['start'].get('date'))}: {event['summary']}" for event in events]
+                now = datetime.datetime.now(self.local_tz)
+                end_of_day = datetime.datetime.combine(now.date(), datetime.time.max, tzinfo=self.local_tz)
+                events = self.store.between(now, end_of_day)
                 logger.info("Calendar events fetched successfully")
-                return "Upcoming events:\n" + "\n".join(event_list)
+                return self.format_events(events, "Upcoming events", "No upcoming events found.")
             elif TOMORROW in data:
                 target_date = self.get_date_from_keyword(TOMORROW)
             else:
@@ -170,5 +150,9 @@ class CalendarService:
                 target_date = self.parse_date_from_string(date_str)
 
             return self.get_events_for_date(target_date)
+        except DependencyError as e:
+            # Only until the first sync has succeeded; after that the local copy answers
+            logger.error("Calendar unavailable: %s", e)
+            return "I can't reach your calendar right now, Sir. Please try again later."
         except Exception as e:
-            return f"An error occurred: {e}"
\ No newline at end of file
+            return f"An error occurred: {e}"
@@ -0,0 +1,603 @@
+import bisect
+import datetime
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, Generator, Iterable, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+from googleapiclient.errors import HttpError
+
+from src.core.logger import Logger
+from src.core.resilience import GOOGLE_CALENDAR, resilience
+
+logger = Logger(__name__).get_logger()
+
+T = TypeVar("T")
+
+# How far back and ahead the full sync reaches; other dates are asked of the API
+SYNC_WINDOW = datetime.timedelta(days=1)
+SYNC_AHEAD = datetime.timedelta(days=365)
+# Requests the Calendar API accepts in one batch request
+BATCH_LIMIT = 50
+# Seconds between readings of the calendar list, to pick up added or removed calendars
+DISCOVERY_INTERVAL = 60 * 60
+
+
+class Event(NamedTuple):
+    start: datetime.datetime
+    end: datetime.datetime
+    # The event resource as returned by the Calendar API
+    resource: Dict[str, Any]
+
+
+def execute(request) -> Dict[str, Any]:
+    """
+    Execute a Calendar API request through the calendar's circuit breaker. Client
+    errors such as an expired sync token are answers, not failures of the API.
+
+    Args:
+        request: The API request.
+
+    Returns:
+        Dict[str, Any]: The response.
+
+    Raises:
+        HttpError: For a client error.
+        DependencyError: If the API failed or its circuit is open.
+    """
+
+    def run() -> Any:
+        try:
+            return request.execute()
+        except HttpError as e:
+            if e.resp.status < 500:
+                return e
+            raise
+
+    response = resilience.call(GOOGLE_CALENDAR, run)
+    if isinstance(response, HttpError):
+        raise response
+    return response
+
+
+def execute_batch(service, requests: Sequence[Any]) -> List[Any]:
+    """
+    Execute Calendar API requests in batch requests of up to BATCH_LIMIT each, through
+    the calendar's circuit breaker, so that they take one round trip instead of one each.
+
+    Args:
+        service: The Calendar API service.
+        requests (Sequence[Any]): The API requests.
+
+    Returns:
+        List[Any]: The response of each request, or its HttpError; a server error of one
+            request is returned like a client error, so the other requests still count.
+
+    Raises:
+        DependencyError: If the batch or every one of its requests failed, or the circuit is open.
+    """
+
+    def run() -> List[Any]:
+        responses: List[Any] = [None] * len(requests)
+
+        def collect(request_id: str, response: Any, exception: Optional[HttpError]) -> None:
+            responses[int(request_id)] = response if exception is None else exception
+
+        for offset in range(0, len(requests), BATCH_LIMIT):
+            batch = service.new_batch_http_request(callback=collect)
+            for index in range(offset, min(offset + BATCH_LIMIT, len(requests))):
+                batch.add(requests[index], request_id=str(index))
+            batch.execute()
+        failed = [response for response in responses if isinstance(response, HttpError) and response.resp.status >= 500]
+        if failed and len(failed) == len(responses):
+            # Nothing got through; let the circuit breaker count it
+            raise failed[0]
+        return responses
+
+    return resilience.call(GOOGLE_CALENDAR, run)
+
+
+def drive(steps: Generator[Any, Any, T]) -> T:
+    """
+    Run the requests a generator yields one at a time, sending each response back
+    into it, or throwing in its HttpError.
+
+    Args:
+        steps (Generator[Any, Any, T]): E.g. EventStore.sync_steps().
+
+    Returns:
+        T: What the generator returns.
+    """
+    outcome: Any = None
+    while True:
+        try:
+            request = steps.throw(outcome) if isinstance(outcome, HttpError) else steps.send(outcome)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            # Not hedged or timed out on another thread: the API client is not thread-safe
+            outcome = execute(request)
+        except HttpError as e:
+            outcome = e
+
+
+def parse_time(value: Dict[str, str], tz: datetime.tzinfo) -> datetime.datetime:
+    """
+    Parse the start or end of an event; all-day events start at local midnight.
+
+    Args:
+        value (Dict[str, str]): The "start" or "end" field of the event.
+        tz (datetime.tzinfo): Timezone of all-day events.
+
+    Returns:
+        datetime.datetime: The time, timezone-aware.
+    """
+    if "dateTime" in value:
+        # fromisoformat only accepts the "Z" suffix from Python 3.11 on
+        return datetime.datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+    return datetime.datetime.combine(datetime.date.fromisoformat(value["date"]), datetime.time.min, tzinfo=tz)
+
+
+class EventStore:
+    """
+    Local copy of a calendar, kept current with the Calendar API's incremental sync
+    so that queries never wait for the network. Events are indexed by start time; an
+    overlap query scans the starts from (range start - longest event) on.
+    """
+
+    def __init__(self, service, calendar_id: str = "primary", interval: float = 60.0, tz: Optional[datetime.tzinfo] = None):
+        """
+        Args:
+            service: The Calendar API service.
+            calendar_id (str): The calendar to mirror.
+            interval (float): Seconds between background syncs.
+            tz (Optional[datetime.tzinfo]): Timezone of all-day events; the system timezone by default.
+        """
+        self.service = service
+        self.calendar_id = calendar_id
+        self.interval = interval
+        self.tz = tz or datetime.datetime.now().astimezone().tzinfo
+
+        # The lock guards the index; the sync lock keeps one sync running at a time
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.events: Dict[str, Event] = {}
+        self.sync_token: Optional[str] = None
+        self.starts: List[datetime.datetime] = []
+        self.ordered: List[Event] = []
+        self.longest = datetime.timedelta(0)
+        # The time range of the last full sync; events outside it may be missing
+        self.window: Optional[Tuple[datetime.datetime, datetime.datetime]] = None
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _list_pages(self, **params) -> Generator[Any, Dict[str, Any], Tuple[Dict[str, Optional[Event]], Optional[str]]]:
+        """
+        Read every page of an events().list query, yielding the request of each page
+        and being sent its response.
+
+        Returns:
+            Tuple: The listed events keyed by id (None for cancelled ones) and the sync
+                token of the last page.
+        """
+        changes: Dict[str, Optional[Event]] = {}
+        page_token = None
+        while True:
+            response = yield self.service.events().list(
+                calendarId=self.calendar_id, singleEvents=True, pageToken=page_token, **params
+            )
+            for item in response.get("items", []):
+                if item.get("status") == "cancelled":
+                    changes[item["id"]] = None
+                else:
+                    changes[item["id"]] = Event(parse_time(item["start"], self.tz), parse_time(item["end"], self.tz), item)
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return changes, response.get("nextSyncToken")
+
+    def sync_steps(self) -> Generator[Any, Dict[str, Any], None]:
+        """
+        The requests of one sync, so that several calendars can be synced in batch
+        requests: yields each events().list request, to be sent back its response or
+        thrown its HttpError, and applies the changes once exhausted. The store must
+        not be synced otherwise in the meantime.
+        """
+        if self.sync_token:
+            try:
+                changes, sync_token = yield from self._list_pages(syncToken=self.sync_token)
+                self._apply(changes, sync_token)
+                return
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                logger.info("Sync token of calendar %s expired, doing a full sync", self.calendar_id)
+        now = datetime.datetime.now(self.tz)
+        window = (now - SYNC_WINDOW, now + SYNC_AHEAD)
+        changes, sync_token = yield from self._list_pages(timeMin=window[0].isoformat(), timeMax=window[1].isoformat())
+        self._apply(changes, sync_token, window)
+        logger.debug("Synced %d events of calendar %s", len(self.events), self.calendar_id)
+
+    def sync(self) -> None:
+        """
+        Fetch the changes since the last sync, or the whole calendar the first time or
+        when Google has invalidated the sync token. Queries keep being answered from
+        the current events while the changes are fetched.
+        """
+        with self.sync_lock:
+            drive(self.sync_steps())
+
+    def fetch_steps(self, start: datetime.datetime, end: datetime.datetime) -> Generator[Any, Dict[str, Any], List[Event]]:
+        """
+        The requests listing the events overlapping a time range straight from the API,
+        for ranges outside the synced window; yields them like sync_steps().
+
+        Returns:
+            List[Event]: The events, ordered by start time.
+        """
+        listed, _ = yield from self._list_pages(timeMin=start.isoformat(), timeMax=end.isoformat())
+        return sorted((event for event in listed.values() if event is not None), key=lambda event: event.start)
+
+    def covers(self, start: datetime.datetime, end: datetime.datetime) -> bool:
+        """
+        Tell whether a time range lies in the synced window, so the local copy has all its events.
+        """
+        with self.lock:
+            return self.window is not None and self.window[0] <= start and end <= self.window[1]
+
+    def _apply(
+        self,
+        changes: Dict[str, Optional[Event]],
+        sync_token: Optional[str],
+        window: Optional[Tuple[datetime.datetime, datetime.datetime]] = None,
+    ) -> None:
+        # A full sync comes with its window and replaces the events
+        events = {} if window else dict(self.events)
+        for event_id, event in changes.items():
+            if event is None:
+                events.pop(event_id, None)
+            else:
+                events[event_id] = event
+        ordered = sorted(events.values(), key=lambda event: event.start)
+        longest = max((event.end - event.start for event in ordered), default=datetime.timedelta(0))
+        with self.lock:
+            self.events = events
+            self.ordered = ordered
+            self.starts = [event.start for event in ordered]
+            self.longest = longest
+            self.sync_token = sync_token
+            if window:
+                self.window = window
+
+    def ensure_synced(self) -> None:
+        """
+        Sync now if the store has never been synced, e.g. because the first sync failed.
+        """
+        if self.sync_token is None:
+            self.sync()
+
+    def events_between(self, start: datetime.datetime, end: datetime.datetime) -> List[Event]:
+        """
+        Get the events overlapping a time range from the local copy, as it is.
+
+        Args:
+            start (datetime.datetime): Start of the range, timezone-aware.
+            end (datetime.datetime): End of the range, timezone-aware.
+
+        Returns:
+            List[Event]: The events, ordered by start time.
+        """
+        with self.lock:
+            first = bisect.bisect_left(self.starts, start - self.longest)
+            last = bisect.bisect_left(self.starts, end)
+            return [event for event in self.ordered[first:last] if event.end > start]
+
+    def events_upcoming(self, now: datetime.datetime, limit: int) -> List[Event]:
+        """
+        Get the next events that have not ended yet from the local copy, as it is.
+
+        Args:
+            now (datetime.datetime): The current time, timezone-aware.
+            limit (int): Maximum number of events.
+
+        Returns:
+            List[Event]: The events, ordered by start time.
+        """
+        with self.lock:
+            events = []
+            for event in self.ordered[bisect.bisect_left(self.starts, now - self.longest):]:
+                if event.end > now:
+                    events.append(event)
+                    if len(events) == limit:
+                        break
+            return events
+
+    def between(self, start: datetime.datetime, end: datetime.datetime) -> List[Dict[str, Any]]:
+        """
+        Get the events overlapping a time range.
+
+        Args:
+            start (datetime.datetime): Start of the range, timezone-aware.
+            end (datetime.datetime): End of the range, timezone-aware.
+
+        Returns:
+            List[Dict[str, Any]]: The events, ordered by start time.
+        """
+        self.ensure_synced()
+        return [event.resource for event in self.events_between(start, end)]
+
+    def upcoming(self, now: datetime.datetime, limit: int) -> List[Dict[str, Any]]:
+        """
+        Get the next events that have not ended yet.
+
+        Args:
+            now (datetime.datetime): The current time, timezone-aware.
+            limit (int): Maximum number of events.
+
+        Returns:
+            List[Dict[str, Any]]: The events, ordered by start time.
+        """
+        self.ensure_synced()
+        return [event.resource for event in self.events_upcoming(now, limit)]
+
+    def start(self) -> None:
+        """
+        Sync in a background thread every interval.
+        """
+        self._thread = threading.Thread(target=self._run, name="calendar-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop syncing.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error("Failed to sync the calendar: %s", e)
+
+
+def _unique(events: Iterable[Event]) -> Iterable[Event]:
+    # An event the user was invited to shows up in each calendar it is on
+    seen = set()
+    for event in events:
+        key = (event.resource.get("iCalUID"), event.start)
+        if key[0] is None or key not in seen:
+            seen.add(key)
+            yield event
+
+
+class CalendarSet:
+    """
+    Local copies of several of the user's calendars, found through the calendar list
+    and synced together: each round of a sync sends the next request of every
+    calendar in one batch request, so a sync takes as many round trips as the
+    calendar with the most pages of changes, however many calendars there are.
+    Queries merge the calendars' events by start time.
+    """
+
+    def __init__(
+        self,
+        service,
+        calendars: Optional[Sequence[str]] = None,
+        interval: float = 60.0,
+        tz: Optional[datetime.tzinfo] = None,
+        discovery_interval: float = DISCOVERY_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            service: The Calendar API service.
+            calendars (Optional[Sequence[str]]): Ids or names of the calendars to mirror,
+                "primary" for the user's own; every calendar in the calendar list that
+                is not hidden by default.
+            interval (float): Seconds between background syncs.
+            tz (Optional[datetime.tzinfo]): Timezone of all-day events; the system timezone by default.
+            discovery_interval (float): Seconds between readings of the calendar list.
+            clock (Callable[[], float]): Monotonic time source.
+        """
+        self.service = service
+        self.calendars = calendars
+        self.interval = interval
+        self.tz = tz or datetime.datetime.now().astimezone().tzinfo
+        self.discovery_interval = discovery_interval
+        self.clock = clock
+
+        # The lock guards the stores; the sync lock lets one sync or fetch use the service at a time
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.stores: Dict[str, EventStore] = {}
+        self.discovered_at: Optional[float] = None
+        self.synced = False
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def discover(self) -> List[str]:
+        """
+        Read the user's calendar list.
+
+        Returns:
+            List[str]: The ids of the calendars to mirror.
+        """
+        entries: List[Dict[str, Any]] = []
+        page_token = None
+        while True:
+            response = execute(self.service.calendarList().list(pageToken=page_token))
+            entries.extend(response.get("items", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+        if self.calendars is None:
+            return [entry["id"] for entry in entries if not entry.get("hidden")]
+
+        wanted = {calendar.lower() for calendar in self.calendars}
+        found = []
+        for entry in entries:
+            names = {entry["id"].lower(), entry.get("summary", "").lower()}
+            if entry.get("primary"):
+                names.add("primary")
+            if names & wanted:
+                found.append(entry["id"])
+                wanted -= names
+        if wanted:
+            logger.warning("Calendars not in the calendar list: %s", ", ".join(sorted(wanted)))
+        return found
+
+    def sync(self) -> None:
+        """
+        Fetch the changes of every calendar since the last sync, re-reading the calendar
+        list first when it is due. A calendar that cannot be read is logged and skipped.
+        """
+        with self.sync_lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        if self.discovered_at is None or self.clock() - self.discovered_at >= self.discovery_interval:
+            calendar_ids = self.discover()
+            with self.lock:
+                self.stores = {
+                    calendar_id: self.stores.get(calendar_id) or EventStore(self.service, calendar_id, tz=self.tz)
+                    for calendar_id in calendar_ids
+                }
+            self.discovered_at = self.clock()
+
+        self._drive_batched({calendar_id: store.sync_steps() for calendar_id, store in self.stores.items()}, "sync")
+        self.synced = True
+        logger.info("Synced %d calendars", len(self.stores))
+
+    def _drive_batched(self, steps: Dict[str, Generator[Any, Any, T]], action: str) -> Dict[str, T]:
+        """
+        Run the requests of several calendars' generators, one batch request per round.
+
+        Args:
+            steps (Dict[str, Generator[Any, Any, T]]): The generators keyed by calendar id.
+            action (str): What they do, for the log of a calendar that failed.
+
+        Returns:
+            Dict[str, T]: What each generator returned; calendars that failed are left out.
+        """
+        results: Dict[str, T] = {}
+        outcomes: Dict[str, Any] = dict.fromkeys(steps)
+        steps = dict(steps)
+        while steps:
+            requests: Dict[str, Any] = {}
+            for calendar_id, step in list(steps.items()):
+                outcome = outcomes[calendar_id]
+                try:
+                    requests[calendar_id] = step.throw(outcome) if isinstance(outcome, HttpError) else step.send(outcome)
+                except StopIteration as stop:
+                    results[calendar_id] = stop.value
+                    del steps[calendar_id]
+                except HttpError as e:
+                    logger.error("Could not %s calendar %s: %s", action, calendar_id, e)
+                    del steps[calendar_id]
+            if requests:
+                outcomes = dict(zip(requests, execute_batch(self.service, list(requests.values()))))
+        return results
+
+    def ensure_synced(self) -> None:
+        """
+        Sync now if the calendars have never been synced, e.g. because the first sync failed,
+        or wait for the first sync if it is running.
+        """
+        if self.synced:
+            return
+        with self.sync_lock:
+            if not self.synced:
+                self._sync()
+
+    def between(self, start: datetime.datetime, end: datetime.datetime) -> List[Dict[str, Any]]:
+        """
+        Get the events of all calendars overlapping a time range.
+
+        Args:
+            start (datetime.datetime): Start of the range, timezone-aware.
+            end (datetime.datetime): End of the range, timezone-aware.
+
+        Returns:
+            List[Dict[str, Any]]: The events, ordered by start time.
+        """
+        self.ensure_synced()
+        with self.lock:
+            stores = list(self.stores.values())
+        merged = heapq.merge(*(store.events_between(start, end) for store in stores), key=lambda event: event.start)
+        return [event.resource for event in _unique(merged)]
+
+    def covers(self, start: datetime.datetime, end: datetime.datetime) -> bool:
+        """
+        Tell whether a time range lies in the synced window of every synced calendar,
+        so that between() has all its events.
+        """
+        self.ensure_synced()
+        with self.lock:
+            stores = [store for store in self.stores.values() if store.sync_token is not None]
+        return all(store.covers(start, end) for store in stores)
+
+    def fetch_between(self, start: datetime.datetime, end: datetime.datetime) -> List[Dict[str, Any]]:
+        """
+        Get the events of all calendars overlapping a time range straight from the API,
+        in one batch request per page, for ranges outside the synced window.
+
+        Args:
+            start (datetime.datetime): Start of the range, timezone-aware.
+            end (datetime.datetime): End of the range, timezone-aware.
+
+        Returns:
+            List[Dict[str, Any]]: The events, ordered by start time.
+        """
+        # The client must not be used by the background sync at the same time
+        with self.sync_lock:
+            with self.lock:
+                stores = dict(self.stores)
+            listed = self._drive_batched({calendar_id: store.fetch_steps(start, end) for calendar_id, store in stores.items()}, "list")
+        merged = heapq.merge(*listed.values(), key=lambda event: event.start)
+        return [event.resource for event in _unique(merged)]
+
+    def upcoming(self, now: datetime.datetime, limit: int) -> List[Dict[str, Any]]:
+        """
+        Get the next events of all calendars that have not ended yet.
+
+        Args:
+            now (datetime.datetime): The current time, timezone-aware.
+            limit (int): Maximum number of events.
+
+        Returns:
+            List[Dict[str, Any]]: The events, ordered by start time.
+        """
+        self.ensure_synced()
+        with self.lock:
+            stores = list(self.stores.values())
+        merged = heapq.merge(*(store.events_upcoming(now, limit) for store in stores), key=lambda event: event.start)
+        return [event.resource for event in itertools.islice(_unique(merged), limit)]
+
+    def start(self) -> None:
+        """
+        Sync in a background thread now and every interval.
+        """
+        self._thread = threading.Thread(target=self._run, name="calendar-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop syncing.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error("Failed to sync the calendars: %s", e)
+            if self._stop.wait(self.interval):
+                return
@@ -10,19 +10,19 @@ class TimeService:
 
     def get_time(self) -> str:
         now = datetime.datetime.now(self.local_tz)
-        logger.debug(f"Fetched current time: {now.strftime('%H:%M:%S')}")
+        logger.debug("Fetched current time: %s", now.strftime('%H:%M:%S'))
         return f"The current time is {now.strftime('%H:%M:%S')}."
 
     def get_date(self) -> str:
         today = datetime.date.today()
         day_of_week = today.strftime('%A')
-        logger.debug(f"Fetched current date: {today.strftime('%A, %d %B %Y')}")
+        logger.debug("Fetched current date: %s", today.strftime('%A, %d %B %Y'))
         return f"Today's date is {day_of_week}, {today.strftime('%A, %d %B %Y')}."
 
     def get_week_info(self) -> str:
         today = datetime.date.today()
         week_number = today.isocalendar()[1]
-        logger.debug(f"Fetched week info: {today.strftime('%A, %d %B %Y')}, week {week_number}")
+        logger.debug("Fetched week info: %s, week %s", today.strftime('%A, %d %B %Y'), week_number)
         return f"Today is {today.strftime('%A, %d %B %Y')}, week {week_number} of the year."
 
     def get_time_info(self, data: list[str]) -> str:
@@ -30,12 +30,12 @@ class TimeService:
         Returns time/date/week info based on tokens.
         Always includes the current time.
         """
-        logger.info(f"Received tokens for time info: {data}")
+        logger.info("Received tokens for time info: %s", data)
         if "week" in data:
             result = f"{self.get_week_info()} {self.get_time()}"
         elif "date" in data:
             result = f"{self.get_date()} {self.get_time()}"
         else:
             result = self.get_time()
-        logger.info(f"Returning time info result: {result}")
+        logger.info("Returning time info result: %s", result)
         return result
\ No newline at end of file
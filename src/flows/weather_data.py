@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.core.logger import Logger
+from src.core.resilience import IPINFO, OPENWEATHERMAP, DependencyError, resilience
+
+logger = Logger(__name__).get_logger()
+
+WEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
+GEOLOCATION_URL = "https://ipinfo.io/"
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent.parent / "user_data" / "weather_cache.json"
+
+# Seconds a forecast, and the city found from our IP address, count as fresh
+WEATHER_TTL = 10 * 60
+CITY_TTL = 24 * 60 * 60
+# Stale entries are still served, and refreshed in the background, up to this age
+MAX_STALE = 6 * 60 * 60
+
+
+class WeatherClient:
+    """
+    Fetches the current weather and our city over one keep-alive session and caches
+    both per key with stale-while-revalidate: a fresh entry is returned as is, a stale
+    one is returned at once while a background refresh replaces it, and only a missing
+    or expired entry waits for the network. The cache is persisted to disk so a
+    restart starts warm. Requests go through the circuit breakers of the two APIs, so
+    while one is down an expired entry is served at once instead of waiting for it.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        weather_url: str = WEATHER_URL,
+        geolocation_url: str = GEOLOCATION_URL,
+        cache_path: Optional[Path] = DEFAULT_CACHE_PATH,
+        weather_ttl: float = WEATHER_TTL,
+        city_ttl: float = CITY_TTL,
+        max_stale: float = MAX_STALE,
+        timeout: float = 5.0,
+        hedge_after: float = 1.5,
+    ):
+        """
+        Args:
+            api_key (Optional[str]): OpenWeatherMap API key.
+            weather_url (str): Current weather endpoint.
+            geolocation_url (str): IP geolocation endpoint.
+            cache_path (Optional[Path]): File the cache is persisted to, or None to keep it in memory.
+            weather_ttl (float): Seconds a forecast is fresh.
+            city_ttl (float): Seconds the resolved city is fresh.
+            max_stale (float): Seconds past which a stale entry is no longer served.
+            timeout (float): Seconds to wait for a response, over both requests.
+            hedge_after (float): Seconds after which a slow request is raced by a second one.
+        """
+        self.api_key = api_key
+        self.weather_url = weather_url
+        self.geolocation_url = geolocation_url
+        self.cache_path = cache_path
+        self.weather_ttl = weather_ttl
+        self.city_ttl = city_ttl
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.lock = threading.Lock()
+        self.refreshing: Set[str] = set()
+        # Entries are {"value": ..., "fetched_at": unix time}
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.cache_path or not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable weather cache %s: %s", self.cache_path, e)
+            return {}
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+        with self.lock:
+            data = json.dumps(self.entries)
+        temp_path = self.cache_path.with_suffix(".tmp")
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as file:
+                file.write(data)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.warning("Could not persist the weather cache: %s", e)
+
+    def _cached(self, key: str, dependency: str, ttl: float, fetch: Callable[[], Any]) -> Optional[Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+        age = time.time() - entry["fetched_at"] if entry else None
+
+        if age is not None and age < ttl:
+            return entry["value"]  # type: ignore[index]
+        if age is not None and age < ttl + self.max_stale:
+            self._refresh_in_background(key, dependency, fetch)
+            return entry["value"]  # type: ignore[index]
+
+        value = self._refresh(key, dependency, fetch)
+        if value is None and entry:
+            logger.warning("Serving expired %s after a failed refresh", key)
+            return entry["value"]
+        return value
+
+    def _refresh(self, key: str, dependency: str, fetch: Callable[[], Any]) -> Optional[Any]:
+        try:
+            value = resilience.call(dependency, fetch, self.timeout, self.hedge_after, attempts=2)
+        except DependencyError as e:
+            logger.error("Failed to fetch %s: %s", key, e)
+            return None
+        with self.lock:
+            self.entries[key] = {"value": value, "fetched_at": time.time()}
+        self._save()
+        return value
+
+    def _refresh_in_background(self, key: str, dependency: str, fetch: Callable[[], Any]) -> None:
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def run() -> None:
+            try:
+                self._refresh(key, dependency, fetch)
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        logger.debug("Refreshing stale %s in the background", key)
+        threading.Thread(target=run, name=f"refresh-{key}", daemon=True).start()
+
+    def locate(self) -> Optional[str]:
+        """
+        Get the city we are in, from our IP address.
+
+        Returns:
+            Optional[str]: The city, or None if it could not be resolved.
+        """
+
+        def fetch() -> str:
+            response = self.session.get(self.geolocation_url, timeout=self.timeout)
+            response.raise_for_status()
+            logger.debug("Response from IP info service: %s: %s", response.status_code, response.text)
+            return response.json()["city"]
+
+        return self._cached("city", IPINFO, self.city_ttl, fetch)
+
+    def current_weather(self, city: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the current weather in a city.
+
+        Args:
+            city (str): The city.
+
+        Returns:
+            Optional[Dict[str, Any]]: The OpenWeatherMap response, or None if it could not be fetched.
+        """
+
+        def fetch() -> Dict[str, Any]:
+            params = {"q": city, "appid": self.api_key, "units": "metric"}
+            response = self.session.get(self.weather_url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+
+        return self._cached(f"weather:{city.lower()}", OPENWEATHERMAP, self.weather_ttl, fetch)
+
+    def wait_for_refreshes(self, timeout: float = 5.0) -> None:
+        """
+        Wait until the background refreshes have finished, e.g. before exiting.
+
+        Args:
+            timeout (float): Seconds to wait at most.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if not self.refreshing:
+                    return
+            time.sleep(0.01)
@@ -0,0 +1,20 @@
+from src.core import logger as log_pipeline
+
+# Modules create their loggers on import; send the records to the console only,
+# so running the tests leaves no app.log in the working tree
+log_pipeline.configure(path=None)
+
+
+class RecordingSpeech:
+    """
+    Stands in for Speech, keeping what would have been said.
+    """
+
+    def __init__(self):
+        self.spoken = []
+
+    def speak_async(self, text, cache=False):
+        self.spoken.append(text)
+
+    def speak(self, text, cache=False):
+        self.spoken.append(text)
@@ -0,0 +1,101 @@
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from src.core.audio import AudioSource, AudioSourceExhausted, CaptureStream, Segmenter, StdinSource, WavFileSource, frame_energy
+
+RATE = 16000
+
+def synthesize(*parts):
+    """Build 16-bit audio from (seconds, amplitude) parts: quiet noise or a 440 Hz tone."""
+    rng = np.random.default_rng(0)
+    chunks = []
+    for seconds, amplitude in parts:
+        t = np.arange(int(seconds * RATE)) / RATE
+        chunk = rng.normal(0, 30, t.size)
+        if amplitude:
+            chunk += amplitude * np.sin(2 * np.pi * 440 * t)
+        chunks.append(chunk)
+    return np.concatenate(chunks).astype(np.int16).tobytes()
+
+AUDIO = synthesize((1.2, 0), (0.6, 5000), (1.0, 0), (0.5, 5000), (1.0, 0))
+
+def collect(stream):
+    utterances = []
+    with pytest.raises(AudioSourceExhausted):
+        while True:
+            utterances.append(stream.next_utterance(timeout=5))
+    return utterances
+
+def test_frame_energy():
+    assert frame_energy(b"") == 0.0
+    assert frame_energy(np.full(10, 100, dtype=np.int16).tobytes()) == pytest.approx(100)
+
+def test_wav_source_yields_each_utterance(tmp_path):
+    path = tmp_path / "speech.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(AUDIO)
+    utterances = collect(CaptureStream(WavFileSource(path)).start())
+    assert len(utterances) == 2
+    durations = [len(u.audio.frame_data) / 2 / RATE for u in utterances]
+    # Each includes the pre-roll and the trailing pause
+    assert 0.6 < durations[0] < 2.0
+    assert 0.5 < durations[1] < 2.0
+
+def test_stdin_source_and_calibration():
+    segmenter = Segmenter(RATE)
+    utterances = collect(CaptureStream(StdinSource(RATE, io.BytesIO(AUDIO)), segmenter).start())
+    assert len(utterances) == 2
+    # The threshold follows the background noise, not the tone
+    assert segmenter.threshold < 200
+
+def test_short_clicks_are_ignored():
+    audio = synthesize((1.0, 0), (0.05, 8000), (1.0, 0))
+    assert collect(CaptureStream(StdinSource(RATE, io.BytesIO(audio))).start()) == []
+
+def test_longer_phrases_end_after_a_quick_pause():
+    def ends_after(speech_seconds, segmenter):
+        audio = synthesize((1.0, 0), (speech_seconds, 5000), (1.0, 0))
+        frame_bytes = segmenter.frame_samples * 2
+        for i in range(0, len(audio), frame_bytes):
+            if segmenter.feed(audio[i:i + frame_bytes]):
+                return i / 2 / RATE - 1.0 - speech_seconds
+    # A short start may be a hesitation and waits for the full pause
+    assert ends_after(0.3, Segmenter(RATE)) == pytest.approx(0.8, abs=0.05)
+    assert ends_after(1.0, Segmenter(RATE)) == pytest.approx(0.4, abs=0.05)
+
+def test_partial_utterances_are_queued_while_speech_goes_on():
+    stream = CaptureStream(StdinSource(RATE, io.BytesIO(AUDIO)), partial_interval=0.3).start()
+    partials = []
+    while True:
+        utterance = stream.next_utterance(timeout=5, partials=True)
+        if utterance.final:
+            break
+        partials.append(len(utterance.audio.frame_data))
+    assert len(partials) >= 2
+    assert partials == sorted(partials)
+    assert len(utterance.audio.frame_data) > partials[-1]
+    # Without partials only the complete utterances are returned
+    assert stream.next_utterance(timeout=5).final
+
+class LiveStdinSource(StdinSource):
+    live = True
+
+def test_live_source_drops_the_oldest_unheard_utterance():
+    stream = CaptureStream(LiveStdinSource(RATE, io.BytesIO(AUDIO)), max_queued=2).start()
+    stream._thread.join()
+    # The end of the stream took the place of the first utterance
+    assert len(collect(stream)) == 1
+
+def test_other_sources_wait_for_the_listener_instead():
+    stream = CaptureStream(StdinSource(RATE, io.BytesIO(AUDIO)), max_queued=1).start()
+    assert len(collect(stream)) == 2
+
+def test_audio_source_must_implement_read():
+    with pytest.raises(TypeError):
+        AudioSource()
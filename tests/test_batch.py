@@ -0,0 +1,92 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+
+from src.core.batch import BatchRunner, TranscriptInput, load_sessions, read_transcript_sessions, stub_services
+from src.core.constants import CALENDAR
+from src.data import commands
+
+TRANSCRIPT = """# morning session
+hey assistant
+what's the weather like
+assistant
+i have a question
+what is the capital of france
+
+hello assistant
+sing me a song
+not a wake word
+"""
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    (tmp_path / "input.csv").write_text("music,sing me a song,I cannot sing Sir!\n")
+    (tmp_path / "q_and_a.csv").write_text("what is the capital of france,Paris\n")
+    monkeypatch.setattr(commands, "INPUT_PATH", tmp_path / "input.csv")
+    monkeypatch.setattr(commands, "Q_AND_A_PATH", tmp_path / "q_and_a.csv")
+    commands.init_replies()
+
+def test_transcript_sessions_split_at_blank_lines():
+    sessions = read_transcript_sessions(io.StringIO(TRANSCRIPT))
+    assert len(sessions) == 2
+    assert sessions[0][0] == "hey assistant"
+    assert sessions[1] == ["hello assistant", "sing me a song", "not a wake word"]
+
+def test_batch_runs_each_turn_and_reports(corpus, tmp_path):
+    path = tmp_path / "transcript.txt"
+    path.write_text(TRANSCRIPT)
+    sink = io.StringIO()
+    report = BatchRunner(stub_services(), workers=2, sink=sink).run(load_sessions(str(path)))
+
+    assert report.turns == 3
+    assert report.turns_per_second > 0
+    assert set(report.latency_ms) == {"p50", "p95", "p99"}
+
+    turns = {tuple(turn["heard"][:2]): turn for turn in map(json.loads, sink.getvalue().splitlines())}
+    assert len(turns) == 3
+    weather = turns[("hey assistant", "what's the weather like")]
+    assert weather["session"] == "transcript.txt#1"
+    assert "Clear sky" in weather["spoken"][-1]
+    assert turns[("assistant", "i have a question")]["spoken"][-1] == "Paris"
+    # The line after the reply is not a wake word, so it starts no turn
+    assert turns[("hello assistant", "sing me a song")]["spoken"] == ["Yes, Sir?", "I cannot sing Sir!"]
+
+def test_batch_sessions_share_services(corpus):
+    services = stub_services()
+    sessions = {f"s{i}": (lambda: TranscriptInput(["assistant", "weather"])) for i in range(8)}
+    runner = BatchRunner(services, workers=4)
+    report = runner.run(sessions)
+    assert report.turns == 8
+    assert {turn.session for turn in runner.turns} == set(sessions)
+
+def test_command_said_with_the_wake_word_is_not_prompted_for(corpus):
+    runner = BatchRunner(stub_services(), workers=1)
+    runner.run({"one breath": lambda: TranscriptInput(["hey assistant, sing me a song", "assistant", "sing me a song"])})
+    assert [turn.spoken for turn in runner.turns] == [["I cannot sing Sir!"], ["Yes, Sir?", "I cannot sing Sir!"]]
+
+def test_calendar_commands_of_parallel_sessions_run_one_at_a_time(corpus):
+    class Calendar:
+        def __init__(self):
+            self.running = 0
+            self.most = 0
+            self.lock = threading.Lock()
+
+        def get_calendar_events(self, data):
+            with self.lock:
+                self.running += 1
+                self.most = max(self.most, self.running)
+            time.sleep(0.01)
+            with self.lock:
+                self.running -= 1
+            return "No events"
+
+    services = stub_services()
+    calendar = Calendar()
+    services[CALENDAR].instance = calendar
+    sessions = {f"s{i}": (lambda: TranscriptInput(["assistant", "calendar"])) for i in range(8)}
+    report = BatchRunner(services, workers=4).run(sessions)
+    assert report.turns == 8
+    assert calendar.most == 1
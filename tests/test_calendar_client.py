@@ -0,0 +1,55 @@
+import datetime
+import json
+import time
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.http import HttpRequest
+
+from src.flows.calendar_client import CredentialRefresher, build_calendar_service
+
+
+def test_service_is_built_without_fetching_the_discovery_document(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("the bundled discovery document should be used")
+
+    monkeypatch.setattr(HttpRequest, "execute", fail)
+    service = build_calendar_service(Credentials(token="token"))
+    assert hasattr(service, "events")
+    assert service._baseUrl.startswith("https://www.googleapis.com/calendar/v3")
+
+
+class FakeCredentials:
+    def __init__(self, expires_in):
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(seconds=expires_in)
+        self.refresh_token = "refresh"
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+    def to_json(self):
+        return json.dumps({"refreshes": self.refreshes})
+
+
+def test_token_is_refreshed_before_it_expires(tmp_path):
+    creds = FakeCredentials(expires_in=0.2)
+    token_path = tmp_path / "token.json"
+    refresher = CredentialRefresher(creds, token_path, margin=datetime.timedelta(seconds=0.1))
+    refresher.start()
+    deadline = time.monotonic() + 2
+    while not creds.refreshes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    refresher.stop()
+    assert creds.refreshes == 1
+    assert json.loads(token_path.read_text()) == {"refreshes": 1}
+    assert creds.expiry > datetime.datetime.utcnow()
+
+
+def test_valid_token_is_left_alone():
+    creds = FakeCredentials(expires_in=3600)
+    refresher = CredentialRefresher(creds, None)
+    assert refresher.seconds_until_refresh() > 3000
+    refresher.start()
+    refresher.stop()
+    assert creds.refreshes == 0
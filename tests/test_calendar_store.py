@@ -0,0 +1,364 @@
+import datetime
+import threading
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from src.flows.calendar_flow import CalendarService
+from src.flows.calendar_store import CalendarSet, EventStore
+
+TZ = datetime.timezone(datetime.timedelta(hours=3))
+TODAY = datetime.date.today()
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+def in_range(item, time_min, time_max):
+    start = datetime.datetime.fromisoformat(item["start"]["dateTime"])
+    end = datetime.datetime.fromisoformat(item["end"]["dateTime"])
+    return (not time_min or end > datetime.datetime.fromisoformat(time_min)) and (
+        not time_max or start < datetime.datetime.fromisoformat(time_max)
+    )
+
+
+class FakeCalendar:
+    """
+    Stand-in for the Calendar API service: events().list with paging and sync tokens.
+    """
+
+    def __init__(self, page_size=2):
+        self.page_size = page_size
+        self.items = {}
+        # Version at which each event last changed; sync tokens are versions
+        self.changed = {}
+        self.version = 0
+        self.calls = []
+        self.expired_tokens = set()
+        self.error = None
+
+    def put(self, event_id, start, end, summary, status="confirmed", uid=None):
+        self.version += 1
+        self.items[event_id] = {
+            "id": event_id,
+            "iCalUID": uid or f"{event_id}@{id(self)}",
+            "status": status,
+            "summary": summary,
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": end.isoformat()},
+        }
+        self.changed[event_id] = self.version
+
+    def cancel(self, event_id):
+        self.version += 1
+        self.items[event_id] = {"id": event_id, "status": "cancelled"}
+        self.changed[event_id] = self.version
+
+    def events(self):
+        return self
+
+    def list(self, calendarId, singleEvents, pageToken=None, syncToken=None, timeMin=None, timeMax=None):
+        self.calls.append({"syncToken": syncToken, "pageToken": pageToken, "timeMin": timeMin, "timeMax": timeMax})
+        if self.error:
+            return FakeRequest(self.error)
+        if syncToken in self.expired_tokens:
+            return FakeRequest(HttpError(httplib2.Response({"status": 410}), b"Sync token is no longer valid"))
+        since = int(syncToken) if syncToken else 0
+        items = [
+            item for event_id, item in sorted(self.items.items())
+            if self.changed[event_id] > since and (syncToken or item["status"] != "cancelled")
+            and (syncToken or in_range(item, timeMin, timeMax))
+        ]
+        offset = int(pageToken or 0)
+        page = items[offset:offset + self.page_size]
+        response = {"items": page}
+        if offset + self.page_size < len(items):
+            response["nextPageToken"] = str(offset + self.page_size)
+        else:
+            response["nextSyncToken"] = str(self.version)
+        return FakeRequest(response)
+
+
+class RoundTrip:
+    """
+    A request sent on its own, costing one round trip to the account.
+    """
+
+    def __init__(self, account, request):
+        self.account = account
+        self.request = request
+
+    def execute(self):
+        self.account.round_trip()
+        return self.request.execute()
+
+
+class FakeBatch:
+    def __init__(self, account, callback):
+        self.account = account
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request.request))
+
+    def execute(self):
+        self.account.round_trip()
+        for request_id, request in self.requests:
+            try:
+                self.callback(request_id, request.execute(), None)
+            except HttpError as e:
+                self.callback(request_id, None, e)
+
+
+class FakeAccount:
+    """
+    Stand-in for the Calendar API service of a user with several calendars: the
+    calendar list, events().list of each calendar, and batch requests. Every HTTP
+    request, batched or not, counts as one round trip.
+    """
+
+    def __init__(self):
+        self.calendars = {}
+        self.entries = []
+        self.round_trips = 0
+
+    def add(self, calendar_id, summary, primary=False, hidden=False):
+        self.calendars[calendar_id] = FakeCalendar()
+        self.entries.append({"id": calendar_id, "summary": summary, "primary": primary, "hidden": hidden})
+        return self.calendars[calendar_id]
+
+    def round_trip(self):
+        self.round_trips += 1
+
+    def calendarList(self):
+        account = self
+
+        class CalendarList:
+            def list(self, pageToken=None):
+                return RoundTrip(account, FakeRequest({"items": account.entries}))
+
+        return CalendarList()
+
+    def events(self):
+        return self
+
+    def list(self, calendarId, **params):
+        return RoundTrip(self, self.calendars[calendarId].list(calendarId, **params))
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+def at(days, hour):
+    return datetime.datetime.combine(TODAY + datetime.timedelta(days=days), datetime.time(hour), tzinfo=TZ)
+
+
+@pytest.fixture
+def calendar():
+    calendar = FakeCalendar()
+    calendar.put("standup", at(0, 9), at(0, 10), "Standup")
+    calendar.put("lunch", at(0, 12), at(0, 13), "Lunch")
+    calendar.put("trip", at(0, 20), at(2, 8), "Trip")
+    calendar.put("dentist", at(1, 15), at(1, 16), "Dentist")
+    return calendar
+
+
+def summaries(events):
+    return [event["summary"] for event in events]
+
+
+def test_full_sync_reads_every_page(calendar):
+    store = EventStore(calendar, tz=TZ)
+    store.sync()
+    assert len(store.events) == 4
+    assert len(calendar.calls) == 2
+    assert store.sync_token == str(calendar.version)
+
+
+def test_queries_are_answered_locally(calendar):
+    store = EventStore(calendar, tz=TZ)
+    store.sync()
+    calls = len(calendar.calls)
+    assert summaries(store.between(at(0, 0), at(1, 0))) == ["Standup", "Lunch", "Trip"]
+    # The trip started yesterday from tomorrow's point of view
+    assert summaries(store.between(at(1, 0), at(2, 0))) == ["Trip", "Dentist"]
+    assert summaries(store.upcoming(at(0, 11), 2)) == ["Lunch", "Trip"]
+    assert len(calendar.calls) == calls
+
+
+def test_incremental_sync_applies_changes(calendar):
+    store = EventStore(calendar, tz=TZ)
+    store.sync()
+    calendar.cancel("lunch")
+    calendar.put("standup", at(0, 10), at(0, 11), "Late standup")
+    calendar.put("review", at(0, 14), at(0, 15), "Review")
+    store.sync()
+    assert calendar.calls[-1]["syncToken"] == "4"
+    assert summaries(store.between(at(0, 0), at(0, 18))) == ["Late standup", "Review"]
+
+
+def test_expired_sync_token_triggers_a_full_sync(calendar):
+    store = EventStore(calendar, tz=TZ)
+    store.sync()
+    calendar.expired_tokens.add(store.sync_token)
+    calendar.cancel("dentist")
+    store.sync()
+    assert calendar.calls[-1]["syncToken"] is None
+    assert "dentist" not in store.events
+    assert len(store.events) == 3
+
+
+def account_with(calendars, events_each):
+    account = FakeAccount()
+    for number in range(calendars):
+        calendar = account.add(f"calendar{number}@example.com", f"Calendar {number}", primary=number == 0)
+        for hour in range(events_each):
+            calendar.put(f"event{hour}", at(0, hour), at(0, hour + 1), f"Event {number}.{hour}")
+    return account
+
+
+def test_calendars_sync_in_one_round_trip_per_page_however_many_there_are():
+    for calendars in (1, 20, 50):
+        account = account_with(calendars, events_each=3)
+        store = CalendarSet(account, tz=TZ)
+        store.sync()
+        # The calendar list, then two pages of events
+        assert account.round_trips == 3
+        assert len(store.between(at(0, 0), at(1, 0))) == 3 * calendars
+
+        account.calendars["calendar0@example.com"].put("late", at(0, 22), at(0, 23), "Late")
+        store.sync()
+        assert account.round_trips == 4
+
+
+def test_more_calendars_than_a_batch_takes_are_split():
+    account = account_with(120, events_each=1)
+    CalendarSet(account, tz=TZ).sync()
+    assert account.round_trips == 1 + 3
+
+
+def test_sync_of_many_calendars_costs_the_round_trips_of_one():
+    def sync_round_trips(calendars):
+        account = account_with(calendars, events_each=1)
+        CalendarSet(account, tz=TZ).sync()
+        return account.round_trips
+
+    # The calendar list, then one batch with a page of every calendar
+    assert sync_round_trips(1) == sync_round_trips(30) == 2
+
+
+def test_background_sync_starts_with_a_sync():
+    account = account_with(2, events_each=1)
+    store = CalendarSet(account, interval=3600, tz=TZ)
+    store.start()
+    store.stop()
+    assert store.synced
+    assert account.round_trips == 2
+
+
+def test_fetch_waits_for_a_running_sync():
+    account = account_with(2, events_each=1)
+    store = CalendarSet(account, tz=TZ)
+    store.sync()
+    round_trips = account.round_trips
+    fetched = []
+    with store.sync_lock:
+        fetch = threading.Thread(target=lambda: fetched.extend(store.fetch_between(at(0, 0), at(1, 0))))
+        fetch.start()
+        fetch.join(0.1)
+        # The client is not shared with the sync holding the lock
+        assert fetch.is_alive() and account.round_trips == round_trips
+    fetch.join()
+    assert account.round_trips == round_trips + 1
+    assert len(fetched) == 2
+
+
+def test_events_of_all_calendars_are_merged_by_start_time():
+    account = FakeAccount()
+    work = account.add("me@example.com", "Work", primary=True)
+    family = account.add("family@example.com", "Family")
+    holidays = account.add("holidays@example.com", "Holidays", hidden=True)
+    work.put("standup", at(0, 9), at(0, 10), "Standup")
+    work.put("dinner", at(0, 19), at(0, 21), "Dinner", uid="dinner@example.com")
+    family.put("school", at(0, 8), at(0, 9), "School run")
+    family.put("dinner", at(0, 19), at(0, 21), "Dinner", uid="dinner@example.com")
+    family.put("dentist", at(1, 15), at(1, 16), "Dentist")
+    holidays.put("holiday", at(0, 0), at(1, 0), "Holiday")
+
+    store = CalendarSet(account, tz=TZ)
+    assert summaries(store.between(at(0, 0), at(1, 0))) == ["School run", "Standup", "Dinner"]
+    assert summaries(store.upcoming(at(0, 9), 3)) == ["Standup", "Dinner", "Dentist"]
+
+    only_family = CalendarSet(account, ["Family", "holidays@example.com"], tz=TZ)
+    assert summaries(only_family.between(at(0, 0), at(1, 0))) == ["Holiday", "School run", "Dinner"]
+
+
+def test_unreadable_calendar_is_skipped_and_expired_tokens_resync():
+    account = account_with(2, events_each=2)
+    shared = account.add("team@example.com", "Team")
+    shared.error = HttpError(httplib2.Response({"status": 403}), b"Forbidden")
+    store = CalendarSet(account, tz=TZ)
+    store.sync()
+    assert len(store.between(at(0, 0), at(1, 0))) == 4
+
+    first = account.calendars["calendar0@example.com"]
+    first.expired_tokens.add(store.stores["calendar0@example.com"].sync_token)
+    first.cancel("event0")
+    store.sync()
+    assert first.calls[-1]["syncToken"] is None
+    assert summaries(store.between(at(0, 0), at(1, 0))) == ["Event 1.0", "Event 0.1", "Event 1.1"]
+
+
+def test_calendar_with_a_server_error_is_skipped_until_the_next_sync():
+    account = account_with(3, events_each=1)
+    failing = account.calendars["calendar1@example.com"]
+    failing.error = HttpError(httplib2.Response({"status": 503}), b"Backend Error")
+    store = CalendarSet(account, tz=TZ)
+    store.sync()
+    assert summaries(store.between(at(0, 0), at(1, 0))) == ["Event 0.0", "Event 2.0"]
+    assert store.stores["calendar1@example.com"].sync_token is None
+
+    failing.error = None
+    store.sync()
+    assert summaries(store.between(at(0, 0), at(1, 0))) == ["Event 0.0", "Event 1.0", "Event 2.0"]
+
+
+def test_calendar_service_answers_from_the_store(monkeypatch):
+    monkeypatch.setattr(CalendarSet, "start", lambda self: None)
+    account = FakeAccount()
+    calendar = account.add("me@example.com", "Me", primary=True)
+    now = datetime.datetime.now().astimezone()
+    calendar.put("planning", now + datetime.timedelta(minutes=1), now + datetime.timedelta(minutes=30), "Planning")
+    service = CalendarService(account, calendars=["primary"])
+    # The first sync is left to the background thread, or to the first query
+    assert not calendar.calls
+    assert "Planning" in service.get_calendar_events(["what", "is", "next"])
+    calls = len(calendar.calls)
+    assert service.get_events_for_date(TODAY + datetime.timedelta(days=300)).startswith("No events found")
+    assert len(calendar.calls) == calls
+
+    # Dates outside the synced window are asked of the API
+    long_ago = now - datetime.timedelta(days=30)
+    calendar.put("review", long_ago, long_ago + datetime.timedelta(hours=1), "Old review")
+    assert "Old review" in service.get_events_for_date(long_ago.date())
+    assert calendar.calls[-1]["timeMax"] is not None
+    assert "review" not in service.store.stores["me@example.com"].events
+
+
+def test_full_sync_is_bounded_by_the_window(calendar):
+    calendar.put("far", at(400, 9), at(400, 10), "Far off")
+    store = EventStore(calendar, tz=TZ)
+    store.sync()
+    assert calendar.calls[0]["timeMax"] is not None
+    assert "far" not in store.events
+    assert store.covers(at(0, 0), at(1, 0))
+    assert not store.covers(at(-3, 0), at(-2, 0)) and not store.covers(at(400, 0), at(401, 0))
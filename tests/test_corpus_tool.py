@@ -0,0 +1,74 @@
+import csv
+import random
+
+from src.data import commands as corpus
+from src.data.corpus_tool import CorpusReport, build_corpus, external_sort, read_rows, unique_in_order
+from src.data.snapshot import is_fresh, read_toc
+from src.data.utils import sort_by_categories
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        csv.writer(file).writerows(rows)
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as file:
+        return list(csv.reader(file))
+
+def test_invalid_rows_are_reported_and_skipped(tmp_path):
+    path = tmp_path / "input.csv"
+    path.write_bytes(
+        b"category,command,reply\n"
+        b"greeting,hello,Hi\n"
+        b"greeting,bad \xff byte,Hi\n"
+        b"greeting,two columns\n"
+        b",no category,Hi\n"
+        b'time,"multi\nline",Now\n'
+    )
+    report = CorpusReport("input.csv")
+    rows = list(read_rows(path, ["category", "command", "reply"], report))
+    assert rows == [["greeting", "hello", "Hi"], ["time", "multi\nline", "Now"]]
+    assert (report.rows_read, report.invalid) == (4, 3)
+    assert report.samples[0].startswith("input.csv:3: not valid UTF-8")
+    assert report.samples[1] == "input.csv:4: expected 3 columns, got 2"
+
+def test_external_sort_spills_and_merges_runs(tmp_path):
+    rng = random.Random(3)
+    rows = [[f"category {rng.randrange(20)}", f"command {rng.randrange(500)}", "reply"] for _ in range(3000)]
+    # Room for a few rows per run, so hundreds of runs are merged
+    assert list(external_sort(iter(rows), str(tmp_path), memory_bytes=3000)) == sorted(rows)
+    assert list(tmp_path.iterdir()) == []
+
+def test_duplicates_are_removed_in_order_across_partitions(tmp_path):
+    rng = random.Random(5)
+    rows = [[f"question {rng.randrange(300)}", "answer"] for _ in range(2000)]
+    report = CorpusReport("q_and_a.csv")
+    unique = list(unique_in_order(iter(rows), str(tmp_path), memory_bytes=4000, report=report, size_hint=40_000))
+    expected = [list(row) for row in dict.fromkeys(tuple(row) for row in rows)]
+    assert unique == expected
+    assert report.duplicates == len(rows) - len(expected)
+
+def test_build_corpus_writes_clean_files_and_a_fresh_snapshot(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    source.mkdir()
+    write_csv(source / "input.csv", [["time", "what time is it", "Now"], ["greeting", "hello", "Hi"], ["greeting", "hello", "Hi"]])
+    write_csv(source / "q_and_a.csv", [["who", "me"], ["why", "because"], ["who", "me"], ["who", "you"]])
+    out = tmp_path / "out"
+    build_corpus(source / "input.csv", source / "q_and_a.csv", out)
+
+    assert read_csv(out / "input.csv") == [["greeting", "hello", "Hi"], ["time", "what time is it", "Now"]]
+    # Later answers still win, so order is kept
+    assert read_csv(out / "q_and_a.csv") == [["who", "me"], ["why", "because"], ["who", "you"]]
+    assert is_fresh(read_toc(out / "corpus.snap")["meta"], [out / "input.csv", out / "q_and_a.csv"])
+
+    monkeypatch.setattr(corpus, "INPUT_PATH", out / "input.csv")
+    monkeypatch.setattr(corpus, "Q_AND_A_PATH", out / "q_and_a.csv")
+    monkeypatch.setattr(corpus, "SNAPSHOT_PATH", out / "corpus.snap")
+    corpus.init_replies(use_snapshot=True)
+    assert corpus.q_and_a["who"] == "you"
+    assert list(corpus.replies["greeting"]) == ["Hi"]
+
+def test_sort_by_categories_keeps_a_header(tmp_path):
+    source, destination = tmp_path / "unsorted.csv", tmp_path / "input.csv"
+    write_csv(source, [["category", "command", "reply"], ["b", "x", "1"], ["a", "y", "2"], ["b", "x", "1"]])
+    sort_by_categories(str(source), str(destination))
+    assert read_csv(destination) == [["category", "command", "reply"], ["a", "y", "2"], ["b", "x", "1"]]
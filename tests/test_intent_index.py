@@ -0,0 +1,18 @@
+from src.data.intent_index import IntentIndex, KeywordMatcher, normalize
+
+def test_keyword_matcher_finds_overlapping_keywords():
+    matcher = KeywordMatcher(["he", "she", "his", "hers"])
+    assert matcher.find_all("ushers") == ["he", "she", "hers"]
+    assert matcher.first("ushers") == "he"
+    assert matcher.first("nothing here") == "he"
+    assert matcher.first("xyz") is None
+
+def test_match_phrase_uses_first_category():
+    index = IntentIndex()
+    index.build({"greeting": ["Hello There", "hi"], "other": ["hi"]})
+    assert index.match_phrase("hello  there") == "greeting"
+    assert index.match_phrase("hi") == "greeting"
+    assert index.match_phrase("bye") is None
+
+def test_normalize_collapses_whitespace():
+    assert normalize("  Hey   YOU ") == "hey you"
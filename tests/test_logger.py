@@ -1,7 +1,43 @@
+import json
+
+from src.core import logger as log_pipeline
 from src.core.logger import Logger
 
 def test_logger_get_logger():
     logger = Logger("test").get_logger()
     assert logger.name == "test"
     logger.info("Logger test info")
-    logger.debug("Logger test debug")
\ No newline at end of file
+    logger.debug("Logger test debug")
+
+def test_records_are_written_by_one_pipeline(tmp_path):
+    log_path, json_path = tmp_path / "app.log", tmp_path / "app.jsonl"
+    log_pipeline.configure(str(log_path), str(json_path))
+    try:
+        first = Logger("test.first").get_logger()
+        second = Logger("test.second").get_logger()
+        assert first.handlers == second.handlers
+        payload = {"city": "Cluj-Napoca"}
+        first.debug("Fetching weather for %s", payload)
+        # The message is taken when logging, not when the record is written
+        payload["city"] = "Lisbon"
+        second.warning("Weather result: %s", "sunny")
+    finally:
+        # Later records go to a file of this test, not the working tree
+        log_pipeline.configure(str(tmp_path / "rest.log"))
+
+    lines = log_path.read_text(encoding="utf-8").splitlines()
+    assert "DEBUG - test.first - Fetching weather for {'city': 'Cluj-Napoca'}" in lines[0]
+    assert "WARNING - test.second - Weather result: sunny" in lines[1]
+    entries = [json.loads(line) for line in json_path.read_text(encoding="utf-8").splitlines()]
+    assert [entry["level"] for entry in entries] == ["DEBUG", "WARNING"]
+    assert entries[1]["message"] == "Weather result: sunny"
+
+def test_log_file_is_rotated(tmp_path):
+    log_pipeline.configure(str(tmp_path / "app.log"), max_bytes=500, backup_count=2)
+    try:
+        logger = Logger("test.rotation").get_logger()
+        for i in range(50):
+            logger.debug("Record number %d", i)
+    finally:
+        log_pipeline.configure(str(tmp_path / "rest.log"))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["app.log", "app.log.1", "app.log.2", "rest.log"]
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+import speech_recognition as sr
+
+from src.core.preprocess import Preprocessor
+
+def tone(rate, seconds, frequency, amplitude=5000):
+    t = np.arange(int(rate * seconds)) / rate
+    return amplitude * np.sin(2 * np.pi * frequency * t)
+
+def utterance(rate, silence=0.5, speech=1.0):
+    rng = np.random.default_rng(0)
+    quiet = lambda: rng.normal(0, 30, int(rate * silence))
+    samples = np.concatenate([quiet(), tone(rate, speech, 300), quiet()])
+    return sr.AudioData(samples.astype(np.int16).tobytes(), rate, 2)
+
+def rms(samples):
+    return float(np.sqrt(np.mean(samples.astype(np.float64) ** 2)))
+
+def test_silence_is_trimmed_around_speech():
+    audio, stats = Preprocessor().process(utterance(16000))
+    assert audio.sample_rate == 16000
+    # The speech plus the hangover and margin on each side
+    assert 1000 <= stats.ms_out <= 1350
+    assert stats.ms_in == pytest.approx(2000)
+    assert stats.saved_bytes == stats.bytes_in - len(audio.frame_data)
+
+@pytest.mark.parametrize("rate", [48000, 44100])
+def test_downsampling_keeps_speech_band_and_removes_aliases(rate):
+    preprocessor = Preprocessor(target_rate=16000)
+    speech, _ = preprocessor.resample(tone(rate, 0.5, 1000).astype(np.int16), rate)
+    alias, _ = preprocessor.resample(tone(rate, 0.5, 12000).astype(np.int16), rate)
+    assert speech.size == pytest.approx(8000, abs=1)
+    assert rms(speech) == pytest.approx(5000 / np.sqrt(2), rel=0.05)
+    # 12 kHz would fold back to 4 kHz without the low-pass filter
+    assert rms(alias) < 100
+
+def test_downsampled_utterance_is_smaller():
+    audio, stats = Preprocessor().process(utterance(48000))
+    assert audio.sample_rate == 16000
+    assert stats.bytes_out < stats.bytes_in / 4
+
+def test_audio_without_speech_is_left_alone():
+    quiet = sr.AudioData(np.zeros(16000, dtype=np.int16).tobytes(), 16000, 2)
+    audio, stats = Preprocessor().process(quiet)
+    assert audio.frame_data == quiet.frame_data
+    assert stats.saved_bytes == 0
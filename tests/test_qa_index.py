@@ -0,0 +1,31 @@
+from src.data.qa_index import QAIndex, tokenize
+
+QA = {
+    "what is the capital of france": "Paris",
+    "who invented the telephone": "Alexander Graham Bell",
+    "what is the capital of romania": "Bucharest",
+}
+
+def test_tokenize_lowercases_words():
+    assert tokenize("Who's there? 42!") == ["who's", "there", "42"]
+
+def test_search_ranks_best_match_first():
+    index = QAIndex()
+    index.build(QA)
+    results = index.search("capital of France", k=2)
+    assert results[0][1] == "Paris"
+    assert results[0][2] > results[1][2]
+
+def test_best_answer_handles_paraphrase():
+    index = QAIndex()
+    index.build(QA)
+    assert index.best_answer("the telephone, who invented it") == "Alexander Graham Bell"
+
+def test_best_answer_respects_threshold():
+    index = QAIndex()
+    index.build(QA)
+    assert index.best_answer("how tall is mount everest") is None
+    assert index.best_answer("") is None
+
+def test_empty_index_returns_nothing():
+    assert QAIndex().search("anything") == []
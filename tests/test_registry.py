@@ -0,0 +1,139 @@
+import sys
+import threading
+
+import pytest
+from conftest import RecordingSpeech
+
+from src.core.recognizer import Recognizer
+from src.core.registry import Flow, FlowRegistry
+from src.core.selection import ResponseSelector
+from src.core.warmup import UsageHistory
+from src.flows.builtin import BUILTIN_FLOWS
+
+@pytest.fixture
+def plugin(tmp_path, monkeypatch):
+    """An installed package declaring a flow whose service lives in a separate module."""
+    package = tmp_path / "reminder_plugin"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "flow.py").write_text(
+        "from src.core.registry import Flow\n"
+        "flow = Flow('reminder', ['remind me'], priority=5, factory='reminder_plugin.service:ReminderService',"
+        " acknowledgement='Noted, Sir!')\n"
+    )
+    (package / "service.py").write_text(
+        "class ReminderService:\n"
+        "    def handle(self, command):\n"
+        "        return 'I will ' + command.split('remind me ', 1)[1]\n"
+    )
+    dist_info = tmp_path / "reminder_plugin-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text("Metadata-Version: 2.1\nName: reminder-plugin\nVersion: 1.0\n")
+    (dist_info / "entry_points.txt").write_text("[jarvis_assistant.flows]\nreminder = reminder_plugin.flow:flow\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield
+    for name in [name for name in sys.modules if name.startswith("reminder_plugin")]:
+        del sys.modules[name]
+
+def test_priority_decides_between_flows():
+    registry = FlowRegistry([Flow("low", ["weather", "forecast"], priority=50), Flow("high", ["weather"], priority=10)])
+    assert registry.match("what's the weather").name == "high"
+    assert registry.match("the forecast please").name == "low"
+    assert registry.match("check the forecast and the weather").name == "high"
+    assert registry.match("hello") is None
+
+def test_builtin_flows_keep_their_dispatch_and_warm_up_order():
+    registry = FlowRegistry(BUILTIN_FLOWS)
+    assert registry.match("what's the weather and the time").name == "time"
+    assert registry.match("check my calendar for the weather").name == "calendar"
+    assert registry.match("tell me a fun fact").name == "fun fact"
+    assert list(registry.create_services()) == ["time", "weather", "calendar"]
+
+def test_entry_point_flow_is_imported_when_it_first_fires(plugin):
+    registry = FlowRegistry(BUILTIN_FLOWS)
+    assert registry.load_entry_points() == 1
+    assert "reminder_plugin.service" not in sys.modules
+
+    speech = RecordingSpeech()
+    recognizer = Recognizer(speech=speech, registry=registry, usage=UsageHistory(None), selector=ResponseSelector(None))  # type: ignore[arg-type]
+    assert "reminder_plugin.service" not in sys.modules
+    recognizer.process_command("remind me to buy milk")
+    assert "reminder_plugin.service" in sys.modules
+    assert speech.spoken == ["Noted, Sir!", "I will to buy milk"]
+    assert recognizer.usage.counts == {"reminder": 1}
+
+def test_broken_entry_point_is_skipped(plugin, tmp_path):
+    (tmp_path / "reminder_plugin" / "flow.py").write_text("raise ImportError('missing dependency')\n")
+    registry = FlowRegistry(BUILTIN_FLOWS)
+    assert registry.load_entry_points() == 0
+    assert registry.match("remind me to call") is None
+
+def test_entry_point_that_is_not_a_flow_is_skipped(plugin, tmp_path):
+    (tmp_path / "reminder_plugin" / "flow.py").write_text("flow = 'remind me'\n")
+    registry = FlowRegistry(BUILTIN_FLOWS)
+    assert registry.load_entry_points() == 0
+    assert registry.match("remind me to call") is None
+    assert registry.match("what time is it").name == "time"
+
+def test_dispatch_is_one_matcher_pass_however_many_flows():
+    many = FlowRegistry(BUILTIN_FLOWS + [Flow(f"flow {i}", [f"topic{i}x"], priority=60) for i in range(2000)])
+    passes = []
+    first = many.matcher.first
+    many.matcher.first = lambda text: passes.append(text) or first(text)
+    # Dispatch goes through the compiled table, never over the flows
+    many.flows = {}
+    assert many.match("about topic1999x now").name == "flow 1999"
+    assert many.match("what is the weather going to be like tomorrow").name == "weather"
+    assert len(passes) == 2
+
+def test_match_all_finds_each_flow_once_in_priority_order():
+    registry = FlowRegistry(BUILTIN_FLOWS)
+    names = [flow.name for flow in registry.match_all("what's the weather and the time and my calendar, and the time again")]
+    assert names == ["calendar", "time", "weather"]
+    assert registry.match_all("hello") == []
+
+def test_compound_command_runs_its_flows_at_the_same_time():
+    # Each flow only answers once all three are running
+    together = threading.Barrier(3, timeout=5)
+
+    def slow(reply):
+        def respond(service, command):
+            together.wait()
+            return reply
+        return respond
+
+    registry = FlowRegistry([
+        Flow("weather", ["weather"], priority=30, factory="builtins:object", respond=slow("Sunny"), acknowledgement="Opening weather, Sir!"),
+        Flow("time", ["time"], priority=20, factory="builtins:object", respond=slow("Noon"), acknowledgement="Opening time, Sir!"),
+        Flow("calendar", ["calendar"], priority=10, factory="builtins:object", respond=slow("No events"), acknowledgement="Opening calendar, Sir!"),
+    ])
+    speech = RecordingSpeech()
+    recognizer = Recognizer(speech=speech, registry=registry, usage=UsageHistory(None), selector=ResponseSelector(None))  # type: ignore[arg-type]
+    recognizer.process_command("the weather, the time and my calendar today")
+    assert speech.spoken == ["On it, Sir!", "No events\nNoon\nSunny"]
+    assert recognizer.usage.counts == {"calendar": 1, "time": 1, "weather": 1}
+
+def test_interactive_flow_runs_after_the_combined_answer():
+    class ScriptedSpeech(RecordingSpeech):
+        def get_audio(self):
+            return ""
+
+    registry = FlowRegistry(BUILTIN_FLOWS)
+    speech = ScriptedSpeech()
+    recognizer = Recognizer(speech=speech, registry=registry, usage=UsageHistory(None), selector=ResponseSelector(None))  # type: ignore[arg-type]
+    recognizer.services["time"].instance = type("Clock", (), {"get_time_info": lambda self, data: "It is noon"})()
+    recognizer.process_command("tell me the time, i have a question")
+    assert speech.spoken == ["Opening time, Sir!", "It is noon", "What is your question, Sir?", "I didn't hear your question, Sir!"]
+
+def test_failing_flow_of_a_compound_command_does_not_silence_the_others():
+    def broken(service, command):
+        raise KeyError("temperature")
+
+    registry = FlowRegistry([
+        Flow("time", ["time"], priority=20, factory="builtins:object", respond=lambda service, command: "Noon"),
+        Flow("weather", ["weather"], priority=30, factory="builtins:object", respond=broken),
+    ])
+    speech = RecordingSpeech()
+    recognizer = Recognizer(speech=speech, registry=registry, usage=UsageHistory(None), selector=ResponseSelector(None))  # type: ignore[arg-type]
+    recognizer.process_command("the time and the weather")
+    assert speech.spoken == ["On it, Sir!", "Noon\nSorry, Sir, I can't get the weather right now."]
@@ -0,0 +1,240 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from conftest import RecordingSpeech
+
+from src.core.audio import AudioSourceExhausted
+from src.core.recognizer import Recognizer
+from src.core.registry import Flow, FlowRegistry
+from src.core.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    OPENWEATHERMAP,
+    CircuitBreaker,
+    CircuitOpen,
+    DeadlineExceeded,
+    DependencyError,
+    Resilience,
+    resilience,
+)
+from src.core.selection import ResponseSelector
+from src.core.warmup import UsageHistory
+from src.flows.builtin import BUILTIN_FLOWS
+from src.flows.weather_data import WeatherClient
+
+class FaultyDependency:
+    """
+    A dependency that fails, hangs or answers slowly on demand.
+    """
+
+    def __init__(self, delays=(), failures=0):
+        self.delays = list(delays)
+        self.failures = failures
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            delay = self.delays.pop(0) if self.delays else 0.0
+            fail = self.failures > 0
+            self.failures -= 1
+        time.sleep(delay)
+        if fail:
+            raise ConnectionError("connection refused")
+        return "ok"
+
+class FaultyServer:
+    """
+    Local HTTP stand-in for the weather API that can be made to fail or hang.
+    """
+
+    def __init__(self):
+        self.status = 200
+        self.delay = 0.0
+        self.requests = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stand_in.requests += 1
+                time.sleep(stand_in.delay)
+                data = json.dumps({"weather": [{"description": "clear sky"}], "main": {"temp": 21}}).encode()
+                self.send_response(stand_in.status)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+@pytest.fixture
+def server():
+    stand_in = FaultyServer()
+    yield stand_in
+    stand_in.server.shutdown()
+    stand_in.server.server_close()
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    resilience.reset()
+    yield
+    resilience.reset()
+
+def test_breaker_opens_fails_fast_and_closes_after_a_trial():
+    now = [0.0]
+    breaker = CircuitBreaker("api", failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    now[0] = 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    now[0] = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+def test_open_circuit_fails_fast():
+    guard = Resilience(failure_threshold=2)
+    hanging = FaultyDependency(delays=[2, 2, 2])
+    for _ in range(2):
+        with pytest.raises(DeadlineExceeded):
+            guard.call("api", hanging, timeout=0.05)
+    with pytest.raises(CircuitOpen):
+        guard.call("api", hanging, timeout=0.05)
+    # Refused without calling the dependency
+    assert hanging.calls == 2
+
+def test_slow_attempt_is_hedged():
+    guard = Resilience()
+    dependency = FaultyDependency(delays=[2.0, 0.0])
+    # The first attempt would outlast the timeout; only the hedge can answer in time
+    assert guard.call("api", dependency, timeout=1.0, hedge_after=0.05, attempts=2) == "ok"
+    assert dependency.calls == 2
+
+def test_failed_attempt_is_retried_and_the_last_failure_counts():
+    guard = Resilience()
+    assert guard.call("api", FaultyDependency(failures=1), timeout=1.0, attempts=2) == "ok"
+    with pytest.raises(DependencyError, match="connection refused"):
+        guard.call("api", FaultyDependency(failures=2), timeout=1.0, attempts=2)
+    assert guard.breaker("api").failures == 1
+
+def test_turn_budget_bounds_all_calls_of_the_turn():
+    guard = Resilience()
+    other = FaultyDependency()
+    with guard.budget(0.2):
+        with pytest.raises(DeadlineExceeded, match="budget spent"):
+            guard.call("slow", FaultyDependency(delays=[2]), timeout=5.0)
+        # Spent: not even started
+        with pytest.raises(DeadlineExceeded, match="budget spent"):
+            guard.call("other", other)
+    assert other.calls == 0
+    assert guard.remaining() is None
+
+def test_running_out_of_turn_budget_does_not_open_the_circuit():
+    guard = Resilience(failure_threshold=1)
+    for _ in range(3):
+        with guard.budget(0.05):
+            with pytest.raises(DeadlineExceeded, match="budget spent"):
+                guard.call("api", FaultyDependency(delays=[0.5]), timeout=5.0)
+    assert guard.breaker("api").state == CLOSED
+    assert guard.call("api", FaultyDependency(), timeout=5.0) == "ok"
+
+def test_turn_budget_starts_once_the_command_is_heard():
+    remaining = []
+
+    class SlowSpeaker(RecordingSpeech):
+        wake_words = ["assistant"]
+
+        def listen_for_wake_word(self, ready=None):
+            if not self.wake_words:
+                raise AudioSourceExhausted()
+            return self.wake_words.pop()
+
+        def get_audio(self):
+            remaining.append(resilience.remaining())
+            return "what is my stock worth"
+
+    def lookup(service, command):
+        remaining.append(resilience.remaining())
+        return "Up two percent"
+
+    registry = FlowRegistry([Flow("stock price", ["stock"], factory="builtins:object", respond=lookup)])
+    speech = SlowSpeaker()
+    Recognizer(speech=speech, registry=registry, usage=UsageHistory(None), selector=ResponseSelector(None), turn_budget=12.0).run()  # type: ignore[arg-type]
+    # No budget while the user speaks; a full one for the flow
+    assert remaining[0] is None
+    assert remaining[1] > 6
+    assert speech.spoken == ["Yes, Sir?", "Up two percent"]
+
+def test_question_is_listened_to_outside_the_turn_budget():
+    remaining = []
+
+    class Asker(RecordingSpeech):
+        def get_audio(self):
+            remaining.append(resilience.remaining())
+            return ""
+
+    speech = Asker()
+    recognizer = Recognizer(speech=speech, registry=FlowRegistry(BUILTIN_FLOWS), usage=UsageHistory(None), selector=ResponseSelector(None))  # type: ignore[arg-type]
+    with resilience.budget(0.5):
+        recognizer.process_command("i have a question")
+    assert remaining == [None]
+    assert speech.spoken[-1] == "I didn't hear your question, Sir!"
+
+def test_failing_weather_api_is_answered_from_the_expired_cache(server, tmp_path):
+    client = WeatherClient("key", weather_url=f"{server.url}/weather", cache_path=tmp_path / "cache.json", weather_ttl=0, max_stale=0, timeout=0.2)
+    assert client.current_weather("Lisbon")["main"]["temp"] == 21
+
+    server.status = 503
+    for _ in range(3):
+        assert client.current_weather("Lisbon")["main"]["temp"] == 21
+    assert resilience.breaker(OPENWEATHERMAP).state == OPEN
+
+    server.delay = 2
+    requests = server.requests
+    assert client.current_weather("Lisbon")["main"]["temp"] == 21
+    # Answered without asking the server
+    assert server.requests == requests
+
+def test_hanging_flow_gets_a_degraded_answer_within_the_turn_budget():
+    def lookup(service, command):
+        # Would answer well within its own timeout, but not within the budget
+        return resilience.call("stocks api", FaultyDependency(delays=[2]), timeout=10.0)
+
+    registry = FlowRegistry([Flow("stock price", ["stock"], factory="builtins:object", respond=lookup)])
+    speech = RecordingSpeech()
+    recognizer = Recognizer(speech=speech, registry=registry, usage=UsageHistory(None), selector=ResponseSelector(None))  # type: ignore[arg-type]
+    with resilience.budget(0.3):
+        recognizer.process_command("what is my stock worth")
+    assert speech.spoken == ["Sorry, Sir, I can't get the stock price right now."]
+
+def test_flows_of_a_compound_command_share_the_turn_budget():
+    def lookup(service, command):
+        return resilience.call("stocks api", FaultyDependency(delays=[2]), timeout=10.0)
+
+    registry = FlowRegistry([
+        Flow("stock price", ["stock"], factory="builtins:object", respond=lookup),
+        Flow("greeting", ["hello"], factory="builtins:object", respond=lambda service, command: "Hello, Sir!"),
+    ])
+    speech = RecordingSpeech()
+    recognizer = Recognizer(speech=speech, registry=registry, usage=UsageHistory(None), selector=ResponseSelector(None))  # type: ignore[arg-type]
+    with resilience.budget(0.3):
+        recognizer.process_command("hello, what is my stock worth")
+    assert speech.spoken == ["On it, Sir!", "Sorry, Sir, I can't get the stock price right now.\nHello, Sir!"]
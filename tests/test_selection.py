@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+from conftest import RecordingSpeech
+
+from src.core.constants import FUNFACT
+from src.core.recognizer import Recognizer
+from src.core.selection import FeistelPermutation, ResponseSelector, ShuffleBag
+from src.core.warmup import UsageHistory
+from src.data import commands as corpus
+from src.data.qa_index import QAIndex
+from src.data.snapshot import ValuePool
+
+@pytest.mark.parametrize("size", [1, 2, 3, 17, 1000, 4097])
+def test_permutation_covers_every_position_once(size):
+    order = FeistelPermutation(size, seed=size)
+    assert sorted(order[i] for i in range(size)) == list(range(size))
+
+def test_different_seeds_give_different_orders():
+    first, second = FeistelPermutation(1000, 1), FeistelPermutation(1000, 2)
+    assert [first[i] for i in range(1000)] != [second[i] for i in range(1000)]
+
+def test_bag_does_not_repeat_recent_items_across_rounds():
+    bag = ShuffleBag(10, memory=3)
+    drawn = [bag.draw() for _ in range(200)]
+    assert sorted(drawn[:10]) == list(range(10))
+    for i in range(3, len(drawn)):
+        assert drawn[i] not in drawn[i - 3:i]
+
+def test_state_survives_a_restart(tmp_path):
+    path = tmp_path / "selection.json"
+    pool = [f"reply {i}" for i in range(50)]
+    first = ResponseSelector(path)
+    heard = [first.pick("greeting", pool) for _ in range(20)]
+
+    second = ResponseSelector(path)
+    heard += [second.pick("greeting", pool) for _ in range(30)]
+    assert sorted(heard) == sorted(pool)
+
+def test_changed_pool_starts_a_new_round(tmp_path):
+    path = tmp_path / "selection.json"
+    selector = ResponseSelector(path)
+    selector.pick("greeting", ["a", "b", "c"])
+    assert selector.pick("greeting", ["a", "b", "c", "d"]) in "abcd"
+    assert ResponseSelector(path).bags == {}
+    assert selector.pick("empty", []) is None
+
+def test_fun_facts_are_not_repeated(monkeypatch):
+    facts = [f"fact {i}" for i in range(25)]
+    monkeypatch.setattr(corpus, "answers", facts)
+    speech = RecordingSpeech()
+    recognizer = Recognizer(speech=speech, usage=UsageHistory(None), selector=ResponseSelector(None))  # type: ignore[arg-type]
+    for _ in range(25):
+        recognizer.process_command(f"tell me a {FUNFACT}")
+    told = [text for text in speech.spoken if text.startswith("fact")]
+    assert sorted(told) == sorted(facts)
+
+def test_fun_fact_state_is_saved_after_releasing_the_corpus_lock(monkeypatch, tmp_path):
+    monkeypatch.setattr(corpus, "answers", ["fact 0", "fact 1"])
+    selector = ResponseSelector(tmp_path / "selection.json")
+    recognizer = Recognizer(speech=RecordingSpeech(), usage=UsageHistory(None), selector=selector)  # type: ignore[arg-type]
+    free = []
+    save = selector.save
+
+    def save_and_check():
+        # Another thread, e.g. a Q&A lookup, must not wait for the file to be written
+        probe = threading.Thread(target=lambda: free.append(corpus.lock.acquire(timeout=0) and corpus.lock.release() is None))
+        probe.start()
+        probe.join()
+        save()
+
+    monkeypatch.setattr(selector, "save", save_and_check)
+    recognizer.process_command(f"tell me a {FUNFACT}")
+    assert free == [True]
+    assert FUNFACT in ResponseSelector(tmp_path / "selection.json").saved
+
+def test_fun_fact_pool_is_updated_in_place(monkeypatch):
+    monkeypatch.setattr(corpus, "q_and_a", {"what is a fact": "fact 0"})
+    monkeypatch.setattr(corpus, "answers", ValuePool(["what is a fact"], ["fact 0"], {"what is a fact": 0}))
+    monkeypatch.setattr(corpus, "qa_index", QAIndex())
+    pool = corpus.answers
+    corpus.apply_q_and_a_changes({"what is another fact": "fact 1"}, [])
+    corpus.apply_q_and_a_changes({"what is a third fact": "fact 2"}, ["what is a fact"])
+    # Changed in place, never rebuilt from the whole corpus
+    assert corpus.answers is pool
+    assert list(corpus.answers) == ["fact 1", "fact 2"]
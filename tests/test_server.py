@@ -0,0 +1,159 @@
+import asyncio
+import http.client
+import io
+import json
+import threading
+import time
+import wave
+
+import pytest
+
+from src.core import logger as logging_pipeline
+from src.core.batch import StubWeatherService, stub_services
+from src.core.constants import WEATHER
+from src.core.server import AssistantServer
+from src.core.speech import RecognitionBackend
+from src.core.warmup import UsageHistory
+from src.data import commands
+
+class EchoBackend(RecognitionBackend):
+    def recognize(self, audio):
+        return "what is the capital of france" if audio.frame_data else ""
+
+class CountingWeather(StubWeatherService):
+    """Tracks how many weather calls are made and how many run at the same time."""
+
+    def __init__(self):
+        super().__init__(latency=0.01)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    def get_weather_info(self, city=None):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            return super().get_weather_info(city)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    (tmp_path / "input.csv").write_text("music,sing me a song,I cannot sing Sir!\n")
+    (tmp_path / "q_and_a.csv").write_text("what is the capital of france,Paris\n")
+    monkeypatch.setattr(commands, "INPUT_PATH", tmp_path / "input.csv")
+    monkeypatch.setattr(commands, "Q_AND_A_PATH", tmp_path / "q_and_a.csv")
+    commands.init_replies()
+
+@pytest.fixture
+def server(corpus):
+    weather = CountingWeather()
+    services = stub_services()
+    services[WEATHER].instance = weather
+    server = AssistantServer(port=0, services=services, workers=4, backend=EchoBackend(), usage=UsageHistory(None))
+    server.weather = weather
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result(5)
+    yield server
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    # Let the log listener catch up while pytest still captures its output
+    while not logging_pipeline._queue.empty():
+        time.sleep(0.01)
+
+def request(server, method, path, body=None, content_type="application/json"):
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    if isinstance(body, dict):
+        body = json.dumps(body).encode("utf-8")
+    connection.request(method, path, body, {"Content-Type": content_type} if body is not None else {})
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, json.loads(data) if data else None
+
+def test_session_turns_keep_their_own_state(server):
+    _, first = request(server, "POST", "/sessions")
+    _, second = request(server, "POST", "/sessions")
+
+    status, turn = request(server, "POST", f"/sessions/{first['session']}/turns", {"text": "I have a question"})
+    assert status == 200
+    assert turn["replies"] == ["What is your question, Sir?"]
+    assert turn["awaiting"] == "question"
+
+    # The other session is not waiting for a question
+    _, turn = request(server, "POST", f"/sessions/{second['session']}/turns", {"text": "sing me a song"})
+    assert turn == {"heard": "sing me a song", "replies": ["I cannot sing Sir!"], "awaiting": None}
+
+    _, turn = request(server, "POST", f"/sessions/{first['session']}/turns", {"text": "what is the capital of france"})
+    assert turn["replies"] == ["Paris"]
+    assert turn["awaiting"] is None
+
+def test_audio_turns_are_recognized(server):
+    _, session = request(server, "POST", "/sessions")
+    request(server, "POST", f"/sessions/{session['session']}/turns", {"text": "question"})
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(b"\x10\x00" * 1600)
+    status, turn = request(server, "POST", f"/sessions/{session['session']}/turns", buffer.getvalue(), "audio/wav")
+    assert status == 200
+    assert turn["heard"] == "what is the capital of france"
+    assert turn["replies"] == ["Paris"]
+
+def test_errors(server):
+    assert request(server, "POST", "/sessions/unknown/turns", {"text": "hi"})[0] == 404
+    assert request(server, "GET", "/sessions")[0] == 405
+    _, session = request(server, "POST", "/sessions")
+    assert request(server, "POST", f"/sessions/{session['session']}/turns", b"not json")[0] == 400
+    assert request(server, "DELETE", f"/sessions/{session['session']}") == (204, None)
+    assert request(server, "POST", f"/sessions/{session['session']}/turns", {"text": "hi"})[0] == 404
+    assert request(server, "GET", "/health") == (200, {"sessions": 0, "pending": 0})
+
+def test_hundreds_of_concurrent_sessions(server):
+    async def call(reader, writer, method, path, body=b""):
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line == b"\r\n":
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        return status, json.loads(await reader.readexactly(length))
+
+    async def client(_):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        _, session = await call(reader, writer, "POST", "/sessions")
+        replies = []
+        for text in ("what's the weather like", "sing me a song"):
+            status, turn = await call(reader, writer, "POST", f"/sessions/{session['session']}/turns", json.dumps({"text": text}).encode())
+            assert status == 200
+            replies.append(turn["replies"][-1])
+        writer.close()
+        return replies
+
+    async def main():
+        return await asyncio.gather(*(client(i) for i in range(300)))
+
+    results = asyncio.run(main())
+
+    assert len(results) == 300
+    assert all("Clear sky" in weather and song == "I cannot sing Sir!" for weather, song in results)
+    assert len(server.sessions) == 300
+    # Flow calls never exceed the executor's size
+    assert server.weather.peak <= 4
+    # Every session got its own answer, none was dropped or answered twice
+    assert server.weather.calls == 300
@@ -0,0 +1,57 @@
+import os
+
+from src.data import snapshot
+from src.data.commands import load_csv
+from src.data.qa_index import QAIndex
+
+def write_sources(tmp_path):
+    input_csv = tmp_path / "input.csv"
+    q_and_a_csv = tmp_path / "q_and_a.csv"
+    input_csv.write_text("greeting,Hello,Hi Sir\ngreeting,hey,Hello Sir\nfarewell,bye,Goodbye Sir\nfarewell,hey,Later\n")
+    q_and_a_csv.write_text("what is the capital of france,Paris\nwho invented the telephone,Bell\n")
+    return [input_csv, q_and_a_csv]
+
+def test_snapshot_resolves_lookups(tmp_path):
+    sources = write_sources(tmp_path)
+    snap = snapshot.open_snapshot(tmp_path / "corpus.snap", sources, load_csv)
+    assert list(snap.commands) == ["greeting", "farewell"]
+    assert list(snap.replies["farewell"]) == ["Goodbye Sir", "Later"]
+    assert snap.phrases["hello"] == "greeting"
+    assert snap.phrases["hey"] == "greeting"
+    assert "missing" not in snap.phrases
+    assert snap.q_and_a["who invented the telephone"] == "Bell"
+    assert len(snap.q_and_a) == 2
+
+def test_snapshot_loads_qa_index(tmp_path):
+    snap = snapshot.open_snapshot(tmp_path / "corpus.snap", write_sources(tmp_path), load_csv)
+    index = QAIndex()
+    snap.load_qa_index(index)
+    assert index.best_answer("capital of france") == "Paris"
+
+def test_snapshot_is_recompiled_when_sources_change(tmp_path):
+    sources = write_sources(tmp_path)
+    path = tmp_path / "corpus.snap"
+    snapshot.open_snapshot(path, sources, load_csv)
+    meta = snapshot.read_toc(path)["meta"]
+    assert snapshot.is_fresh(meta, sources)
+
+    # Touching a file without changing it keeps the snapshot valid
+    os.utime(sources[1], ns=(0, 0))
+    assert snapshot.is_fresh(meta, sources)
+
+    sources[1].write_text("what is the capital of romania,Bucharest\n")
+    assert not snapshot.is_fresh(meta, sources)
+    assert snapshot.open_snapshot(path, sources, load_csv).q_and_a["what is the capital of romania"] == "Bucharest"
+
+def test_value_pool_follows_changes_over_the_snapshot(tmp_path):
+    snap = snapshot.open_snapshot(tmp_path / "corpus.snap", write_sources(tmp_path), load_csv)
+    pool = snapshot.ValuePool(snap.questions, snap.answers, snap.question_rows)
+    pool.set("what is the capital of spain", "Madrid")
+    pool.set("who invented the telephone", "Meucci")
+    pool.remove("what is the capital of france")
+    pool.remove("not a question")
+    # The last answer took the removed one's place
+    assert list(pool) == ["Madrid", "Meucci"]
+    pool.remove("what is the capital of spain")
+    pool.set("what is the capital of france", "Paris")
+    assert list(pool) == ["Meucci", "Paris"]
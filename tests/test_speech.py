@@ -1,7 +1,190 @@
-from src.core.speech import Speech
+import io
+
+import numpy as np
+import pytest
+import speech_recognition as sr
+
+from src.core.audio import StdinSource, Utterance
+from src.core.speech import KeywordSpotter, Speech, recognize_wake_utterance, split_wake_word
 
 def test_speech_speak_runs(monkeypatch):
     speech = Speech()
     monkeypatch.setattr(speech.engine, "say", lambda x: None)
     monkeypatch.setattr(speech.engine, "runAndWait", lambda: None)
     speech.speak("test")
+
+
+class FakeEngine:
+    def __init__(self):
+        self.spoken = []
+        self.pending = []
+        self.properties = {"rate": 150, "voices": [None, type("Voice", (), {"id": "voice"})()], "voice": None}
+
+    def setProperty(self, name, value):
+        self.properties[name] = value
+
+    def getProperty(self, name):
+        return self.properties[name]
+
+    def say(self, text):
+        self.pending.append(text)
+
+    def runAndWait(self):
+        self.spoken.extend(self.pending)
+        self.pending = []
+
+
+def test_speak_async_keeps_order(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr("src.core.speech.pyttsx3.init", lambda: engine)
+    speech = Speech()
+    first = speech.speak_async("first")
+    speech.speak("second")
+    assert first.done()
+    assert engine.spoken == ["first", "second"]
+    speech.close()
+
+
+def test_worker_errors_reach_the_caller(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr("src.core.speech.pyttsx3.init", lambda: engine)
+    speech = Speech()
+
+    def fail():
+        raise RuntimeError("audio device lost")
+
+    monkeypatch.setattr(engine, "runAndWait", fail)
+    future = speech.speak_async("hello")
+    assert isinstance(future.exception(timeout=1), RuntimeError)
+    speech.close()
+
+
+class FakeBackend:
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def recognize(self, audio):
+        self.calls += 1
+        return self.text
+
+
+class FakeStream:
+    def next_utterance(self, timeout=None, partials=False):
+        return Utterance(sr.AudioData(b"\0\0" * 160, 16000, 2), 0.0)
+
+
+def test_wake_word_and_commands_use_their_own_backends(monkeypatch):
+    monkeypatch.setattr("src.core.speech.pyttsx3.init", FakeEngine)
+    full, wake = FakeBackend("what time is it"), FakeBackend("hey assistant")
+    speech = Speech(source=StdinSource(stream=io.BytesIO()), backend=full, wake_backend=wake)
+    speech.stream = FakeStream()
+    assert speech.listen_for_wake_word() == "hey assistant"
+    assert (wake.calls, full.calls) == (1, 0)
+    assert speech.get_audio() == "what time is it"
+    assert (wake.calls, full.calls) == (1, 1)
+    speech.close()
+
+
+def test_keyword_spotter_ignores_non_speech():
+    pytest.importorskip("pocketsphinx")
+    spotter = KeywordSpotter(["hey assistant", "assistant"])
+    tone = (3000 * np.sin(2 * np.pi * 440 * np.arange(16000) / 16000)).astype(np.int16)
+    assert spotter.recognize(sr.AudioData(tone.tobytes(), 16000, 2)) == ""
+
+
+@pytest.mark.parametrize("text, command", [
+    ("hey assistant", ""),
+    ("hey assistant, what time is it", "what time is it"),
+    ("assistant what's the weather", "what's the weather"),
+    ("ok hello assistant tell me a fun fact", "tell me a fun fact"),
+    ("what time is it", None),
+])
+def test_split_wake_word(text, command):
+    assert split_wake_word(text) == command
+
+
+def test_command_in_the_wake_utterance_is_recognized_in_full():
+    def seconds(duration):
+        return sr.AudioData(b"\0\0" * int(16000 * duration), 16000, 2)
+
+    full, wake = FakeBackend("assistant what time is it"), FakeBackend("assistant")
+    # Short enough to be the wake word alone
+    assert recognize_wake_utterance(seconds(0.8), wake, full) == "assistant"
+    assert full.calls == 0
+    assert recognize_wake_utterance(seconds(2.0), wake, full) == "assistant what time is it"
+    # The full transcript missed the wake word the spotter heard
+    full.text = "what time is it"
+    assert recognize_wake_utterance(seconds(2.0), wake, full) == "assistant what time is it"
+    assert recognize_wake_utterance(seconds(2.0), FakeBackend("hello"), full) == "hello"
+    assert full.calls == 2
+
+
+class PartialStream:
+    """Two utterances, each as two partials followed by the complete one."""
+
+    def __init__(self):
+        self.queue = [(False, 1), (False, 2), (False, 3), (True, 4), (False, 1), (True, 2)]
+
+    def next_utterance(self, timeout=None, partials=False):
+        while True:
+            final, size = self.queue.pop(0)
+            if final or partials:
+                return Utterance(sr.AudioData(b"\0\0" * 1600 * size, 16000, 2), 0.0, final)
+
+
+class GrowingTranscript:
+    def __init__(self, texts):
+        self.texts = texts
+
+    def recognize(self, audio):
+        return self.texts[len(audio.frame_data) // 3200 - 1]
+
+
+def test_partial_result_is_acted_on_once_stable(monkeypatch):
+    monkeypatch.setattr("src.core.speech.pyttsx3.init", FakeEngine)
+    partial = GrowingTranscript(["assistant what", "assistant what time", "assistant what time", "unused"])
+    speech = Speech(
+        source=StdinSource(stream=io.BytesIO()),
+        backend=FakeBackend("the next command"),
+        wake_backend=FakeBackend(""),
+        partial_backend=partial,
+    )
+    speech.stream = PartialStream()
+    assert speech.listen_for_wake_word(lambda text: text.endswith("time")) == "assistant what time"
+    # The rest of the acted on utterance is skipped
+    assert speech.get_audio() == "the next command"
+    speech.close()
+
+
+class LiveSource(StdinSource):
+    live = True
+
+
+def test_reply_to_a_partial_does_not_swallow_the_next_utterance_on_a_live_source(monkeypatch):
+    monkeypatch.setattr("src.core.speech.pyttsx3.init", FakeEngine)
+    partial = GrowingTranscript(["assistant what", "assistant what time", "assistant what time", "unused"])
+    speech = Speech(
+        source=LiveSource(stream=io.BytesIO()),
+        backend=FakeBackend("the next command"),
+        wake_backend=FakeBackend(""),
+        partial_backend=partial,
+    )
+    stream = PartialStream()
+    speech.stream = stream
+    assert speech.listen_for_wake_word(lambda text: text.endswith("time")) == "assistant what time"
+    # The reply is spoken before the acted on utterance has ended
+    speech.speak("It is noon")
+    later = speech.last_spoken_at + 1
+    stream.queue = [(True, 4), (False, 1), (True, 2)]
+    original = stream.next_utterance
+
+    def next_utterance(timeout=None, partials=False):
+        utterance = original(timeout, partials)
+        # Only the rest of the first utterance started before the reply
+        return utterance if len(stream.queue) == 2 else Utterance(utterance.audio, later, utterance.final)
+
+    stream.next_utterance = next_utterance
+    assert speech.get_audio() == "the next command"
+    assert not speech.acted_on_partial
+    speech.close()
@@ -0,0 +1,78 @@
+import json
+import threading
+import time
+import urllib.request
+
+from src.core.tracing import NO_INTENT, MetricsExporter, Tracer
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.interaction() as interaction:
+        with tracer.span("recognize"):
+            pass
+        tracer.record("listen", 1.0)
+        tracer.tag("weather")
+    assert interaction is None
+    assert tracer.span("a") is tracer.span("b")
+    assert tracer.snapshot() == {}
+
+
+def test_spans_are_tagged_with_the_intent():
+    tracer = Tracer()
+    tracer.enabled = True
+    tracer.record("wake_word", 0.01)
+    with tracer.interaction():
+        tracer.record("listen", 0.5)
+        with tracer.span("dispatch"):
+            pass
+        tracer.tag("weather")
+        with tracer.span("flow"):
+            time.sleep(0.02)
+    snapshot = tracer.snapshot()
+    assert set(snapshot) == {"wake_word", "listen", "dispatch", "flow", "total"}
+    assert snapshot["wake_word"][NO_INTENT]["count"] == 1
+    assert snapshot["listen"]["weather"]["p50"] == 500
+    assert snapshot["flow"]["weather"]["p99"] >= 20
+    assert snapshot["total"]["weather"]["p50"] >= 20
+
+
+def test_worker_threads_record_into_the_joined_interaction():
+    tracer = Tracer()
+    tracer.enabled = True
+    with tracer.interaction():
+        tracer.tag("time+weather")
+        interaction = tracer.current()
+
+        def worker():
+            with tracer.joined(interaction):
+                tracer.record("flow", 0.1)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+    assert tracer.snapshot()["flow"]["time+weather"]["count"] == 1
+
+def test_percentiles_cover_the_latest_window():
+    tracer = Tracer(window=100)
+    tracer.enabled = True
+    for ms in range(1, 201):
+        tracer.record("recognize", ms / 1000)
+    stats = tracer.snapshot()["recognize"][NO_INTENT]
+    assert stats["count"] == 100
+    assert stats["p50"] == 150.5
+    assert 195 < stats["p95"] < stats["p99"] <= 200
+
+
+def test_metrics_are_exported(tmp_path):
+    tracer = Tracer()
+    tracer.enabled = True
+    tracer.record("speak", 0.25)
+    exporter = MetricsExporter(tracer, tmp_path / "metrics.json", port=0, interval=60)
+    exporter.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics", timeout=5) as response:
+            assert json.load(response)["speak"][NO_INTENT]["p50"] == 250
+    finally:
+        exporter.stop()
+    assert json.loads((tmp_path / "metrics.json").read_text())["speak"][NO_INTENT]["count"] == 1
@@ -0,0 +1,66 @@
+import wave
+
+from src.core.tts_cache import PhraseCache
+
+class FakeEngine:
+    def __init__(self):
+        self.rendered = []
+        self.pending = None
+
+    def save_to_file(self, text, path):
+        self.pending = (text, path)
+
+    def runAndWait(self):
+        text, path = self.pending
+        self.rendered.append(text)
+        # 44 bytes of header and 56 of samples
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(16000)
+            wav.writeframes(b"\x00\x00" * 28)
+
+class AiffEngine(FakeEngine):
+    """Writes something other than WAV, like the nsss driver."""
+
+    def runAndWait(self):
+        text, path = self.pending
+        self.rendered.append(text)
+        with open(path, "wb") as file:
+            file.write(b"x" * 100)
+
+def test_render_then_hit(tmp_path):
+    cache = PhraseCache(tmp_path)
+    engine = FakeEngine()
+    assert cache.get("Yes, Sir?", "voice", 150) is None
+    path = cache.render(engine, "Yes, Sir?", "voice", 150)
+    assert path.exists()
+    assert cache.get("Yes, Sir?", "voice", 150) == path
+    assert cache.get("Yes, Sir?", "voice", 200) is None
+    assert engine.rendered == ["Yes, Sir?"]
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = PhraseCache(tmp_path, max_bytes=250)
+    engine = FakeEngine()
+    cache.render(engine, "one", "voice", 150)
+    cache.render(engine, "two", "voice", 150)
+    cache.get("one", "voice", 150)
+    cache.render(engine, "three", "voice", 150)
+    assert cache.get("two", "voice", 150) is None
+    assert cache.get("one", "voice", 150) is not None
+    assert cache.total_bytes == 200
+
+def test_entries_survive_restart(tmp_path):
+    PhraseCache(tmp_path).render(FakeEngine(), "hello", "voice", 150)
+    assert PhraseCache(tmp_path).get("hello", "voice", 150) is not None
+
+def test_cache_turns_off_when_the_driver_does_not_render_wav(tmp_path):
+    cache = PhraseCache(tmp_path)
+    engine = AiffEngine()
+    assert cache.render(engine, "one", "voice", 150) is None
+    assert cache.render(engine, "two", "voice", 150) is None
+    assert cache.get("one", "voice", 150) is None
+    # Checked once, then never rendered again
+    assert engine.rendered == ["one"]
+    assert cache.is_full()
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,105 @@
+import json
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from src.core.warmup import LazyService, StartupReport, UsageHistory, WarmupScheduler
+
+
+@pytest.fixture
+def flows(monkeypatch):
+    """
+    Fake flow modules whose services record their creation.
+    """
+    created = []
+    release = threading.Event()
+    release.set()
+
+    def service_class(name, fail=False):
+        class Service:
+            def __init__(self):
+                # Bounded, so a test waiting on the wrong thread fails instead of hanging
+                release.wait(5)
+                if fail and not created.count(f"{name} retry"):
+                    created.append(f"{name} retry")
+                    raise RuntimeError("no network")
+                created.append(name)
+
+        module = types.ModuleType(f"fake_{name}_flow")
+        module.Service = Service
+        monkeypatch.setitem(sys.modules, module.__name__, module)
+        return LazyService(name, module.__name__, "Service")
+
+    return service_class, created, release
+
+
+def test_service_is_created_once(flows):
+    service_class, created, release = flows
+    service = service_class("time")
+    release.clear()
+    threads = [threading.Thread(target=service.get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert created == ["time"]
+    assert service.import_seconds is not None and service.init_seconds is not None
+
+
+def test_usage_history_orders_and_persists(tmp_path, flows):
+    service_class, _, _ = flows
+    services = [service_class("time"), service_class("weather"), service_class("calendar")]
+    history = UsageHistory(tmp_path / "usage.json")
+    history.record("calendar")
+    history.record("calendar")
+    history.record("weather")
+    assert [service.name for service in UsageHistory(tmp_path / "usage.json").order(services)] == ["calendar", "weather", "time"]
+
+
+def test_usage_recorded_from_several_threads_is_all_saved(tmp_path):
+    history = UsageHistory(tmp_path / "usage.json")
+
+    def record():
+        for _ in range(50):
+            history.record("time")
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert UsageHistory(tmp_path / "usage.json").counts == {"time": 400}
+
+
+def test_warmup_runs_in_the_background(tmp_path, flows):
+    service_class, created, release = flows
+    services = [service_class("time"), service_class("weather")]
+    release.clear()
+    report = StartupReport(time.perf_counter(), tmp_path / "report.json")
+
+    done = WarmupScheduler(services, report=report).start()
+    # Returned while the services are still being created
+    assert not done.done()
+    assert created == []
+
+    release.set()
+    done.result(timeout=2)
+    assert sorted(created) == ["time", "weather"]
+    written = json.loads((tmp_path / "report.json").read_text())
+    assert "warm" in written["milestones"]
+    assert written["services"]["time"]["init_seconds"] is not None
+
+
+def test_failed_or_unwarmable_services_are_left_for_later(flows):
+    service_class, created, _ = flows
+    failing = service_class("weather", fail=True)
+    blocked = service_class("calendar")
+    blocked.can_warm = lambda: False
+    WarmupScheduler([failing, blocked]).start().result(timeout=2)
+    assert not failing.loaded and not blocked.loaded
+    failing.get()
+    assert created == ["weather retry", "weather"]
@@ -0,0 +1,46 @@
+import pytest
+
+from src.data import commands
+from src.data.watcher import CorpusWatcher
+
+@pytest.fixture(params=[False, True], ids=["csv", "snapshot"])
+def corpus_files(tmp_path, monkeypatch, request):
+    input_csv = tmp_path / "input.csv"
+    q_and_a_csv = tmp_path / "q_and_a.csv"
+    input_csv.write_text("greeting,hello,Hi Sir\nfarewell,bye,Goodbye Sir\n")
+    q_and_a_csv.write_text("what is the capital of france,Paris\n")
+    monkeypatch.setattr(commands, "INPUT_PATH", input_csv)
+    monkeypatch.setattr(commands, "Q_AND_A_PATH", q_and_a_csv)
+    monkeypatch.setattr(commands, "SNAPSHOT_PATH", tmp_path / "corpus.snap")
+    commands.init_replies(use_snapshot=request.param)
+    return input_csv, q_and_a_csv
+
+def test_poll_without_changes_does_nothing(corpus_files):
+    assert not CorpusWatcher().poll()
+
+def test_appended_rows_are_applied(corpus_files):
+    input_csv, q_and_a_csv = corpus_files
+    watcher = CorpusWatcher()
+    with open(input_csv, "a") as file:
+        file.write("greeting,good morning,Morning Sir\n")
+    with open(q_and_a_csv, "a") as file:
+        file.write("who invented the telephone,Bell\n")
+    assert watcher.poll()
+    assert commands.intent_index.match_phrase("good morning") == "greeting"
+    assert list(commands.replies["greeting"]) == ["Hi Sir", "Morning Sir"]
+    assert commands.q_and_a["who invented the telephone"] == "Bell"
+    assert commands.qa_index.best_answer("who invented the telephone") == "Bell"
+
+def test_edited_rows_are_diffed(corpus_files):
+    input_csv, q_and_a_csv = corpus_files
+    watcher = CorpusWatcher()
+    input_csv.write_text("greeting,hello,Hello there Sir\n")
+    q_and_a_csv.write_text("what is the capital of romania,Bucharest\n")
+    assert watcher.poll()
+    assert "farewell" not in commands.commands
+    assert commands.intent_index.match_phrase("bye") is None
+    assert list(commands.replies["greeting"]) == ["Hello there Sir"]
+    assert "what is the capital of france" not in commands.q_and_a
+    assert commands.qa_index.best_answer("capital of france") != "Paris"
+    assert commands.qa_index.best_answer("capital of romania") == "Bucharest"
+    assert len(commands.q_and_a) == 1
@@ -0,0 +1,132 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.flows.weather_data import WeatherClient
+from src.flows.weather_flow import WeatherService
+
+
+class StandIn:
+    """
+    Local stand-in for the weather and IP geolocation APIs.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.temperature = 20
+        self.status = 200
+        # Cleared to hold requests until it is set again
+        self.release = threading.Event()
+        self.release.set()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                stand_in.requests.append((url.path, self.client_address[1]))
+                stand_in.release.wait(5)
+                if url.path == "/geo":
+                    body = {"city": "Lisbon"}
+                else:
+                    city = parse_qs(url.query)["q"][0]
+                    body = {"weather": [{"description": "clear sky"}], "main": {"temp": stand_in.temperature}, "name": city}
+                data = json.dumps(body).encode()
+                self.send_response(stand_in.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def count(self, path):
+        return sum(1 for request_path, _ in self.requests if request_path == path)
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+def make_client(stand_in, tmp_path, **kwargs):
+    return WeatherClient(
+        "key",
+        weather_url=f"{stand_in.url}/weather",
+        geolocation_url=f"{stand_in.url}/geo",
+        cache_path=tmp_path / "weather_cache.json",
+        **kwargs,
+    )
+
+
+def test_fresh_entries_are_served_from_the_cache(stand_in, tmp_path):
+    client = make_client(stand_in, tmp_path)
+    assert client.current_weather("Lisbon")["main"]["temp"] == 20
+    stand_in.temperature = 25
+    assert client.current_weather("Lisbon")["main"]["temp"] == 20
+    assert stand_in.count("/weather") == 1
+
+
+def test_connections_are_reused(stand_in, tmp_path):
+    client = make_client(stand_in, tmp_path, weather_ttl=0, max_stale=0)
+    for city in ("Lisbon", "Porto", "Faro"):
+        client.current_weather(city)
+    assert len({port for _, port in stand_in.requests}) == 1
+
+
+def test_stale_entries_are_served_while_refreshing(stand_in, tmp_path):
+    client = make_client(stand_in, tmp_path, weather_ttl=0)
+    client.current_weather("Lisbon")
+    stand_in.temperature = 25
+    stand_in.release.clear()
+
+    # Answered while the refresh is held by the server
+    assert client.current_weather("Lisbon")["main"]["temp"] == 20
+    stand_in.release.set()
+    client.wait_for_refreshes()
+    assert stand_in.count("/weather") == 2
+    client.weather_ttl = 60
+    assert client.current_weather("Lisbon")["main"]["temp"] == 25
+
+
+def test_cache_survives_a_restart(stand_in, tmp_path):
+    client = make_client(stand_in, tmp_path)
+    assert client.locate() == "Lisbon"
+    client.current_weather("Lisbon")
+
+    restarted = make_client(stand_in, tmp_path)
+    assert restarted.locate() == "Lisbon"
+    assert restarted.current_weather("lisbon")["main"]["temp"] == 20
+    assert stand_in.count("/geo") == 1
+    assert stand_in.count("/weather") == 1
+
+
+def test_expired_entry_is_served_when_the_refresh_fails(stand_in, tmp_path):
+    client = make_client(stand_in, tmp_path, weather_ttl=0, max_stale=0)
+    client.current_weather("Lisbon")
+    stand_in.status = 500
+    assert client.current_weather("Lisbon")["main"]["temp"] == 20
+    assert client.current_weather("Porto") is None
+
+
+def test_weather_service_uses_the_located_city(stand_in, tmp_path):
+    service = WeatherService(client=make_client(stand_in, tmp_path))
+    assert service.get_weather_info() == "The weather in Lisbon is Clear sky with a temperature of 20°C."
+
+
+def test_weather_service_without_api_key(stand_in, tmp_path):
+    client = make_client(stand_in, tmp_path)
+    client.api_key = None
+    assert WeatherService(client=client).get_weather_info("Lisbon") == "Weather API key is missing!"